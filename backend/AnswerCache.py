@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+class AnswerCache:
+    """
+    Semantic cache of generated answers.
+
+    An incoming query matches a cached one when the cosine similarity of their
+    embeddings is at least similarity_threshold. Entries expire after ttl_seconds,
+    the least recently used entry is dropped beyond max_entries, and the whole
+    cache is cleared when set_corpus_version moves it to a new corpus version.
+    Lookups and stores made against any other version (e.g. by a request still
+    running on the pipeline that was just swapped out) miss and are skipped.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.95, ttl_seconds: float = 3600, max_entries: int = 1000):
+        """
+        Initialize the answer cache.
+
+        Args:
+            similarity_threshold: Minimum cosine similarity for a cache hit
+            ttl_seconds: Lifetime of a cached answer
+            max_entries: Maximum number of cached answers
+        """
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.corpus_version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._next_id = 0
+        # one preallocated row per entry, grown by doubling; rows of removed entries are reused
+        self._matrix: Optional[np.ndarray] = None
+        self._row_ids: List[Optional[int]] = []
+        self._free_rows: List[int] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def set_corpus_version(self, corpus_version: Optional[str]):
+        """
+        Move the cache to a new corpus version, dropping the answers of the previous one.
+
+        Args:
+            corpus_version: Version of the corpus now being served
+        """
+        with self._lock:
+            if corpus_version == self.corpus_version:
+                return
+            if self._entries:
+                self.invalidations += 1
+            self._reset()
+            self.corpus_version = corpus_version
+
+    def _reset(self):
+        self._entries.clear()
+        self._matrix = None
+        self._row_ids = []
+        self._free_rows = []
+
+    def _add_row(self, entry_id: int, vector: np.ndarray) -> int:
+        if self._free_rows:
+            row = self._free_rows.pop()
+        else:
+            row = len(self._row_ids)
+            if self._matrix is None:
+                self._matrix = np.zeros((16, len(vector)), dtype=np.float32)
+            elif row == len(self._matrix):
+                grown = np.zeros((2 * row, self._matrix.shape[1]), dtype=np.float32)
+                grown[:row] = self._matrix
+                self._matrix = grown
+            self._row_ids.append(None)
+        self._matrix[row] = vector
+        self._row_ids[row] = entry_id
+        return row
+
+    def _remove(self, entry_id: int):
+        row = self._entries.pop(entry_id)["row"]
+        self._row_ids[row] = None
+        self._free_rows.append(row)
+
+    def _drop_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        expired = [entry_id for entry_id, entry in self._entries.items() if entry["created_at"] < cutoff]
+        for entry_id in expired:
+            self._remove(entry_id)
+
+    def lookup(self, embedding: List[float], corpus_version: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached answer for a query embedding.
+
+        Returns:
+            Dictionary with the cached query, answer, sources, documents and the
+            similarity, or None on a miss
+        """
+        vector = self._normalize(embedding)
+        with self._lock:
+            self._drop_expired()
+
+            if corpus_version != self.corpus_version or not self._entries:
+                self.misses += 1
+                return None
+
+            similarities = self._matrix[:len(self._row_ids)] @ vector
+            if self._free_rows:
+                similarities[self._free_rows] = -np.inf
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            entry_id = self._row_ids[best]
+            self._entries.move_to_end(entry_id)
+            entry = self._entries[entry_id]
+            self.hits += 1
+            return {
+                "query": entry["query"],
+                "answer": entry["answer"],
+                "sources": list(entry["sources"]),
+                "documents": list(entry["documents"]),
+                "similarity": similarity
+            }
+
+    def store(
+        self,
+        query: str,
+        embedding: List[float],
+        answer: str,
+        sources: List[str],
+        documents: List[Any],
+        corpus_version: Optional[str]
+    ):
+        with self._lock:
+            # an answer generated against a superseded corpus must not be served for the current one
+            if corpus_version != self.corpus_version:
+                return
+            # make room first, so the matrix never holds more than max_entries rows
+            self._drop_expired()
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {
+                "query": query,
+                "answer": answer,
+                "sources": list(sources),
+                "documents": list(documents),
+                "created_at": time.time(),
+                "row": self._add_row(entry_id, self._normalize(embedding))
+            }
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "entries": len(self._entries),
+                "invalidations": self.invalidations,
+                "corpus_version": self.corpus_version
+            }
@@ -1,38 +1,126 @@
-from typing import List, Any
+from typing import List, Any, AsyncIterator, Dict, Optional, Tuple
+import time
 from LLMProvider import LLMProvider
 
 from langchain.schema import Document
 from PromptManager import PromptManager
+from ContextPacker import ContextPacker
+from metrics import record_context_tokens, record_stage, record_tokens, stage
 
 class AnswerGenerator:
 
-    def __init__(self, llm_provider: LLMProvider, prompt_manager: PromptManager):
+    FAILURE_PREFIX = "Failed to generate an answer"
+
+    def __init__(
+        self,
+        llm_provider: LLMProvider,
+        prompt_manager: PromptManager,
+        context_packer: Optional[ContextPacker] = None
+    ):
         self.llm_provider = llm_provider
         self.prompt_manager = prompt_manager
+        # when set, overlapping chunks are merged and the context is fit to a token budget
+        self.context_packer = context_packer
         self.generation_prompt = self.prompt_manager.get_prompt("generation_prompt")
     
     def format_context(self, documents: List[Document]) -> str:
-        return "\n\n".join([doc.page_content for doc in documents])
+        return self.pack_context(documents)[0]
+    
+    def pack_context(self, documents: List[Document]) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """Return the context for the documents and the packing statistics (None without a packer)."""
+        if self.context_packer is None:
+            return "\n\n".join([doc.page_content for doc in documents]), None
+        with stage("pack_context"):
+            context, stats = self.context_packer.pack(documents)
+        record_context_tokens(stats)
+        return context, stats
     
+    @staticmethod
+    def record_usage(response: Any):
+        """Count the prompt and completion tokens the LLM reports for a response or the last stream chunk."""
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            record_tokens("prompt", usage.get("input_tokens", 0))
+            record_tokens("completion", usage.get("output_tokens", 0))
+
     def handle_response(self, response: Any) -> str:
         if hasattr(response, 'content'):
             return response.content
         return str(response)
 
-    def generate_answer(self, query: str, documents: List[Document]) -> str:
+    def build_prompt(self, query: str, documents: List[Document], context_stats: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Build the generation prompt.
+        
+        Args:
+            query: User query string
+            documents: Retrieved documents, most relevant first
+            context_stats: Optional dictionary that receives the context packing statistics
+        """
+        context, stats = self.pack_context(documents)
+        if context_stats is not None and stats is not None:
+            context_stats.update(stats)
+        return self.generation_prompt.format(
+            context=context,
+            question=query
+        )
+
+    def generate_answer(self, query: str, documents: List[Document], context_stats: Optional[Dict[str, Any]] = None) -> str:
         try:
-            context = self.format_context(documents)
-            
-            prompt = self.generation_prompt.format(
-                context=context,
-                question=query
-            )
+            prompt = self.build_prompt(query, documents, context_stats)
 
             llm = self.llm_provider.get_llm()
-            response = llm.invoke(prompt)
+            with stage("llm"):
+                response = llm.invoke(prompt)
+            self.record_usage(response)
 
             return self.handle_response(response)
 
         except Exception as e:
             print(f"Error generating answer: {e}")
-            return f"Failed to generate an answer: {str(e)}"
\ No newline at end of file
+            return f"{self.FAILURE_PREFIX}: {str(e)}"
+
+    async def agenerate_answer(self, query: str, documents: List[Document], context_stats: Optional[Dict[str, Any]] = None) -> str:
+        try:
+            prompt = self.build_prompt(query, documents, context_stats)
+
+            llm = self.llm_provider.get_llm()
+            with stage("llm"):
+                response = await llm.ainvoke(prompt)
+            self.record_usage(response)
+
+            return self.handle_response(response)
+
+        except Exception as e:
+            print(f"Error generating answer: {e}")
+            return f"{self.FAILURE_PREFIX}: {str(e)}"
+
+
+    async def astream_answer(self, query: str, documents: List[Document], context_stats: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Yield the answer token by token as the LLM produces it."""
+        try:
+            prompt = self.build_prompt(query, documents, context_stats)
+
+            llm = self.llm_provider.get_llm()
+            start_time = time.perf_counter()
+            first_token = True
+            try:
+                async for chunk in llm.astream(prompt):
+                    # usage, when the model reports it, comes with the last chunk
+                    self.record_usage(chunk)
+                    token = self.handle_response(chunk)
+                    if token:
+                        if first_token:
+                            record_stage("llm_first_token", time.perf_counter() - start_time)
+                            first_token = False
+                        yield token
+            finally:
+                record_stage("llm", time.perf_counter() - start_time)
+
+        except Exception as e:
+            print(f"Error generating answer: {e}")
+            yield f"{self.FAILURE_PREFIX}: {str(e)}"
+
+
+    def is_failure(self, answer: str) -> bool:
+        return answer.startswith(self.FAILURE_PREFIX)
@@ -0,0 +1,164 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+
+
+class BM25Index:
+    """
+    In-process BM25 inverted index over the indexed chunks.
+
+    Postings map each term to (document number, term frequency) pairs. Chunks
+    are added and removed by chunk id, so the index follows the incremental
+    updates of the vector store, and it is persisted as JSON next to it. Only
+    ids, lengths and postings are kept; the text and metadata of the top hits
+    are fetched from the vector store, which holds them anyway.
+    """
+
+    TOKEN_PATTERN = re.compile(r"\w+")
+
+    def __init__(
+        self,
+        path: str,
+        k1: float = 1.5,
+        b: float = 0.75,
+        get_documents: Optional[Callable[[List[str]], List[Document]]] = None
+    ):
+        """
+        Initialize the BM25 index, loading it from path if it exists.
+
+        Args:
+            path: JSON file the index is persisted to
+            k1: Term frequency saturation parameter
+            b: Document length normalization parameter
+            get_documents: Fetches stored chunks by id, e.g. ChromaDBManager.get_documents;
+                IndexManager sets it to its vector store's when it is not given
+        """
+        self.path = path
+        self.get_documents = get_documents
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._docs: Dict[int, Dict[str, Any]] = {}
+        self._numbers: Dict[str, int] = {}
+        self._next_number = 0
+        self._total_length = 0
+        self.load()
+
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        return cls.TOKEN_PATTERN.findall(text.lower())
+
+    def add(self, ids: List[str], texts: List[str], metadatas: List[Optional[Dict[str, Any]]]):
+        with self._lock:
+            for chunk_id, text in zip(ids, texts):
+                # ids are content-derived: an indexed id already has these postings
+                if chunk_id in self._numbers:
+                    continue
+                number = self._next_number
+                self._next_number += 1
+                terms = Counter(self.tokenize(text))
+                length = sum(terms.values())
+                self._numbers[chunk_id] = number
+                self._docs[number] = {"id": chunk_id, "length": length}
+                self._total_length += length
+                for term, frequency in terms.items():
+                    self._postings.setdefault(term, {})[number] = frequency
+
+    def remove(self, ids: List[str]):
+        with self._lock:
+            numbers = set()
+            for chunk_id in ids:
+                number = self._numbers.pop(chunk_id, None)
+                if number is not None:
+                    numbers.add(number)
+                    self._total_length -= self._docs.pop(number)["length"]
+            if not numbers:
+                return
+            # the terms of a chunk are not kept, so one pass over the postings drops all of them
+            for term in list(self._postings):
+                postings = self._postings[term]
+                for number in numbers.intersection(postings):
+                    del postings[number]
+                if not postings:
+                    del self._postings[term]
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        """Return the k best (Document, score) pairs for the query, highest score first."""
+        with self._lock:
+            n_docs = len(self._docs)
+            if not n_docs:
+                return []
+            average_length = self._total_length / n_docs
+            scores: Dict[int, float] = {}
+            for term in set(self.tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for number, frequency in postings.items():
+                    length_norm = self.k1 * (1 - self.b + self.b * self._docs[number]["length"] / average_length)
+                    scores[number] = scores.get(number, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + length_norm)
+
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            best = [(self._docs[number]["id"], score) for number, score in best]
+
+        if not best:
+            return []
+        if self.get_documents is None:
+            raise ValueError("BM25Index needs get_documents to return the text of its hits")
+        documents = {doc.id: doc for doc in self.get_documents([chunk_id for chunk_id, _ in best])}
+        # a chunk deleted from the store since the search is skipped
+        return [(documents[chunk_id], score) for chunk_id, score in best if chunk_id in documents]
+
+    def clear(self):
+        with self._lock:
+            self._postings = {}
+            self._docs = {}
+            self._numbers = {}
+            self._next_number = 0
+            self._total_length = 0
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._docs)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        with self._lock:
+            self.clear()
+            # renumber densely on load so removed chunks do not leave gaps
+            for number, doc in enumerate(data["docs"]):
+                # files written before the text was dropped also hold it; it is not kept
+                self._docs[number] = {"id": doc["id"], "length": doc["length"]}
+                self._numbers[doc["id"]] = number
+                self._total_length += doc["length"]
+            old_to_new = {old: new for new, old in enumerate(data["numbers"])}
+            for term, pairs in data["postings"].items():
+                self._postings[term] = {old_to_new[old]: frequency for old, frequency in pairs}
+            self._next_number = len(self._docs)
+
+    def save(self):
+        with self._lock:
+            numbers = list(self._docs)
+            payload = json.dumps({
+                "numbers": numbers,
+                "docs": [self._docs[number] for number in numbers],
+                "postings": {
+                    term: [[number, frequency] for number, frequency in postings.items()]
+                    for term, postings in self._postings.items()
+                }
+            })
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, self.path)
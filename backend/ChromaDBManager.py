@@ -1,7 +1,12 @@
 from langchain_chroma import Chroma
 from langchain.schema import Document
-from typing import List
+from typing import List, Tuple
 from EmbeddingProvider import EmbeddingProvider 
+from EmbeddingCache import EmbeddingCache
+from EmbeddingScheduler import EmbeddingScheduler
+import hashlib
+from blocking_executor import run_blocking
+from metrics import stage
 
 from typing import Optional
 
@@ -12,11 +17,17 @@ class ChromaDBManager:
         path: str,
         collection_name: str = 'Book',
         openai_api_key: Optional[str] = None,
-        model_name: str = "text-embedding-3-small"
+        model_name: str = "text-embedding-3-small",
+        embedding_cache: Optional[EmbeddingCache] = None,
+        embedding_scheduler: Optional[EmbeddingScheduler] = None,
+        embedding_function: Optional[EmbeddingProvider] = None
     ):
-        self.embedding_function = EmbeddingProvider(
+        # an injected provider (e.g. FakeEmbeddingProvider for offline benchmarks) replaces the OpenAI one
+        self.embedding_function = embedding_function or EmbeddingProvider(
             model_name=model_name,
-            openai_api_key=openai_api_key
+            openai_api_key=openai_api_key,
+            cache=embedding_cache,
+            scheduler=embedding_scheduler
         )
         self.vector_store = Chroma(
             collection_name=collection_name,
@@ -24,15 +35,123 @@ class ChromaDBManager:
             embedding_function=self.embedding_function
         )
 
-    def add_documents(self, documents: List[Document]):
-        ids = [f"doc_{i}" for i in range(len(documents))]
-        self.vector_store.add_documents(documents=documents, ids=ids)
+    @staticmethod
+    def make_chunk_id(document: Document) -> str:
+        """Stable id derived from the chunk's source, position and content."""
+        metadata = document.metadata or {}
+        key = f"{metadata.get('source', '')}\x00{metadata.get('chunk_id', '')}\x00{document.page_content}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None) -> List[str]:
+        if not documents:
+            return []
+        if ids is None:
+            ids = [self.make_chunk_id(doc) for doc in documents]
+        texts = [doc.page_content for doc in documents]
+        # embed everything in one call so the scheduler can batch and parallelize across all chunks
+        embeddings = self.embedding_function.embed_documents(texts)
+        self.upsert_embeddings(ids, texts, embeddings, [doc.metadata for doc in documents])
         # manual persist no longer needed
         print(f"Stored {len(documents)} documents.")
+        return ids
+
+    @stage("vector_upsert")
+    def upsert_embeddings(
+        self,
+        ids: List[str],
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[dict]
+    ):
+        # ids are content-derived, so re-adding the same chunk upserts instead of duplicating
+        batch_size = self.vector_store._client.get_max_batch_size()
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            self.vector_store._collection.upsert(
+                ids=ids[start:end],
+                embeddings=embeddings[start:end],
+                documents=texts[start:end],
+                metadatas=[metadata or None for metadata in metadatas[start:end]]
+            )
+
+    def get_documents(self, ids: List[str]) -> List[Document]:
+        """Fetch stored chunks by id, in no particular order."""
+        results = self.vector_store._collection.get(ids=ids, include=["documents", "metadatas"])
+        return [
+            Document(page_content=text, metadata=metadata or {}, id=chunk_id)
+            for chunk_id, text, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+        ]
+
+    def get_ids(self) -> List[str]:
+        return self.vector_store._collection.get(include=[])["ids"]
+
+    def delete_documents(self, ids: List[str]):
+        if ids:
+            self.vector_store.delete(ids=ids)
+
+    def delete_by_source(self, source: str):
+        self.vector_store._collection.delete(where={"source": source})
 
     def similarity_search(self, query: str, k: int = 2) -> List[Document]:
         return self.vector_store.similarity_search(query, k)
 
+    async def asimilarity_search(self, query: str, k: int = 2) -> List[Document]:
+        embedding = await self.aembed_query(query)
+        return await self.asimilarity_search_by_vector(embedding, k)
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.embedding_function.embed_query(query)
+
+    async def aembed_query(self, query: str) -> List[float]:
+        return await self.embedding_function.aembed_query(query)
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed many queries at once through the batched (cached, scheduled) document path."""
+        return self.embedding_function.embed_documents(queries)
+
+    async def aembed_queries(self, queries: List[str]) -> List[List[float]]:
+        return await self.embedding_function.aembed_documents(queries)
+
+    @stage("vector_search")
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 2) -> List[Document]:
+        return self.vector_store.similarity_search_by_vector(embedding, k)
+
+    @stage("vector_search")
+    def similarity_search_by_vectors(self, embeddings: List[List[float]], k: int = 2) -> List[List[Document]]:
+        """Search several query embeddings with one multi-query call per batch."""
+        results = []
+        batch_size = self.vector_store._client.get_max_batch_size()
+        for start in range(0, len(embeddings), batch_size):
+            response = self.vector_store._collection.query(
+                query_embeddings=embeddings[start:start + batch_size],
+                n_results=k,
+                include=["documents", "metadatas"]
+            )
+            for ids, texts, metadatas in zip(response["ids"], response["documents"], response["metadatas"]):
+                results.append([
+                    Document(page_content=text, metadata=metadata or {}, id=chunk_id)
+                    for chunk_id, text, metadata in zip(ids, texts, metadatas)
+                ])
+        return results
+
+    @stage("vector_search")
+    def similarity_search_by_vector_with_scores(self, embedding: List[float], k: int = 2) -> List[Tuple[Document, float]]:
+        """Search with one query embedding; each document comes with its relevance score, higher is more similar."""
+        relevance = self.vector_store._select_relevance_score_fn()
+        return [
+            (doc, relevance(distance))
+            for doc, distance in self.vector_store.similarity_search_by_vector_with_relevance_scores(embedding, k)
+        ]
+
+    async def asimilarity_search_by_vectors(self, embeddings: List[List[float]], k: int = 2) -> List[List[Document]]:
+        return await run_blocking(self.similarity_search_by_vectors, embeddings, k)
+
+    async def asimilarity_search_by_vector(self, embedding: List[float], k: int = 2) -> List[Document]:
+        return await run_blocking(self.similarity_search_by_vector, embedding, k)
+
+    async def asimilarity_search_by_vector_with_scores(self, embedding: List[float], k: int = 2) -> List[Tuple[Document, float]]:
+        return await run_blocking(self.similarity_search_by_vector_with_scores, embedding, k)
+
     def max_marginal_relevance_search(
         self,
         query: str,
@@ -41,5 +160,20 @@ class ChromaDBManager:
     ) -> List[Document]:
         return self.vector_store.max_marginal_relevance_search(query, k=k, fetch_k=fetch_k)
 
+    async def amax_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 2,
+        fetch_k: int = 12
+    ) -> List[Document]:
+        embedding = await self.aembed_query(query)
+        return await run_blocking(
+            self.vector_store.max_marginal_relevance_search_by_vector, embedding, k=k, fetch_k=fetch_k
+        )
+
     def get_collection_count(self) -> int:
-        return self.vector_store._collection.count()
\ No newline at end of file
+        return self.vector_store._collection.count()
+
+    def delete_collection(self):
+        """Drop the collection from the database; the manager must not be used afterwards."""
+        self.vector_store.delete_collection()
\ No newline at end of file
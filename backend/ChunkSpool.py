@@ -0,0 +1,60 @@
+import json
+import os
+import shutil
+import tempfile
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class ChunkSpool:
+    """
+    On-disk staging area for embedded chunks.
+
+    Ingestion appends embedded batches here instead of holding them in memory,
+    and the commit step streams them back into the vector store in batches.
+    Chunk records go to a JSONL file, vectors to a flat float32 file.
+    """
+
+    def __init__(self, parent_directory: str):
+        os.makedirs(parent_directory, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix="spool_", dir=parent_directory)
+        self.count = 0
+        self.dimension: Optional[int] = None
+        self._records = open(os.path.join(self.directory, "chunks.jsonl"), "w", encoding="utf-8")
+        self._vectors = open(os.path.join(self.directory, "embeddings.f32"), "wb")
+
+    def append(self, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]], embeddings: List[List[float]]):
+        for chunk_id, text, metadata, embedding in zip(ids, texts, metadatas, embeddings):
+            if self.dimension is None:
+                self.dimension = len(embedding)
+            self._records.write(json.dumps({"id": chunk_id, "text": text, "metadata": metadata}) + "\n")
+            self._vectors.write(array("f", embedding).tobytes())
+        self.count += len(ids)
+
+    def iter_batches(self, batch_size: int) -> Iterator[Tuple[List[str], List[str], List[Dict[str, Any]], List[List[float]]]]:
+        """Yield (ids, texts, metadatas, embeddings) batches in the order they were appended."""
+        self._records.flush()
+        self._vectors.flush()
+        if not self.count:
+            return
+
+        row_bytes = self.dimension * 4
+        with open(self._records.name, "r", encoding="utf-8") as records, open(self._vectors.name, "rb") as vectors:
+            while True:
+                lines = [line for line in (records.readline() for _ in range(batch_size)) if line]
+                if not lines:
+                    return
+                flat = array("f")
+                flat.frombytes(vectors.read(row_bytes * len(lines)))
+                rows = [json.loads(line) for line in lines]
+                yield (
+                    [row["id"] for row in rows],
+                    [row["text"] for row in rows],
+                    [row["metadata"] for row in rows],
+                    [flat[i * self.dimension:(i + 1) * self.dimension].tolist() for i in range(len(rows))]
+                )
+
+    def cleanup(self):
+        self._records.close()
+        self._vectors.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
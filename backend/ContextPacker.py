@@ -0,0 +1,144 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+
+from EmbeddingProvider import _get_encoding
+
+
+class ContextPacker:
+    """
+    Packs retrieved chunks into a prompt context under a token budget.
+
+    Chunks from the same source with consecutive chunk ids are merged, dropping
+    the text the splitter repeated between them (chunk_overlap). The merged
+    segments are then added in relevance order, the rank of a segment being the
+    best rank of its chunks, until the budget is used up; the segment that
+    crosses the budget is cut at a token boundary.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 3000,
+        model_name: str = "gpt-4o-mini",
+        min_overlap: int = 20,
+        min_segment_tokens: int = 50,
+        separator: str = "\n\n"
+    ):
+        """
+        Initialize the context packer.
+
+        Args:
+            max_tokens: Token budget of the packed context
+            model_name: Model whose tokenizer is used to count tokens
+            min_overlap: Minimum overlap in characters for two adjacent chunks to be merged
+            min_segment_tokens: A segment is only cut to fit if at least this many tokens remain
+            separator: Text placed between segments, as in AnswerGenerator.format_context
+        """
+        self.max_tokens = max_tokens
+        self.model_name = model_name
+        self.min_overlap = min_overlap
+        self.min_segment_tokens = min_segment_tokens
+        self.separator = separator
+
+    def count_tokens(self, text: str) -> int:
+        encoding = _get_encoding(self.model_name)
+        if encoding is None:
+            return len(text) // 4 + 1
+        return len(encoding.encode_ordinary(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        encoding = _get_encoding(self.model_name)
+        if encoding is None:
+            return text[:max_tokens * 4]
+        return encoding.decode(encoding.encode_ordinary(text)[:max_tokens])
+
+    @staticmethod
+    def overlap(left: str, right: str) -> int:
+        """Length of the longest suffix of left that is also a prefix of right (KMP failure function)."""
+        left = left[-len(right):]
+        pattern = f"{right}\x00{left}"
+        failure = [0] * len(pattern)
+        for i in range(1, len(pattern)):
+            k = failure[i - 1]
+            while k and pattern[i] != pattern[k]:
+                k = failure[k - 1]
+            if pattern[i] == pattern[k]:
+                k += 1
+            failure[i] = k
+        return failure[-1]
+
+    def merge(self, documents: List[Document]) -> List[Dict[str, Any]]:
+        """
+        Merge adjacent overlapping chunks of the same source.
+
+        Returns:
+            Segments ordered by relevance, each with its text, source, chunk ids and rank
+        """
+        segments = []
+        by_source: Dict[Any, List[Tuple[int, int, Document]]] = {}
+        seen_texts = set()
+        for rank, doc in enumerate(documents):
+            if doc.page_content in seen_texts:
+                continue
+            seen_texts.add(doc.page_content)
+            metadata = doc.metadata or {}
+            if metadata.get("source") is None or not isinstance(metadata.get("chunk_id"), int):
+                segments.append({"text": doc.page_content, "source": metadata.get("source"), "chunk_ids": [], "rank": rank})
+                continue
+            by_source.setdefault(metadata["source"], []).append((metadata["chunk_id"], rank, doc))
+
+        for source, chunks in by_source.items():
+            segment = None
+            for chunk_id, rank, doc in sorted(chunks, key=lambda chunk: chunk[0]):
+                text = doc.page_content
+                if segment is not None and chunk_id == segment["chunk_ids"][-1] + 1:
+                    overlap = self.overlap(segment["text"], text)
+                    if overlap >= self.min_overlap:
+                        segment["text"] += text[overlap:]
+                        segment["chunk_ids"].append(chunk_id)
+                        segment["rank"] = min(segment["rank"], rank)
+                        continue
+                segment = {"text": text, "source": source, "chunk_ids": [chunk_id], "rank": rank}
+                segments.append(segment)
+
+        return sorted(segments, key=lambda segment: segment["rank"])
+
+    def pack(self, documents: List[Document]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Build the context for a list of documents ordered by relevance.
+
+        Returns:
+            The packed context and statistics: input_tokens (the verbatim join of every
+            chunk), packed_tokens, tokens_saved, chunks, segments, dropped_segments and
+            whether a segment was truncated
+        """
+        input_tokens = self.count_tokens(self.separator.join(doc.page_content for doc in documents)) if documents else 0
+        segments = self.merge(documents)
+
+        parts = []
+        remaining = self.max_tokens
+        separator_tokens = self.count_tokens(self.separator)
+        truncated = False
+        for segment in segments:
+            cost = self.count_tokens(segment["text"]) + (separator_tokens if parts else 0)
+            if cost <= remaining:
+                parts.append(segment["text"])
+                remaining -= cost
+                continue
+            available = remaining - (separator_tokens if parts else 0)
+            if available >= self.min_segment_tokens:
+                parts.append(self.truncate(segment["text"], available))
+                truncated = True
+            break
+
+        context = self.separator.join(parts)
+        packed_tokens = self.count_tokens(context) if parts else 0
+        return context, {
+            "input_tokens": input_tokens,
+            "packed_tokens": packed_tokens,
+            "tokens_saved": max(input_tokens - packed_tokens, 0),
+            "chunks": len(documents),
+            "segments": len(segments),
+            "dropped_segments": len(segments) - len(parts),
+            "truncated": truncated
+        }
@@ -1,31 +1,161 @@
 from langchain_community.embeddings import OpenAIEmbeddings
-from typing import List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 import os
+import tiktoken
+from functools import lru_cache
 from dotenv import load_dotenv
+from blocking_executor import run_blocking
+from OpenAIClientRegistry import get_client_registry
+from metrics import record_cache, stage
 
 load_dotenv()
 
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        # tokenizer files unavailable (e.g. offline): callers fall back to a 4 chars/token estimate
+        return None
+
+
 class EmbeddingProvider(OpenAIEmbeddings):
 
+    # EmbeddingCache instance; when set only cache misses are sent to OpenAI
+    cache: Optional[Any] = None
+    # EmbeddingScheduler instance; when set misses are embedded in concurrent token-budgeted batches
+    scheduler: Optional[Any] = None
+
     def __init__(
         self,
         model_name: str = "text-embedding-3-small",
-        openai_api_key: Optional[str] = None
+        openai_api_key: Optional[str] = None,
+        cache: Optional[Any] = None,
+        scheduler: Optional[Any] = None
     ):
         supported_models = ["text-embedding-ada-002", "text-embedding-3-small", "text-embedding-3-large"]
         if model_name not in supported_models:
             raise ValueError(f"Unsupported model: {model_name}. Choose from {supported_models}")
-        
+
         openai_api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
         if not openai_api_key:
             raise ValueError("OpenAI API key is required")
-        
-        super().__init__(model=model_name, openai_api_key=openai_api_key)
 
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-     
+        registry = get_client_registry()
+        super().__init__(
+            model=model_name,
+            openai_api_key=openai_api_key,
+            cache=cache,
+            scheduler=scheduler,
+            client=registry.openai_client(openai_api_key).embeddings,
+            async_client=registry.async_openai_client(openai_api_key).embeddings
+        )
+        if self.scheduler is not None and self.scheduler.count_tokens is None:
+            self.scheduler.count_tokens = self._count_tokens
+
+    def _count_tokens(self, text: str) -> int:
+        encoding = _get_encoding(self.model)
+        if encoding is None:
+            return len(text) // 4 + 1
+        return len(encoding.encode_ordinary(text))
+
+    def _embed_with_cache(self, texts: List[str], embed: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        if self.cache is None or not texts:
+            with stage("embed"):
+                return embed(texts)
+
+        vectors = self.cache.get_many(self.model, texts)
+        missing = self._group_misses(texts, vectors)
+        misses = sum(len(indices) for indices in missing.values())
+        record_cache("embedding", len(texts) - misses, misses)
+
+        if missing:
+            missing_texts = [texts[indices[0]] for indices in missing.values()]
+            with stage("embed"):
+                new_vectors = embed(missing_texts)
+            self.cache.put_many(self.model, missing_texts, new_vectors)
+            self._fill_misses(vectors, missing, new_vectors)
+
+        return vectors
+
+    def _group_misses(self, texts: List[str], vectors: List[Optional[List[float]]]) -> Dict[str, List[int]]:
+        """Group cache misses by cache key so every distinct missing text is embedded once."""
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                key = self.cache.make_key(self.model, texts[i])
+                missing.setdefault(key, []).append(i)
+        return missing
+
+    @staticmethod
+    def _fill_misses(vectors: List[Optional[List[float]]], missing: Dict[str, List[int]], new_vectors: List[List[float]]):
+        for indices, vector in zip(missing.values(), new_vectors):
+            for i in indices:
+                vectors[i] = vector
+
+    async def _aembed_with_cache(
+        self,
+        texts: List[str],
+        aembed: Callable[[List[str]], Awaitable[List[List[float]]]]
+    ) -> List[List[float]]:
+        if self.cache is None or not texts:
+            with stage("embed"):
+                return await aembed(texts)
+
+        # SQLite lookups are blocking, keep them off the event loop
+        vectors = await run_blocking(self.cache.get_many, self.model, texts)
+        missing = self._group_misses(texts, vectors)
+        misses = sum(len(indices) for indices in missing.values())
+        record_cache("embedding", len(texts) - misses, misses)
+
+        if missing:
+            missing_texts = [texts[indices[0]] for indices in missing.values()]
+            with stage("embed"):
+                new_vectors = await aembed(missing_texts)
+            await run_blocking(self.cache.put_many, self.model, missing_texts, new_vectors)
+            self._fill_misses(vectors, missing, new_vectors)
+
+        return vectors
+
+    # The four methods below are the only ones that call the OpenAI API; FakeEmbeddingProvider overrides them.
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
         return super().embed_documents(texts)
 
+    async def _aembed_batch(self, texts: List[str]) -> List[List[float]]:
+        return await super().aembed_documents(texts)
+
+    # OpenAIEmbeddings implements embed_query as self.embed_documents([text]), which would re-enter
+    # the cached override below; call the base class's method unbound to reach the client directly.
+
+    def _embed_one(self, text: str) -> List[float]:
+        return OpenAIEmbeddings.embed_documents(self, [text])[0]
+
+    async def _aembed_one(self, text: str) -> List[float]:
+        return (await OpenAIEmbeddings.aembed_documents(self, [text]))[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+
+        if self.scheduler is not None:
+            return self._embed_with_cache(texts, lambda batch: self.scheduler.run(batch, self._embed_batch))
+        return self._embed_with_cache(texts, self._embed_batch)
+
     def embed_query(self, query: str) -> List[float]:
-       
-        return super().embed_query(query)
\ No newline at end of file
+
+        return self._embed_with_cache([query], lambda texts: [self._embed_one(texts[0])])[0]
+
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+
+        if self.scheduler is not None:
+            # the scheduler manages its own thread pool
+            return await run_blocking(self.embed_documents, texts)
+        return await self._aembed_with_cache(texts, self._aembed_batch)
+
+    async def aembed_query(self, query: str) -> List[float]:
+
+        async def aembed(texts: List[str]) -> List[List[float]]:
+            return [await self._aembed_one(texts[0])]
+
+        return (await self._aembed_with_cache([query], aembed))[0]
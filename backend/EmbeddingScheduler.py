@@ -0,0 +1,164 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+from metrics import increment
+
+
+class EmbeddingScheduler:
+    """
+    Packs texts into token-budgeted batches and embeds them concurrently.
+
+    Batches run on one bounded thread pool shared by all runs, so concurrent runs
+    together never have more than max_concurrency requests in flight; a single text
+    within the budget is embedded directly in the caller's thread. A failed batch is
+    retried on its own (split in half when it holds more than one text) after an
+    exponential backoff, and the token budget shrinks on failures and grows back on
+    successes so later batches adapt to what the API accepts.
+    """
+
+    def __init__(
+        self,
+        max_batch_tokens: int = 50000,
+        max_batch_size: int = 512,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+        retry_delay: float = 1.0,
+        min_batch_tokens: int = 2000,
+        count_tokens: Optional[Callable[[str], int]] = None
+    ):
+        """
+        Initialize the embedding scheduler.
+
+        Args:
+            max_batch_tokens: Upper bound for the tokens sent in one request
+            max_batch_size: Upper bound for the texts sent in one request
+            max_concurrency: Number of requests in flight at the same time
+            max_retries: Attempts per batch before the whole run fails
+            retry_delay: Base delay in seconds for the exponential backoff
+            min_batch_tokens: Lower bound the adaptive token budget shrinks to
+            count_tokens: Function returning the token count of a text
+        """
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.min_batch_tokens = min(min_batch_tokens, max_batch_tokens)
+        self.count_tokens = count_tokens
+        self.batch_tokens = max_batch_tokens
+        self.last_stats: Dict[str, float] = {}
+        # run() is called from several threads at once (ingestion jobs, queries on the blocking executor)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="embedding")
+
+    def _shrink(self):
+        with self._lock:
+            self.batch_tokens = max(self.min_batch_tokens, self.batch_tokens // 2)
+
+    def _grow(self):
+        with self._lock:
+            self.batch_tokens = min(self.max_batch_tokens, int(self.batch_tokens * 1.25))
+
+    def _next_batch(self, token_counts: List[int], start: int) -> List[int]:
+        """Take texts from start until the token budget or the batch size is reached."""
+        batch = [start]
+        tokens = token_counts[start]
+        i = start + 1
+        while (
+            i < len(token_counts)
+            and len(batch) < self.max_batch_size
+            and tokens + token_counts[i] <= self.batch_tokens
+        ):
+            tokens += token_counts[i]
+            batch.append(i)
+            i += 1
+        return batch
+
+    @staticmethod
+    def _call(embed_batch: Callable[[List[str]], List[List[float]]], texts: List[str], delay: float):
+        if delay:
+            time.sleep(delay)
+        return embed_batch(texts)
+
+    def run(self, texts: List[str], embed_batch: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """
+        Embed texts in scheduled batches.
+
+        Args:
+            texts: Texts to embed
+            embed_batch: Function embedding one batch of texts, e.g. the provider's API call
+
+        Returns:
+            List of vectors in the same order as texts
+        """
+        if not texts:
+            return []
+
+        count_tokens = self.count_tokens or (lambda text: len(text) // 4 + 1)
+        token_counts = [count_tokens(text) for text in texts]
+        if len(texts) == 1 and token_counts[0] <= self.batch_tokens:
+            # a query: nothing to batch, so skip the thread hop
+            return embed_batch(texts)
+
+        start_time = time.time()
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        retry_queue = deque()
+        cursor = 0
+        batches = 0
+        retries = 0
+
+        pending = {}
+        while cursor < len(texts) or retry_queue or pending:
+            while len(pending) < self.max_concurrency and (retry_queue or cursor < len(texts)):
+                if retry_queue:
+                    indices, attempt = retry_queue.popleft()
+                    delay = self.retry_delay * (2 ** (attempt - 1))
+                else:
+                    indices, attempt, delay = self._next_batch(token_counts, cursor), 0, 0
+                    cursor = indices[-1] + 1
+                future = self._executor.submit(self._call, embed_batch, [texts[i] for i in indices], delay)
+                pending[future] = (indices, attempt)
+                batches += 1
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                indices, attempt = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if attempt >= self.max_retries:
+                        increment("embedding_batches_total", outcome="failed")
+                        for other in pending:
+                            other.cancel()
+                        raise RuntimeError(
+                            f"Embedding batch of {len(indices)} texts failed after {attempt + 1} attempts: {e}"
+                        ) from e
+                    increment("embedding_batches_total", outcome="retried")
+                    self._shrink()
+                    retries += 1
+                    if len(indices) > 1:
+                        middle = len(indices) // 2
+                        retry_queue.append((indices[:middle], attempt + 1))
+                        retry_queue.append((indices[middle:], attempt + 1))
+                    else:
+                        retry_queue.append((indices, attempt + 1))
+                    continue
+
+                increment("embedding_batches_total", outcome="ok")
+                self._grow()
+                for i, vector in zip(indices, result):
+                    vectors[i] = vector
+
+        elapsed = time.time() - start_time
+        self.last_stats = {
+            "chunks": len(texts),
+            "tokens": sum(token_counts),
+            "batches": batches,
+            "retries": retries,
+            "seconds": round(elapsed, 3),
+            "chunks_per_second": round(len(texts) / elapsed, 2) if elapsed else float(len(texts))
+        }
+        return vectors
@@ -0,0 +1,194 @@
+import asyncio
+import hashlib
+import math
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.language_models.llms import LLM
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from EmbeddingProvider import EmbeddingProvider
+from LLMProvider import LLMProvider
+
+
+class FakeEmbeddingProvider(EmbeddingProvider):
+    """
+    Drop-in EmbeddingProvider that never calls OpenAI, for benchmarks and offline runs.
+
+    Texts are embedded by feature hashing: every word adds +1 or -1 to a dimension
+    picked by its hash, and the vector is normalized. The same text always gets the
+    same vector and texts that share words are close, so retrieval still behaves
+    sensibly. Only the API calls are replaced; caching, scheduling and metrics run
+    as they do with the real provider.
+    """
+
+    dimension: int = 1536
+    # seconds each simulated API call takes
+    latency: float = 0.0
+
+    def __init__(
+        self,
+        dimension: int = 1536,
+        latency: float = 0.0,
+        model_name: str = "text-embedding-3-small",
+        cache: Optional[Any] = None,
+        scheduler: Optional[Any] = None
+    ):
+        """
+        Initialize the fake embedding provider.
+
+        Args:
+            dimension: Length of the vectors
+            latency: Seconds each simulated API call takes
+            model_name: Model name, used as the embedding cache namespace
+            cache: Optional EmbeddingCache
+            scheduler: Optional EmbeddingScheduler
+        """
+        super().__init__(model_name=model_name, openai_api_key="fake", cache=cache, scheduler=scheduler)
+        self.dimension = dimension
+        self.latency = latency
+
+    def vector(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimension
+        for word in re.findall(r"\w+", text.lower()) or [text]:
+            value = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[value % self.dimension] += 1.0 if value >> 63 else -1.0
+        norm = math.sqrt(sum(component * component for component in vector)) or 1.0
+        return [component / norm for component in vector]
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return [self.vector(text) for text in texts]
+
+    async def _aembed_batch(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency)
+        return [self.vector(text) for text in texts]
+
+    def _embed_one(self, text: str) -> List[float]:
+        return self._embed_batch([text])[0]
+
+    async def _aembed_one(self, text: str) -> List[float]:
+        return (await self._aembed_batch([text]))[0]
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model with canned or echoed answers and simulated latency.
+
+    Without a canned answer it answers with the first words of the context in the
+    prompt, so answers differ per query but stay deterministic.
+    """
+
+    answer: Optional[str] = None
+    # seconds before the first token
+    latency: float = 0.0
+    # seconds between tokens, so longer answers take longer as with a real model
+    token_latency: float = 0.0
+    answer_words: int = 40
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _answer(self, messages: List[BaseMessage]) -> str:
+        if self.answer is not None:
+            return self.answer
+        prompt = str(messages[-1].content) if messages else ""
+        context = prompt.split("Context:", 1)[-1].split("Question:", 1)[0]
+        return " ".join(context.split()[:self.answer_words]) or "I don't know."
+
+    def _usage(self, messages: List[BaseMessage], answer: str):
+        input_tokens = sum(len(str(message.content)) for message in messages) // 4 + 1
+        output_tokens = len(answer.split())
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _duration(self, answer: str) -> float:
+        return self.latency + self.token_latency * len(answer.split())
+
+    def _result(self, messages: List[BaseMessage], answer: str) -> ChatResult:
+        message = AIMessage(content=answer, usage_metadata=self._usage(messages, answer))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        answer = self._answer(messages)
+        time.sleep(self._duration(answer))
+        return self._result(messages, answer)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        answer = self._answer(messages)
+        await asyncio.sleep(self._duration(answer))
+        return self._result(messages, answer)
+
+    def _chunks(self, messages: List[BaseMessage], answer: str) -> List[ChatGenerationChunk]:
+        words = answer.split()
+        chunks = [ChatGenerationChunk(message=AIMessageChunk(content=f"{word} ")) for word in words]
+        # usage comes with the last chunk, as with stream_usage on ChatOpenAI
+        chunks.append(ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, answer))))
+        return chunks
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        for chunk in self._chunks(messages, self._answer(messages)):
+            yield chunk
+            time.sleep(self.token_latency)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for chunk in self._chunks(messages, self._answer(messages)):
+            yield chunk
+            await asyncio.sleep(self.token_latency)
+
+
+class FakeLLMProvider(LLMProvider):
+    """Drop-in LLMProvider backed by FakeChatModel; needs no API key."""
+
+    def __init__(
+        self,
+        answer: Optional[str] = None,
+        latency: float = 0.0,
+        token_latency: float = 0.0,
+        model_name: str = "gpt-4o-mini",
+        max_tokens: int = 300
+    ):
+        """
+        Initialize the fake LLM provider.
+
+        Args:
+            answer: Canned answer; None answers with the start of the context
+            latency: Seconds before the first token
+            token_latency: Seconds between tokens
+            model_name: Model name, used by ContextPacker to count tokens
+            max_tokens: Kept for parity with LLMProvider
+        """
+        self.answer = answer
+        self.latency = latency
+        self.token_latency = token_latency
+        super().__init__(model_name=model_name, openai_api_key="fake", max_tokens=max_tokens)
+
+    def initialize_llm(self):
+        return FakeChatModel(answer=self.answer, latency=self.latency, token_latency=self.token_latency)
+
+
+class FakeMathLLM(LLM):
+    """
+    Completion model that drives MathAgent's ReAct loop without OpenAI: it sends the
+    question to the Calculator tool and returns the observation as the final answer.
+    """
+
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-math"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        time.sleep(self.latency)
+        # the format instructions contain example steps; only what follows the last question is the real run
+        question, _, scratchpad = prompt.rpartition("Question: ")[2].partition("\n")
+        observations = re.findall(r"Observation: (.*)", scratchpad)
+        if observations:
+            return f" I now know the final answer.\nFinal Answer: {observations[-1].strip()}"
+        return f" I should use the calculator.\nAction: Calculator\nAction Input: {question.strip()}"
@@ -0,0 +1,158 @@
+import asyncio
+import heapq
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+
+from RAGPipelineManager import RAGPipelineManager
+
+
+class FanOutSearch:
+    """
+    Answers a query over several namespaces at once.
+
+    Every namespace has its own pipeline over its own collection. The query is embedded
+    once, each pipeline searches only its own shard, all shards are searched in parallel,
+    and the results are merged into one top-k by score before a single answer is
+    generated. A namespace whose search fails is left out instead of failing the query.
+    Fan-out answers are not cached: the answer caches are per namespace.
+    """
+
+    def __init__(self, pipelines: Dict[str, RAGPipelineManager], retrieval_k: Optional[int] = None):
+        """
+        Initialize the fan-out search.
+
+        Args:
+            pipelines: Pipeline of every namespace to search, by namespace name; all must
+                use the same retrieval mode and embedding model so their scores compare
+            retrieval_k: Number of documents kept after merging; defaults to the largest retrieval_k of the pipelines
+        """
+        if not pipelines:
+            raise ValueError("FanOutSearch needs at least one pipeline")
+        self.pipelines = pipelines
+        # the pipelines share the embedding model and the LLM, so any of them can embed and answer
+        self.primary = next(iter(pipelines.values()))
+        self.retrieval_k = retrieval_k or max(pipeline.retrieval_k for pipeline in pipelines.values())
+
+    async def _aembed(self, query: str) -> Tuple[Optional[List[float]], bool]:
+        """Embed the query once for all namespaces. Returns (embedding, use_vector) like the pipelines do."""
+        if self.primary.retrieval_mode == "lexical":
+            return None, True
+        if self.primary.retrieval_mode == "vector":
+            return await self.primary.db_manager.aembed_query(query), True
+        try:
+            return await asyncio.wait_for(self.primary.db_manager.aembed_query(query), self.primary.vector_timeout), True
+        except Exception as e:
+            print(f"Query embedding failed, answering from lexical results: {e!r}")
+            return None, False
+
+    async def aretrieve_documents(self, query: str) -> List[Document]:
+        """
+        Search every namespace in parallel and merge the results by score.
+
+        Args:
+            query: User query string
+
+        Returns:
+            The retrieval_k best documents over all namespaces, each tagged with its
+            namespace in metadata["namespace"]
+        """
+        embedding, use_vector = await self._aembed(query)
+        names = list(self.pipelines)
+        results = await asyncio.gather(
+            *(self.pipelines[name].aretrieve_with_scores(query, embedding, use_vector) for name in names),
+            return_exceptions=True
+        )
+
+        scored = []
+        failures = []
+        for name, result in zip(names, results):
+            if isinstance(result, BaseException):
+                print(f"Search of namespace '{name}' failed, answering from the other namespaces: {result!r}")
+                failures.append(result)
+                continue
+            for doc, score in result:
+                doc.metadata["namespace"] = name
+                scored.append((score, doc))
+        if len(failures) == len(names):
+            raise failures[0]
+
+        best = heapq.nlargest(self.retrieval_k, scored, key=lambda item: item[0])
+        return [doc for _, doc in best]
+
+    def _collect_sources(self, documents: List[Document]) -> List[str]:
+        """Sources of the merged documents, each cited by the pipeline of its own namespace"""
+        sources = []
+        for doc in documents:
+            pipeline = self.pipelines.get(doc.metadata.get("namespace"), self.primary)
+            for source in pipeline._collect_sources([doc]):
+                if source not in sources:
+                    sources.append(source)
+        return sources
+
+    def _build_result(self, query: str, answer: str, retrieved_docs: List[Document], context_stats: Dict[str, Any]) -> Dict[str, Any]:
+        result = self.primary._build_result(query, answer, retrieved_docs, context_stats)
+        result["sources"] = self._collect_sources(retrieved_docs)
+        result["namespaces"] = list(self.pipelines)
+        return result
+
+    async def aprocess_query(self, query: str) -> Dict[str, Any]:
+        """
+        Retrieve from every namespace and answer from the merged documents.
+
+        Args:
+            query: User query string
+
+        Returns:
+            Dictionary containing the answer and metadata about the process, as
+            RAGPipelineManager.aprocess_query returns it, plus the searched namespaces
+        """
+        retrieved_docs = await self.aretrieve_documents(query)
+        context_stats = {}
+        answer = await self.primary.answer_generator.agenerate_answer(query, retrieved_docs, context_stats)
+        return self._build_result(query, answer, retrieved_docs, context_stats)
+
+    async def astream_query(self, query: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of aprocess_query, with the events of RAGPipelineManager.astream_query.
+
+        Args:
+            query: User query string
+
+        Yields:
+            Event dictionaries with an "event" name ("sources", "token", "done") and "data"
+        """
+        start_time = time.perf_counter()
+        retrieved_docs = await self.aretrieve_documents(query)
+
+        yield {
+            "event": "sources",
+            "data": {
+                "query": query,
+                "sources": self._collect_sources(retrieved_docs),
+                "num_docs_retrieved": len(retrieved_docs),
+                "namespaces": list(self.pipelines)
+            }
+        }
+
+        time_to_first_token = None
+        tokens = []
+        context_stats = {}
+        async for token in self.primary.answer_generator.astream_answer(query, retrieved_docs, context_stats):
+            if time_to_first_token is None:
+                time_to_first_token = time.perf_counter() - start_time
+            tokens.append(token)
+            yield {"event": "token", "data": {"token": token}}
+
+        total_time = time.perf_counter() - start_time
+        yield {
+            "event": "done",
+            "data": {
+                "answer": "".join(tokens),
+                "cached": False,
+                "context": context_stats or None,
+                "time_to_first_token": round(time_to_first_token if time_to_first_token is not None else total_time, 3),
+                "total_time": round(total_time, 3)
+            }
+        }
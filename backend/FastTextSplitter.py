@@ -0,0 +1,156 @@
+import copy
+import re
+from typing import Dict, List, Tuple
+
+import numpy as np
+import tiktoken
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+_token_byte_lengths: Dict[str, np.ndarray] = {}
+
+
+def _byte_lengths(encoding: tiktoken.Encoding) -> np.ndarray:
+    """Length in bytes of every token of the encoding."""
+    if encoding.name not in _token_byte_lengths:
+        _token_byte_lengths[encoding.name] = np.array(
+            [len(encoding.decode_single_token_bytes(token)) for token in range(encoding.n_vocab)],
+            dtype=np.int64
+        )
+    return _token_byte_lengths[encoding.name]
+
+
+class FastTextSplitter:
+    """
+    Token-length text splitter with the output of
+    RecursiveCharacterTextSplitter.from_tiktoken_encoder, without its repeated encoding.
+
+    The reference splitter measures every piece with its own encode() call, several
+    times per piece while merging. Here each document is encoded once and the token
+    count of every piece is read off the token byte offsets; the pieces are then merged
+    with the reference algorithm. Cleaned text (single spaces, no line breaks) takes the
+    fast path; any other text, or text whose piece boundaries do not fall on token
+    boundaries, is handed to the reference splitter, so the output is always the same.
+    """
+
+    # the reference splitter would first split on line breaks; cleaned text has none
+    UNSUPPORTED = re.compile(r"[^\S ]")
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, encoding_name: str = "gpt2"):
+        """
+        Initialize the splitter.
+
+        Args:
+            chunk_size: Maximum chunk length in tokens
+            chunk_overlap: Overlap between consecutive chunks in tokens
+            encoding_name: tiktoken encoding the lengths are measured with
+        """
+        self.reference = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            encoding_name=encoding_name, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.encoding = tiktoken.get_encoding(encoding_name)
+        self.token_bytes = _byte_lengths(self.encoding)
+        self._char_lengths: Dict[str, int] = {}
+
+    def _encode(self, text: str) -> List[int]:
+        return self.encoding.encode(text, allowed_special=set(), disallowed_special="all")
+
+    def _char_length(self, char: str) -> int:
+        length = self._char_lengths.get(char)
+        if length is None:
+            length = self._char_lengths[char] = len(self._encode(char))
+        return length
+
+    def _merge(self, data: bytes, starts: List[int], ends: List[int], lengths: List[int]) -> List[str]:
+        """Merge consecutive pieces (byte ranges of data) into chunks, exactly as TextSplitter._merge_splits does."""
+        chunks = []
+        first = 0
+        total = 0
+        for index, length in enumerate(lengths):
+            if total + length > self.chunk_size:
+                if first < index:
+                    chunk = data[starts[first]:ends[index - 1]].decode("utf-8").strip()
+                    if chunk:
+                        chunks.append(chunk)
+                    while total > self.chunk_overlap or (total + length > self.chunk_size and total > 0):
+                        total -= lengths[first]
+                        first += 1
+            total += length
+        if first < len(lengths):
+            chunk = data[starts[first]:ends[-1]].decode("utf-8").strip()
+            if chunk:
+                chunks.append(chunk)
+        return chunks
+
+    def _split_characters(self, text: str) -> List[str]:
+        """The reference splitter's last resort: merge single characters."""
+        data = text.encode("utf-8")
+        starts, ends, lengths = [], [], []
+        chunks = []
+        offset = 0
+        for char in text:
+            size = len(char.encode("utf-8"))
+            length = self._char_length(char)
+            if length < self.chunk_size:
+                starts.append(offset)
+                ends.append(offset + size)
+                lengths.append(length)
+            else:
+                if lengths:
+                    chunks.extend(self._merge(data, starts, ends, lengths))
+                    starts, ends, lengths = [], [], []
+                chunks.append(char)
+            offset += size
+        if lengths:
+            chunks.extend(self._merge(data, starts, ends, lengths))
+        return chunks
+
+    def _piece_lengths(self, text: str, data: bytes) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Byte ranges and token counts of the pieces the reference splitter cuts on spaces
+        (each piece starts with its space), or empty arrays when a piece boundary falls
+        inside a token.
+        """
+        spaces = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 32)
+        ends = np.append(spaces[spaces > 0], len(data))
+        starts = np.concatenate(([0], ends[:-1]))
+        token_ends = np.cumsum(self.token_bytes[np.asarray(self._encode(text), dtype=np.int64)])
+        counts = np.searchsorted(token_ends, ends, side="right")
+        if not np.array_equal(token_ends[counts - 1], ends):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return starts, ends, np.diff(counts, prepend=0)
+
+    def split_text(self, text: str) -> List[str]:
+        if not text or self.UNSUPPORTED.search(text):
+            return self.reference.split_text(text)
+        if " " not in text:
+            return self._split_characters(text)
+
+        data = text.encode("utf-8")
+        starts, ends, lengths = self._piece_lengths(text, data)
+        if not len(lengths):
+            return self.reference.split_text(text)
+
+        chunks = []
+        starts, ends, lengths = starts.tolist(), ends.tolist(), lengths.tolist()
+        good = 0
+        for index, length in enumerate(lengths):
+            if length < self.chunk_size:
+                continue
+            # a piece too long on its own: merge what came before it and split it by characters
+            if good < index:
+                chunks.extend(self._merge(data, starts[good:index], ends[good:index], lengths[good:index]))
+            chunks.extend(self._split_characters(data[starts[index]:ends[index]].decode("utf-8")))
+            good = index + 1
+        if good < len(lengths):
+            chunks.extend(self._merge(data, starts[good:], ends[good:], lengths[good:]))
+        return chunks
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        chunks = []
+        for document in documents:
+            for text in self.split_text(document.page_content):
+                chunks.append(Document(page_content=text, metadata=copy.deepcopy(document.metadata)))
+        return chunks
@@ -0,0 +1,618 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from ChromaDBManager import ChromaDBManager
+from ChunkSpool import ChunkSpool
+from BM25Index import BM25Index
+from IndexSnapshot import IndexSnapshot
+from NearDuplicateFilter import NearDuplicateFilter
+from TextProcessor import TextProcessor
+
+ProgressCallback = Callable[[str, int, int], None]
+
+_DONE = object()
+
+
+def _prefetch(iterable: Iterable[Any], maxsize: int) -> Iterator[Any]:
+    """Run an iterable in a background thread, buffering at most maxsize items ahead of the consumer."""
+    buffer = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(e)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+class IndexManager:
+    """
+    Keeps the vector store in sync with the documents directory.
+
+    A per-file manifest (content hash -> chunk ids) is persisted next to the
+    vector store, so a sync only loads, splits and embeds new or changed files
+    and deletes the chunks of files that were changed or removed.
+
+    A sync runs in two phases: prepare() does the slow loading and embedding
+    off to the side, commit() then applies the precomputed changes in one
+    short step. Pipelines search through an IndexSnapshot, so the one serving
+    queries does not see a commit until it is complete and published.
+
+    File sizes and modification times are recorded with the hashes, so files
+    whose stat is unchanged are not re-read. After each commit a small state
+    file records the corpus fingerprint and chunk count; verify() checks the
+    persisted store against it so a restart can open the index as-is.
+
+    With a NearDuplicateFilter, chunks that are near-duplicates of indexed ones
+    are neither embedded nor stored; the manifest maps each dropped chunk to its
+    canonical chunk, so the file can still be cited.
+    """
+
+    def __init__(
+        self,
+        docs_directory: str,
+        db_manager: ChromaDBManager,
+        manifest_path: str,
+        chunk_size: int = 600,
+        chunk_overlap: int = 200,
+        parallel_workers: int = 0,
+        splitter: str = "fast",
+        embed_batch_size: int = 1024,
+        queue_size: int = 4,
+        lexical_index: Optional[BM25Index] = None,
+        near_duplicate_filter: Optional[NearDuplicateFilter] = None
+    ):
+        """
+        Initialize the index manager.
+
+        Args:
+            docs_directory: Directory holding the raw documents
+            db_manager: ChromaDBManager instance the chunks are stored in
+            manifest_path: JSON file the per-file manifest is persisted to
+            chunk_size: Chunk size passed to the text splitter
+            chunk_overlap: Chunk overlap passed to the text splitter
+            parallel_workers: Size of the process pool used to parse files (0 parses in-process)
+            splitter: Text splitter of the TextProcessor, "fast" or "recursive"
+            embed_batch_size: Number of chunks handed from splitting to embedding at a time
+            queue_size: Number of chunk batches buffered between the loading and embedding stages
+            lexical_index: Optional BM25Index kept in step with the vector store
+            near_duplicate_filter: Optional NearDuplicateFilter; near-duplicate chunks are dropped before embedding
+        """
+        self.docs_directory = docs_directory
+        self.db_manager = db_manager
+        self.manifest_path = manifest_path
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.embed_batch_size = embed_batch_size
+        self.queue_size = queue_size
+        self.lexical_index = lexical_index
+        if lexical_index is not None and lexical_index.get_documents is None:
+            lexical_index.get_documents = db_manager.get_documents
+        self.near_duplicates = near_duplicate_filter
+        self.staging_directory = os.path.join(os.path.dirname(os.path.abspath(manifest_path)), "staging")
+        self.state_path = os.path.join(os.path.dirname(os.path.abspath(manifest_path)), "index_state.json")
+        self.processor = TextProcessor(directory_path=docs_directory, parallel_workers=parallel_workers, splitter=splitter)
+        self.manifest = self._load_manifest()
+        self._lock = threading.Lock()
+        # guards self.manifest: commit() changes it while requests read the corpus version and counts
+        self._manifest_lock = threading.RLock()
+        # the view of the index pipelines are built on; commit() replaces it when it publishes a new corpus
+        self.snapshot = IndexSnapshot(db_manager, lexical_index)
+
+    @staticmethod
+    def hash_file(file_path: str, block_size: int = 1 << 20) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def file_stat(file_path: str) -> Dict[str, int]:
+        stat = os.stat(file_path)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_manifest(self):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _save_state(self):
+        state = {"corpus_version": self.corpus_version, "chunk_count": self.chunk_count()}
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def verify(self) -> bool:
+        """
+        Check that the persisted store matches the manifest: the fingerprint saved by
+        the last commit equals the manifest's corpus version, and the vector store (and
+        lexical index) hold exactly the manifest's chunks. A crash between writing the
+        chunks and saving the manifest, or a replaced database directory, fails this check.
+        """
+        if not os.path.exists(self.state_path):
+            return False
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        chunk_count = self.chunk_count()
+        if state.get("corpus_version") != self.corpus_version or state.get("chunk_count") != chunk_count:
+            return False
+        if self.db_manager.get_collection_count() != chunk_count:
+            return False
+        return self.lexical_index is None or self.lexical_index.count() == chunk_count
+
+    def _repair(self):
+        """
+        Reconcile the manifest with the vector store after verify() failed: files with
+        chunks missing from the store are dropped from the manifest so the sync re-indexes
+        them, and stored chunks no manifest entry refers to are deleted.
+        """
+        stored = set(self.db_manager.get_ids())
+        referenced = set()
+        with self._manifest_lock:
+            for filename in list(self.manifest):
+                chunk_ids = self.manifest[filename]["chunk_ids"]
+                if not stored.issuperset(chunk_ids):
+                    print(f"Chunks of {filename} are missing from the vector store; re-indexing it.")
+                    del self.manifest[filename]
+                    continue
+                referenced.update(chunk_ids)
+        orphans = list(stored - referenced)
+        if orphans:
+            print(f"Deleting {len(orphans)} chunks no file refers to.")
+            self.db_manager.delete_documents(orphans)
+        self._save_manifest()
+
+    def detect_drift(self) -> Dict[str, List[str]]:
+        """
+        Compare the documents directory with the manifest by file stat only, without
+        reading any file. Touched files show up as changed even if their content is not;
+        sync() settles that by hashing them.
+        """
+        files = {os.path.basename(path): path for path in self.processor.list_files()}
+        drift = {
+            "added": [name for name in files if name not in self.manifest],
+            "removed": [name for name in self.manifest if name not in files],
+            "changed": []
+        }
+        for filename, file_path in files.items():
+            entry = self.manifest.get(filename)
+            if entry is not None and (entry.get("size"), entry.get("mtime_ns")) != tuple(self.file_stat(file_path).values()):
+                drift["changed"].append(filename)
+        return drift
+
+    def _backfill_lexical_index(self):
+        """Rebuild the lexical index from the vector store when it is missing chunks, e.g. on first run."""
+        chunk_ids = [chunk_id for entry in self.manifest.values() for chunk_id in entry["chunk_ids"]]
+        if self.lexical_index is None or self.lexical_index.count() == len(chunk_ids):
+            return
+        print(f"Rebuilding lexical index from {len(chunk_ids)} stored chunks.")
+        self.lexical_index.clear()
+        for start in range(0, len(chunk_ids), self.embed_batch_size):
+            documents = self.db_manager.get_documents(chunk_ids[start:start + self.embed_batch_size])
+            self.lexical_index.add(
+                [doc.id for doc in documents],
+                [doc.page_content for doc in documents],
+                [doc.metadata for doc in documents]
+            )
+        self.lexical_index.save()
+
+    def _backfill_near_duplicates(self):
+        """Bring the near-duplicate signatures in line with the stored chunks, e.g. on first run or after a repair."""
+        if self.near_duplicates is None:
+            return
+        chunk_ids = [chunk_id for entry in self.manifest.values() for chunk_id in entry["chunk_ids"]]
+        expected = set(chunk_ids)
+        stale = [chunk_id for chunk_id in self.near_duplicates.ids() if chunk_id not in expected]
+        missing = [chunk_id for chunk_id in chunk_ids if chunk_id not in self.near_duplicates]
+        if not stale and not missing:
+            return
+        print(f"Updating near-duplicate signatures: {len(missing)} added, {len(stale)} removed.")
+        self.near_duplicates.remove(stale)
+        for start in range(0, len(missing), self.embed_batch_size):
+            for doc in self.db_manager.get_documents(missing[start:start + self.embed_batch_size]):
+                self.near_duplicates.add(doc.id, self.near_duplicates.signature(doc.page_content))
+        self.near_duplicates.save()
+
+    def _plan_dependents(self, plan: Dict[str, Any]):
+        """
+        Re-index unchanged files that have chunks dropped as near-duplicates of chunks this
+        sync deletes (their file was removed or changed), so that content is not lost.
+        """
+        live = {chunk_id for filename in plan["unchanged"] for chunk_id in self.manifest[filename]["chunk_ids"]}
+        while True:
+            dependents = [
+                filename for filename in plan["unchanged"]
+                if any(canonical not in live for canonical in self.manifest[filename].get("duplicates", {}).values())
+            ]
+            if not dependents:
+                return
+            for filename in dependents:
+                plan["unchanged"].remove(filename)
+                plan["updated"].append(filename)
+                live.difference_update(self.manifest[filename]["chunk_ids"])
+
+    def duplicate_sources(self) -> Dict[str, List[str]]:
+        """Canonical chunk id -> sources of the files whose near-duplicate chunks were dropped in its favour."""
+        sources: Dict[str, List[str]] = {}
+        with self._manifest_lock:
+            for entry in self.manifest.values():
+                for canonical in set(entry.get("duplicates", {}).values()):
+                    if entry["source"] not in sources.setdefault(canonical, []):
+                        sources[canonical].append(entry["source"])
+        return sources
+
+    def plan(self) -> Dict[str, Any]:
+        """Compare the documents directory with the manifest and work out what has to change."""
+        files = {os.path.basename(path): path for path in self.processor.list_files()}
+
+        plan = {"added": [], "updated": [], "removed": [], "unchanged": [], "paths": files, "hashes": {}, "stats": {}}
+
+        plan["removed"] = [name for name in self.manifest if name not in files]
+
+        for filename, file_path in files.items():
+            entry = self.manifest.get(filename)
+            stat = self.file_stat(file_path)
+            plan["stats"][filename] = stat
+            if entry is not None and entry.get("size") == stat["size"] and entry.get("mtime_ns") == stat["mtime_ns"]:
+                # same size and mtime: trust the recorded hash instead of re-reading the file
+                file_hash = entry["hash"]
+            else:
+                file_hash = self.hash_file(file_path)
+            plan["hashes"][filename] = file_hash
+            if entry is not None and entry["hash"] == file_hash:
+                plan["unchanged"].append(filename)
+            else:
+                plan["updated" if entry is not None else "added"].append(filename)
+
+        self._plan_dependents(plan)
+        return plan
+
+    def _drop_near_duplicates(
+        self,
+        chunks: List[Any],
+        duplicates: Dict[str, str],
+        pending: NearDuplicateFilter,
+        stale: Set[str]
+    ) -> List[Any]:
+        """
+        Keep the chunks that are not near-duplicates of an indexed chunk (other than the stale
+        ones this sync deletes) or of a chunk kept earlier in this sync. Dropped chunks are
+        recorded in duplicates as chunk id -> canonical chunk id.
+        """
+        kept = []
+        for chunk in chunks:
+            chunk_id = self.db_manager.make_chunk_id(chunk)
+            signature = self.near_duplicates.signature(chunk.page_content)
+            match = self.near_duplicates.find(signature, exclude=stale) or pending.find(signature)
+            if match is not None:
+                duplicates[chunk_id] = match[0]
+                continue
+            pending.add(chunk_id, signature)
+            kept.append(chunk)
+        return kept
+
+    def _iter_chunk_batches(
+        self,
+        plan: Dict[str, Any],
+        files: Dict[str, Dict[str, Any]],
+        failed: Dict[str, str],
+        progress: ProgressCallback,
+        pending: Optional[NearDuplicateFilter] = None
+    ):
+        """Load and split files one at a time and yield (filename, chunks) batches of about embed_batch_size chunks."""
+        to_index = plan["added"] + plan["updated"]
+        names = {plan["paths"][filename]: filename for filename in to_index}
+        # chunks of changed and removed files are deleted by the commit, so nothing may be a duplicate of them
+        stale = {chunk_id for filename in plan["updated"] + plan["removed"] for chunk_id in self.manifest[filename]["chunk_ids"]}
+        batch = []
+
+        for file_path, chunks in self.processor.iter_process_files(
+            list(names),
+            self.chunk_size,
+            self.chunk_overlap,
+            progress=lambda done, total: progress("loading", done, total)
+        ):
+            filename = names[file_path]
+            if chunks is None:
+                # leave the file's previous chunks and manifest entry alone; the next sync retries it
+                failed[filename] = self.processor.failed_files.get(file_path, "failed to load")
+                continue
+
+            files[filename] = {
+                "hash": plan["hashes"][filename],
+                **plan["stats"][filename],
+                "source": file_path,
+                "ids": [],
+                "duplicates": {}
+            }
+            if pending is not None:
+                chunks = self._drop_near_duplicates(chunks, files[filename]["duplicates"], pending, stale)
+            batch.extend((filename, chunk) for chunk in chunks)
+            while len(batch) >= self.embed_batch_size:
+                yield batch[:self.embed_batch_size]
+                batch = batch[self.embed_batch_size:]
+
+        if batch:
+            yield batch
+
+    def prepare(self, plan: Dict[str, Any], progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """
+        Load, split and embed the new and changed files without touching the index.
+
+        Loading and splitting run in a background thread that hands chunk batches to the
+        embedding stage through a bounded queue; embedded batches are spooled to disk, so
+        the chunks and embeddings in flight take the same memory however many files change.
+        What stays resident grows with the corpus: the manifest (chunk ids per file), the
+        near-duplicate signatures and the BM25 postings (without the chunk text).
+
+        Args:
+            plan: Result of plan()
+            progress: Optional callback receiving (stage, done, total)
+
+        Returns:
+            Change set to pass to commit()
+        """
+        progress = progress or (lambda stage, done, total: None)
+        progress("loading", 0, len(plan["added"]) + len(plan["updated"]))
+
+        files: Dict[str, Dict[str, Any]] = {}
+        failed: Dict[str, str] = {}
+        spool = ChunkSpool(self.staging_directory)
+        # signatures of the chunks kept by this sync; merged into the filter on commit
+        pending = self.near_duplicates.spawn() if self.near_duplicates is not None else None
+        embedded = 0
+        try:
+            batches = _prefetch(self._iter_chunk_batches(plan, files, failed, progress, pending), self.queue_size)
+            for batch in batches:
+                chunks = [chunk for _, chunk in batch]
+                ids = [self.db_manager.make_chunk_id(chunk) for chunk in chunks]
+                texts = [chunk.page_content for chunk in chunks]
+                embeddings = self.db_manager.embedding_function.embed_documents(texts)
+                spool.append(ids, texts, [chunk.metadata for chunk in chunks], embeddings)
+                for (filename, _), chunk_id in zip(batch, ids):
+                    files[filename]["ids"].append(chunk_id)
+                embedded += len(batch)
+                progress("embedding", embedded, embedded)
+        except BaseException:
+            spool.cleanup()
+            raise
+
+        return {"plan": plan, "files": files, "failed": failed, "spool": spool, "pending": pending}
+
+    def commit(
+        self,
+        changes: Dict[str, Any],
+        progress: Optional[ProgressCallback] = None,
+        publish: Optional[Callable[[], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Apply a prepared change set: the embeddings are already computed, so this only
+        streams the spooled chunks into the vector store, deletes the stale ones and
+        saves the manifest.
+
+        The store keeps serving queries meanwhile. With publish, the pipelines built on
+        the current snapshot hide the new chunks while they are inserted; publish is then
+        called once the new corpus is complete, with self.snapshot hiding the stale chunks
+        until they are deleted. So the swap it makes is atomic: queries see the old corpus
+        or the new one. Without publish, the stores are updated in place, new chunks before
+        stale ones, so a query may briefly see both versions of an updated file.
+
+        Args:
+            changes: Result of prepare()
+            progress: Optional callback receiving (stage, done, total)
+            publish: Optional callback that swaps in pipelines built on self.snapshot
+        """
+        progress = progress or (lambda stage, done, total: None)
+        plan = changes["plan"]
+        spool = changes["spool"]
+        steps = spool.count + 1
+        done = 0
+        progress("committing", done, steps)
+        with self._manifest_lock:
+            replaced = [filename for filename in plan["removed"] + list(changes["files"]) if filename in self.manifest]
+            stale_ids = [chunk_id for filename in replaced for chunk_id in self.manifest[filename]["chunk_ids"]]
+
+        # chunk ids are content-derived: chunks an updated file kept are upserted under the same id
+        kept = {chunk_id for entry in changes["files"].values() for chunk_id in entry["ids"]}
+        if publish is not None:
+            self.snapshot.hide(list(kept.difference(stale_ids)))
+
+        try:
+            for ids, texts, metadatas, embeddings in spool.iter_batches(self.embed_batch_size):
+                self.db_manager.upsert_embeddings(ids, texts, embeddings, metadatas)
+                if self.lexical_index is not None:
+                    self.lexical_index.add(ids, texts, metadatas)
+                done += len(ids)
+                progress("committing", done, steps)
+        finally:
+            spool.cleanup()
+
+        stale_ids = [chunk_id for chunk_id in stale_ids if chunk_id not in kept]
+        if publish is None:
+            self._delete_chunks(stale_ids)
+        progress("committing", steps, steps)
+
+        with self._manifest_lock:
+            for filename in plan["removed"]:
+                self.manifest.pop(filename, None)
+            for filename, entry in changes["files"].items():
+                self.manifest[filename] = {
+                    "hash": entry["hash"],
+                    "size": entry["size"],
+                    "mtime_ns": entry["mtime_ns"],
+                    "source": entry["source"],
+                    "chunk_ids": entry["ids"],
+                    "duplicates": entry["duplicates"]
+                }
+
+            # files that were touched but not changed keep their chunks; record the new stat so they are not re-hashed
+            touched = False
+            for filename in plan["unchanged"]:
+                entry = self.manifest[filename]
+                if (entry.get("size"), entry.get("mtime_ns")) != tuple(plan["stats"][filename].values()):
+                    entry.update(plan["stats"][filename])
+                    touched = True
+
+        if self.near_duplicates is not None and (stale_ids or changes["files"]):
+            # stale signatures go first: a re-indexed file may bring back chunks with the same ids
+            self.near_duplicates.remove(stale_ids)
+            self.near_duplicates.merge(changes["pending"])
+            self.near_duplicates.save()
+
+        if publish is not None:
+            self.snapshot = IndexSnapshot(self.db_manager, self.lexical_index, hidden=tuple(stale_ids))
+            publish()
+            self._delete_chunks(stale_ids)
+            self.snapshot.reveal()
+
+        deduplicated = sum(len(entry["duplicates"]) for entry in changes["files"].values())
+
+        if plan["removed"] or changes["files"] or touched:
+            with self._manifest_lock:
+                self._save_manifest()
+        if plan["removed"] or changes["files"]:
+            if self.lexical_index is not None:
+                self.lexical_index.save()
+        self._save_state()
+
+        return {
+            "added": [name for name in plan["added"] if name in changes["files"]],
+            "updated": [name for name in plan["updated"] if name in changes["files"]],
+            "removed": plan["removed"],
+            "unchanged": plan["unchanged"],
+            "failed": changes["failed"],
+            "chunks_added": spool.count,
+            "chunks_deduplicated": deduplicated,
+            "dedup_ratio": round(deduplicated / (deduplicated + spool.count), 4) if deduplicated else 0.0
+        }
+
+    def _delete_chunks(self, ids: List[str]):
+        self.db_manager.delete_documents(ids)
+        if self.lexical_index is not None:
+            self.lexical_index.remove(ids)
+
+    def sync(
+        self,
+        progress: Optional[ProgressCallback] = None,
+        publish: Optional[Callable[[], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Bring the index in line with the documents directory.
+
+        Syncs are serialized; the index itself is only modified in the short commit
+        step after every new chunk has been embedded.
+
+        Args:
+            progress: Optional callback receiving (stage, done, total)
+            publish: Optional callback that swaps in pipelines built on self.snapshot once
+                the new corpus is complete (see commit())
+
+        Returns:
+            Dictionary with the added, updated, removed and unchanged file names, the
+            number of chunks that were embedded and the number (and share) of chunks
+            dropped as near-duplicates
+        """
+        with self._lock:
+            if progress:
+                progress("scanning", 0, 1)
+            if not self.verify():
+                self._repair()
+            self._backfill_lexical_index()
+            self._backfill_near_duplicates()
+            plan = self.plan()
+            if progress:
+                progress("scanning", 1, 1)
+            stats = self.commit(self.prepare(plan, progress), progress, publish)
+
+        print(
+            f"Index sync: {len(stats['added'])} added, {len(stats['updated'])} updated, "
+            f"{len(stats['removed'])} removed, {len(stats['unchanged'])} unchanged, {len(stats['failed'])} failed, "
+            f"{stats['chunks_added']} chunks embedded, {stats['chunks_deduplicated']} near-duplicate chunks dropped "
+            f"(dedup ratio {stats['dedup_ratio']:.1%})."
+        )
+        return stats
+
+    @property
+    def corpus_version(self) -> str:
+        """Fingerprint of the indexed corpus; changes whenever a file is added, changed or removed."""
+        digest = hashlib.sha256()
+        with self._manifest_lock:
+            for filename in sorted(self.manifest):
+                digest.update(f"{filename}\x00{self.manifest[filename]['hash']}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+    def chunk_count(self) -> int:
+        with self._manifest_lock:
+            return sum(len(entry["chunk_ids"]) for entry in self.manifest.values())
+
+    def has_documents(self) -> bool:
+        with self._manifest_lock:
+            return any(entry["chunk_ids"] for entry in self.manifest.values())
+
+    def find_indexed(self, file_hash: str, filename: Optional[str] = None) -> Optional[str]:
+        """
+        Name of an indexed file with this content hash whose copy on disk is still the
+        indexed one (same size and mtime as recorded), preferring filename itself.
+
+        Returns:
+            The file name, or None if no indexed file has this content
+        """
+        with self._manifest_lock:
+            matches = [name for name, entry in self.manifest.items() if entry["hash"] == file_hash]
+        if filename in matches:
+            matches.remove(filename)
+            matches.insert(0, filename)
+        for name in matches:
+            file_path = os.path.join(self.docs_directory, name)
+            if not os.path.isfile(file_path):
+                continue
+            with self._manifest_lock:
+                entry = self.manifest.get(name)
+            stat = self.file_stat(file_path)
+            if entry is not None and entry.get("size") == stat["size"] and entry.get("mtime_ns") == stat["mtime_ns"]:
+                return name
+        return None
+
+    def get_chunk_ids(self, filename: str) -> List[str]:
+        with self._manifest_lock:
+            entry = self.manifest.get(filename)
+            return list(entry["chunk_ids"]) if entry else []
@@ -0,0 +1,106 @@
+from typing import Any, List, Optional, Set, Tuple
+
+from langchain.schema import Document
+
+from BM25Index import BM25Index
+from ChromaDBManager import ChromaDBManager
+
+
+def _visible(documents: List[Document], hidden: Set[str], k: int) -> List[Document]:
+    return [doc for doc in documents if doc.id not in hidden][:k]
+
+
+def _visible_with_scores(results: List[Tuple[Document, float]], hidden: Set[str], k: int) -> List[Tuple[Document, float]]:
+    return [(doc, score) for doc, score in results if doc.id not in hidden][:k]
+
+
+class _SnapshotVectorStore:
+    """Search methods of a vector store that skip the hidden chunk ids; everything else is delegated."""
+
+    def __init__(self, db_manager: ChromaDBManager, hidden: Set[str]):
+        self.db_manager = db_manager
+        self.hidden = hidden
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.db_manager, name)
+
+    def _fetch_k(self, k: int) -> int:
+        # every hidden chunk could rank above the visible ones
+        return k + len(self.hidden)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 2) -> List[Document]:
+        return _visible(self.db_manager.similarity_search_by_vector(embedding, self._fetch_k(k)), self.hidden, k)
+
+    async def asimilarity_search_by_vector(self, embedding: List[float], k: int = 2) -> List[Document]:
+        return _visible(await self.db_manager.asimilarity_search_by_vector(embedding, self._fetch_k(k)), self.hidden, k)
+
+    def similarity_search_by_vectors(self, embeddings: List[List[float]], k: int = 2) -> List[List[Document]]:
+        results = self.db_manager.similarity_search_by_vectors(embeddings, self._fetch_k(k))
+        return [_visible(documents, self.hidden, k) for documents in results]
+
+    async def asimilarity_search_by_vectors(self, embeddings: List[List[float]], k: int = 2) -> List[List[Document]]:
+        results = await self.db_manager.asimilarity_search_by_vectors(embeddings, self._fetch_k(k))
+        return [_visible(documents, self.hidden, k) for documents in results]
+
+    def similarity_search_by_vector_with_scores(self, embedding: List[float], k: int = 2) -> List[Tuple[Document, float]]:
+        results = self.db_manager.similarity_search_by_vector_with_scores(embedding, self._fetch_k(k))
+        return _visible_with_scores(results, self.hidden, k)
+
+    async def asimilarity_search_by_vector_with_scores(self, embedding: List[float], k: int = 2) -> List[Tuple[Document, float]]:
+        results = await self.db_manager.asimilarity_search_by_vector_with_scores(embedding, self._fetch_k(k))
+        return _visible_with_scores(results, self.hidden, k)
+
+    def similarity_search(self, query: str, k: int = 2) -> List[Document]:
+        return self.similarity_search_by_vector(self.db_manager.embed_query(query), k)
+
+    async def asimilarity_search(self, query: str, k: int = 2) -> List[Document]:
+        return await self.asimilarity_search_by_vector(await self.db_manager.aembed_query(query), k)
+
+    def get_collection_count(self) -> int:
+        return max(self.db_manager.get_collection_count() - len(self.hidden), 0)
+
+
+class _SnapshotLexicalIndex:
+    """BM25 search that skips the hidden chunk ids."""
+
+    def __init__(self, lexical_index: BM25Index, hidden: Set[str]):
+        self.lexical_index = lexical_index
+        self.hidden = hidden
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        results = self.lexical_index.search(query, k=k + len(self.hidden))
+        return _visible_with_scores(results, self.hidden, k)
+
+
+class IndexSnapshot:
+    """
+    What one pipeline sees of a namespace's index.
+
+    A sync writes into the live vector store and BM25 index, which keep serving
+    queries meanwhile. Chunk ids are content-derived, so each version of the
+    corpus is a set of ids, and a snapshot is the shared stores minus the ids
+    that do not belong to its version: the pipeline being replaced hides the
+    chunks a commit inserts, and the pipeline swapped in hides the stale chunks
+    until they are deleted. Queries therefore see either the old or the new
+    corpus, never a partly inserted file or both versions of an updated one.
+    """
+
+    def __init__(self, db_manager: ChromaDBManager, lexical_index: Optional[BM25Index] = None, hidden: Tuple[str, ...] = ()):
+        """
+        Initialize the snapshot.
+
+        Args:
+            db_manager: Vector store shared by all snapshots of the namespace
+            lexical_index: BM25Index shared by all snapshots of the namespace
+            hidden: Chunk ids that are in the stores but not in this snapshot's corpus
+        """
+        self.hidden: Set[str] = set(hidden)
+        self.vector_store = _SnapshotVectorStore(db_manager, self.hidden)
+        self.lexical_index = _SnapshotLexicalIndex(lexical_index, self.hidden) if lexical_index is not None else None
+
+    def hide(self, ids: List[str]):
+        # one set update, so concurrent searches see all of the ids or none of them
+        self.hidden.update(ids)
+
+    def reveal(self):
+        self.hidden.clear()
@@ -0,0 +1,104 @@
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+
+class IngestionJobManager:
+    """
+    Runs ingestion jobs on a worker pool and tracks their status.
+
+    Each job calls the ingest function with a progress callback and the namespace
+    it targets; the per-stage progress it reports is exposed through get_job().
+    """
+
+    def __init__(
+        self,
+        ingest: Callable[[Callable[[str, int, int], None], Optional[str]], Dict[str, Any]],
+        max_workers: int = 1,
+        max_finished_jobs: int = 200
+    ):
+        """
+        Initialize the job manager.
+
+        Args:
+            ingest: Function running one ingestion; receives a progress callback (stage, done, total)
+                and the namespace of the job
+            max_workers: Number of jobs that can run at the same time
+            max_finished_jobs: Number of finished jobs kept for status lookups
+        """
+        self.ingest = ingest
+        self.max_finished_jobs = max_finished_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingestion")
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, files: Optional[List[str]] = None, action: str = "upload", namespace: Optional[str] = None) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "action": action,
+            "namespace": namespace,
+            "files": list(files or []),
+            "status": "queued",
+            "stage": None,
+            "stages": {},
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._prune()
+        self._executor.submit(self._run, job_id)
+        return self.get_job(job_id)
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if job["finished_at"] is not None]
+        for job in sorted(finished, key=lambda job: job["finished_at"])[:-self.max_finished_jobs or None]:
+            del self._jobs[job["job_id"]]
+
+    def _progress(self, job_id: str, stage: str, done: int, total: int):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["stage"] = stage
+            job["stages"][stage] = {"done": done, "total": total}
+
+    def _run(self, job_id: str):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["status"] = "running"
+            job["started_at"] = time.time()
+
+        try:
+            result = self.ingest(lambda stage, done, total: self._progress(job_id, stage, done, total), job["namespace"])
+        except Exception as e:
+            traceback.print_exc()
+            with self._lock:
+                job["status"] = "failed"
+                job["error"] = str(e)
+                job["finished_at"] = time.time()
+            return
+
+        with self._lock:
+            job["status"] = "completed"
+            job["result"] = result
+            job["finished_at"] = time.time()
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = dict(job)
+            snapshot["stages"] = {stage: dict(progress) for stage, progress in job["stages"].items()}
+            return snapshot
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            job_ids = list(self._jobs)
+        return [job for job in (self.get_job(job_id) for job_id in job_ids) if job is not None]
@@ -1,7 +1,7 @@
 from typing import List, Optional
-from langchain_openai import ChatOpenAI
 import os
 from dotenv import load_dotenv
+from OpenAIClientRegistry import get_client_registry
 
 load_dotenv()
 
@@ -24,7 +24,8 @@ class LLMProvider:
         self.llm = self.initialize_llm()
 
     def initialize_llm(self):
-        return ChatOpenAI(
+        # shared connection pool and rate limiter; identical settings reuse the same model
+        return get_client_registry().chat_model(
             api_key=self.openai_api_key,
             model=self.model,
             temperature=self.temperature,
@@ -0,0 +1,187 @@
+import hashlib
+import os
+import re
+from typing import Collection, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class NearDuplicateFilter:
+    """
+    Finds chunks that are near-duplicates of already indexed ones, with MinHash and LSH.
+
+    Each chunk is reduced to a MinHash signature over its word shingles; the fraction
+    of equal signature values estimates the Jaccard similarity of two chunks. The
+    signatures are split into bands and hashed into buckets, so a lookup only compares
+    against chunks that share at least one band instead of scanning the whole index.
+    Signatures are kept by chunk id and persisted as .npz next to the index.
+    """
+
+    TOKEN_PATTERN = re.compile(r"\w+")
+    # largest prime below 2**32: (a * x + b) of 32-bit values stays within 64 bits
+    PRIME = 4294967291
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        threshold: float = 0.9,
+        num_perm: int = 128,
+        shingle_size: int = 3,
+        seed: int = 1
+    ):
+        """
+        Initialize the filter, loading the signatures from path if it exists.
+
+        Args:
+            path: .npz file the signatures are persisted to; None keeps them in memory only
+            threshold: Estimated Jaccard similarity from which a chunk counts as a duplicate
+            num_perm: Number of hash functions in a signature
+            shingle_size: Number of words per shingle
+            seed: Seed of the hash functions; signatures are only comparable with the same seed
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError(f"threshold must be in (0, 1], got {threshold}")
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, self.PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, self.PRIME, size=num_perm, dtype=np.uint64)
+        self.bands, self.rows = self.lsh_parameters(threshold, num_perm)
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(self.bands)]
+        self.load()
+
+    @staticmethod
+    def lsh_parameters(threshold: float, num_perm: int) -> Tuple[int, int]:
+        """
+        Split the signature into (bands, rows). Two chunks become candidates when all rows
+        of one band match, which happens with probability 1 - (1 - s^rows)^bands for
+        similarity s. The most rows per band (fewest false candidates) are used for which
+        a chunk at the threshold is still a candidate with probability 0.99 or more.
+        """
+        best = (num_perm, 1)
+        for rows in range(1, num_perm + 1):
+            if num_perm % rows:
+                continue
+            bands = num_perm // rows
+            if 1 - (1 - threshold ** rows) ** bands >= 0.99:
+                best = (bands, rows)
+        return best
+
+    def spawn(self) -> "NearDuplicateFilter":
+        """Empty in-memory filter with the same parameters, whose signatures can be merged into this one."""
+        return NearDuplicateFilter(
+            threshold=self.threshold,
+            num_perm=self.num_perm,
+            shingle_size=self.shingle_size,
+            seed=self.seed
+        )
+
+    def shingles(self, text: str) -> List[str]:
+        tokens = self.TOKEN_PATTERN.findall(text.lower())
+        if len(tokens) <= self.shingle_size:
+            return [" ".join(tokens) or text]
+        return [" ".join(tokens[i:i + self.shingle_size]) for i in range(len(tokens) - self.shingle_size + 1)]
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of a text, as num_perm uint32 values."""
+        hashes = np.fromiter(
+            (
+                int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little")
+                for shingle in set(self.shingles(text))
+            ),
+            dtype=np.uint64
+        )
+        permuted = (hashes[:, None] * self._a + self._b) % np.uint64(self.PRIME)
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def find(self, signature: np.ndarray, exclude: Collection[str] = ()) -> Optional[Tuple[str, float]]:
+        """
+        Most similar stored chunk at or above the threshold.
+
+        Args:
+            signature: Signature of the chunk to look up
+            exclude: Chunk ids that must not be returned (e.g. chunks about to be deleted)
+
+        Returns:
+            (chunk id, estimated similarity), or None if the chunk has no near-duplicate
+        """
+        best = None
+        seen = set()
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            for chunk_id in bucket.get(key, ()):
+                if chunk_id in seen or chunk_id in exclude:
+                    continue
+                seen.add(chunk_id)
+                similarity = float(np.mean(self._signatures[chunk_id] == signature))
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (chunk_id, similarity)
+        return best
+
+    def add(self, chunk_id: str, signature: np.ndarray):
+        if chunk_id in self._signatures:
+            self.remove([chunk_id])
+        self._signatures[chunk_id] = signature
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            bucket.setdefault(key, []).append(chunk_id)
+
+    def remove(self, ids: Collection[str]):
+        for chunk_id in ids:
+            signature = self._signatures.pop(chunk_id, None)
+            if signature is None:
+                continue
+            for bucket, key in zip(self._buckets, self._band_keys(signature)):
+                members = bucket[key]
+                members.remove(chunk_id)
+                if not members:
+                    del bucket[key]
+
+    def merge(self, other: "NearDuplicateFilter"):
+        """Add every signature of a filter made by spawn()."""
+        for chunk_id, signature in other._signatures.items():
+            self.add(chunk_id, signature)
+
+    def ids(self) -> List[str]:
+        return list(self._signatures)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._signatures
+
+    def count(self) -> int:
+        return len(self._signatures)
+
+    def clear(self):
+        self._signatures = {}
+        self._buckets = [{} for _ in range(self.bands)]
+
+    def load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        with np.load(self.path) as data:
+            # signatures made with other hash functions cannot be compared; the index backfills them
+            if tuple(data["params"]) != (self.num_perm, self.shingle_size, self.seed):
+                return
+            self.clear()
+            for chunk_id, signature in zip(data["ids"].tolist(), data["signatures"]):
+                self.add(chunk_id, signature)
+
+    def save(self):
+        if self.path is None:
+            return
+        ids = list(self._signatures)
+        signatures = np.stack([self._signatures[chunk_id] for chunk_id in ids]) if ids else np.empty((0, self.num_perm), dtype=np.uint32)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                ids=np.array(ids, dtype=str),
+                signatures=signatures,
+                params=np.array([self.num_perm, self.shingle_size, self.seed])
+            )
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,444 @@
+import json
+import os
+import shutil
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+
+from ChromaDBManager import ChromaDBManager
+from EmbeddingProvider import EmbeddingProvider
+from EmbeddingCache import EmbeddingCache
+from EmbeddingScheduler import EmbeddingScheduler
+from blocking_executor import run_blocking
+from metrics import stage
+
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+
+class NumpyDBManager:
+    """
+    In-process vector store with the same interface as ChromaDBManager.
+
+    Embeddings are normalized and appended to a flat file that is memory-mapped
+    as one contiguous (rows, dimension) matrix; a query is an exact scan of that
+    matrix with blocked, vectorized dot products, so there is no index to build
+    or load at startup. Rows can be stored as float32, float16 or int8 (with a
+    per-row scale); the quantized types are widened to float32 block by block,
+    so they save memory and disk at the cost of scan time and a little recall.
+
+    Deleted or replaced rows are only masked out; the files are rewritten once
+    more than half of the rows are dead. Each rewrite is a new generation of
+    files, switched to by atomically replacing state.json.
+    """
+
+    # rows scored per block, so quantized rows are widened to float32 a block at a time
+    BLOCK_ROWS = 8192
+
+    def __init__(
+        self,
+        path: str,
+        collection_name: str = 'Book',
+        openai_api_key: Optional[str] = None,
+        model_name: str = "text-embedding-3-small",
+        embedding_cache: Optional[EmbeddingCache] = None,
+        embedding_scheduler: Optional[EmbeddingScheduler] = None,
+        dtype: str = "float32",
+        embedding_function: Optional[EmbeddingProvider] = None
+    ):
+        """
+        Initialize the store, opening the collection under path if it exists.
+
+        Args:
+            path: Directory the collections are stored in
+            collection_name: Name of the collection (a subdirectory of path)
+            openai_api_key: OpenAI API key for the embedding model
+            model_name: Embedding model name
+            embedding_cache: Optional EmbeddingCache shared with the embedding provider
+            embedding_scheduler: Optional EmbeddingScheduler shared with the embedding provider
+            dtype: Storage type of the vectors: "float32", "float16" or "int8"
+            embedding_function: Embedding provider to use instead of building one (e.g. FakeEmbeddingProvider)
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported dtype '{dtype}', expected one of {list(DTYPES)}")
+
+        self.embedding_function = embedding_function or EmbeddingProvider(
+            model_name=model_name,
+            openai_api_key=openai_api_key,
+            cache=embedding_cache,
+            scheduler=embedding_scheduler
+        )
+        self.directory = os.path.join(path, collection_name)
+        os.makedirs(self.directory, exist_ok=True)
+        self.state_path = os.path.join(self.directory, "state.json")
+        self._lock = threading.RLock()
+        self._load(dtype)
+
+    make_chunk_id = staticmethod(ChromaDBManager.make_chunk_id)
+
+    # ---- storage ----
+
+    def _file(self, kind: str, generation: Optional[int] = None) -> str:
+        generation = self.generation if generation is None else generation
+        extension = {"vectors": self.dtype, "scales": "float32", "records": "jsonl"}[kind]
+        return os.path.join(self.directory, f"{kind}.{generation}.{extension}")
+
+    def _load(self, dtype: str):
+        state = {"generation": 0, "dtype": dtype, "dimension": None, "rows": 0, "deleted": []}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state["dtype"] != dtype:
+                print(f"Vector store at {self.directory} holds {state['dtype']} vectors; ignoring dtype={dtype}.")
+
+        self.generation = state["generation"]
+        self.dtype = state["dtype"]
+        self.dimension: Optional[int] = state["dimension"]
+        rows = state["rows"]
+
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        if rows:
+            with open(self._file("records"), "r", encoding="utf-8") as f:
+                for line, _ in zip(f, range(rows)):
+                    record = json.loads(line)
+                    self._ids.append(record["id"])
+                    self._texts.append(record["text"])
+                    self._metadatas.append(record["metadata"])
+
+        # rows appended after the last saved state (e.g. a crash mid-write) are dropped
+        for kind in ("vectors", "scales", "records"):
+            if os.path.exists(self._file(kind)):
+                self._truncate(kind, rows)
+
+        self._live = np.ones(rows, dtype=bool)
+        self._live[state["deleted"]] = False
+        self._rows_by_id = {chunk_id: row for row, chunk_id in enumerate(self._ids) if self._live[row]}
+        self._rows_by_source: Dict[str, set] = {}
+        for row, metadata in enumerate(self._metadatas):
+            if self._live[row]:
+                self._rows_by_source.setdefault(metadata.get("source"), set()).add(row)
+        self._map()
+
+    def _truncate(self, kind: str, rows: int):
+        file_path = self._file(kind)
+        if kind == "records":
+            with open(file_path, "rb") as f:
+                lines = [line for line, _ in zip(f, range(rows))]
+            size = sum(len(line) for line in lines)
+        else:
+            row_bytes = (self.dimension or 0) * np.dtype(DTYPES[self.dtype]).itemsize if kind == "vectors" else 4
+            size = rows * row_bytes
+        if os.path.getsize(file_path) > size:
+            with open(file_path, "r+b") as f:
+                f.truncate(size)
+
+    def _map(self):
+        rows = len(self._ids)
+        if not rows:
+            self._matrix = None
+            self._scales = None
+            return
+        self._matrix = np.memmap(self._file("vectors"), dtype=DTYPES[self.dtype], mode="r", shape=(rows, self.dimension))
+        self._scales = (
+            np.memmap(self._file("scales"), dtype=np.float32, mode="r", shape=(rows,))
+            if self.dtype == "int8" else None
+        )
+
+    def _save_state(self):
+        state = {
+            "generation": self.generation,
+            "dtype": self.dtype,
+            "dimension": self.dimension,
+            "rows": len(self._ids),
+            "deleted": np.flatnonzero(~self._live).tolist()
+        }
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _quantize(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if self.dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1.0
+            return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+        return vectors.astype(DTYPES[self.dtype]), None
+
+    @staticmethod
+    def _rows(rows: np.ndarray, snapshot: Tuple) -> np.ndarray:
+        """Dequantized float32 vectors of the given rows."""
+        matrix, scales = snapshot[:2]
+        vectors = np.asarray(matrix[rows], dtype=np.float32)
+        if scales is not None:
+            vectors *= scales[rows][:, None]
+        return vectors
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _mark_deleted(self, rows):
+        for row in rows:
+            if self._live[row]:
+                self._live[row] = False
+                del self._rows_by_id[self._ids[row]]
+                source_rows = self._rows_by_source.get(self._metadatas[row].get("source"))
+                if source_rows is not None:
+                    source_rows.discard(row)
+
+    def _compact_if_needed(self):
+        dead = len(self._ids) - int(self._live.sum())
+        if dead * 2 <= len(self._ids):
+            return
+
+        keep = np.flatnonzero(self._live)
+        old_generation = self.generation
+        self.generation += 1
+        vectors, scales = self._matrix[keep], self._scales[keep] if self._scales is not None else None
+        with open(self._file("vectors"), "wb") as f:
+            f.write(np.ascontiguousarray(vectors).tobytes())
+        if scales is not None:
+            with open(self._file("scales"), "wb") as f:
+                f.write(np.ascontiguousarray(scales).tobytes())
+        with open(self._file("records"), "w", encoding="utf-8") as f:
+            for row in keep:
+                f.write(json.dumps({"id": self._ids[row], "text": self._texts[row], "metadata": self._metadatas[row]}) + "\n")
+
+        self._ids = [self._ids[row] for row in keep]
+        self._texts = [self._texts[row] for row in keep]
+        self._metadatas = [self._metadatas[row] for row in keep]
+        self._live = np.ones(len(keep), dtype=bool)
+        self._rows_by_id = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        self._rows_by_source = {}
+        for row, metadata in enumerate(self._metadatas):
+            self._rows_by_source.setdefault(metadata.get("source"), set()).add(row)
+        self._map()
+        self._save_state()
+
+        for kind in ("vectors", "scales", "records"):
+            old_path = self._file(kind, old_generation)
+            if os.path.exists(old_path):
+                os.remove(old_path)
+
+    # ---- writes ----
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None) -> List[str]:
+        if not documents:
+            return []
+        if ids is None:
+            ids = [self.make_chunk_id(doc) for doc in documents]
+        texts = [doc.page_content for doc in documents]
+        embeddings = self.embedding_function.embed_documents(texts)
+        self.upsert_embeddings(ids, texts, embeddings, [doc.metadata for doc in documents])
+        print(f"Stored {len(documents)} documents.")
+        return ids
+
+    @stage("vector_upsert")
+    def upsert_embeddings(
+        self,
+        ids: List[str],
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[dict]
+    ):
+        if not ids:
+            return
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the store ({self.dimension})")
+
+            self._mark_deleted([self._rows_by_id[chunk_id] for chunk_id in ids if chunk_id in self._rows_by_id])
+
+            quantized, scales = self._quantize(vectors)
+            with open(self._file("vectors"), "ab") as f:
+                f.write(quantized.tobytes())
+            if scales is not None:
+                with open(self._file("scales"), "ab") as f:
+                    f.write(scales.tobytes())
+            with open(self._file("records"), "a", encoding="utf-8") as f:
+                for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                    f.write(json.dumps({"id": chunk_id, "text": text, "metadata": metadata or {}}) + "\n")
+
+            first_row = len(self._ids)
+            for offset, (chunk_id, text, metadata) in enumerate(zip(ids, texts, metadatas)):
+                row = first_row + offset
+                self._ids.append(chunk_id)
+                self._texts.append(text)
+                self._metadatas.append(metadata or {})
+                self._rows_by_id[chunk_id] = row
+                self._rows_by_source.setdefault((metadata or {}).get("source"), set()).add(row)
+            self._live = np.concatenate([self._live, np.ones(len(ids), dtype=bool)])
+            self._map()
+            self._save_state()
+
+    def get_documents(self, ids: List[str]) -> List[Document]:
+        """Fetch stored chunks by id, in no particular order."""
+        with self._lock:
+            return [self._document(self._rows_by_id[chunk_id]) for chunk_id in ids if chunk_id in self._rows_by_id]
+
+    def get_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._rows_by_id)
+
+    def _delete_rows(self, rows):
+        with self._lock:
+            if not rows:
+                return
+            self._mark_deleted(rows)
+            self._save_state()
+            self._compact_if_needed()
+
+    def delete_documents(self, ids: List[str]):
+        with self._lock:
+            self._delete_rows([self._rows_by_id[chunk_id] for chunk_id in ids if chunk_id in self._rows_by_id])
+
+    def delete_by_source(self, source: str):
+        with self._lock:
+            self._delete_rows(list(self._rows_by_source.pop(source, ())))
+
+    # ---- reads ----
+
+    def _document(self, row: int, snapshot: Optional[Tuple] = None) -> Document:
+        ids, texts, metadatas = snapshot[3:] if snapshot is not None else (self._ids, self._texts, self._metadatas)
+        return Document(page_content=texts[row], metadata=dict(metadatas[row]), id=ids[row])
+
+    def _snapshot(self) -> Tuple:
+        """
+        Consistent view for a search. Appends and compactions swap in new arrays and lists
+        instead of editing the old ones, so row numbers stay valid within a snapshot.
+        """
+        with self._lock:
+            return self._matrix, self._scales, self._live, self._ids, self._texts, self._metadatas
+
+    def _score(self, queries: np.ndarray, snapshot: Tuple) -> np.ndarray:
+        """Cosine scores of every row against every query, shape (rows, queries); dead rows score -inf."""
+        matrix, scales, live = snapshot[:3]
+        if matrix is None:
+            return np.empty((0, len(queries)), dtype=np.float32)
+
+        queries = self._normalize(queries).T
+        scores = np.empty((len(matrix), queries.shape[1]), dtype=np.float32)
+        for start in range(0, len(matrix), self.BLOCK_ROWS):
+            block = matrix[start:start + self.BLOCK_ROWS]
+            if block.dtype != np.float32:
+                block = block.astype(np.float32)
+            scores[start:start + len(block)] = block @ queries
+        if scales is not None:
+            scores *= scales[:, None]
+        scores[~live] = -np.inf
+        return scores
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        best = np.argpartition(-scores, k - 1)[:k]
+        return best[np.argsort(-scores[best], kind="stable")]
+
+    @stage("vector_search")
+    def similarity_search_by_vectors(self, embeddings: List[List[float]], k: int = 2) -> List[List[Document]]:
+        """Search several query embeddings with one pass over the matrix."""
+        snapshot = self._snapshot()
+        scores = self._score(np.asarray(embeddings, dtype=np.float32), snapshot)
+        return [
+            [self._document(row, snapshot) for row in self._top_k(scores[:, column], k)]
+            for column in range(scores.shape[1])
+        ]
+
+    async def asimilarity_search_by_vectors(self, embeddings: List[List[float]], k: int = 2) -> List[List[Document]]:
+        return await run_blocking(self.similarity_search_by_vectors, embeddings, k)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 2) -> List[Document]:
+        return self.similarity_search_by_vectors([embedding], k)[0]
+
+    async def asimilarity_search_by_vector(self, embedding: List[float], k: int = 2) -> List[Document]:
+        return await run_blocking(self.similarity_search_by_vector, embedding, k)
+
+    @stage("vector_search")
+    def similarity_search_by_vector_with_scores(self, embedding: List[float], k: int = 2) -> List[Tuple[Document, float]]:
+        """Search with one query embedding; each document comes with its cosine similarity."""
+        snapshot = self._snapshot()
+        scores = self._score(np.asarray([embedding], dtype=np.float32), snapshot)[:, 0]
+        return [(self._document(row, snapshot), float(scores[row])) for row in self._top_k(scores, k)]
+
+    async def asimilarity_search_by_vector_with_scores(self, embedding: List[float], k: int = 2) -> List[Tuple[Document, float]]:
+        return await run_blocking(self.similarity_search_by_vector_with_scores, embedding, k)
+
+    def similarity_search(self, query: str, k: int = 2) -> List[Document]:
+        return self.similarity_search_by_vector(self.embed_query(query), k)
+
+    async def asimilarity_search(self, query: str, k: int = 2) -> List[Document]:
+        embedding = await self.aembed_query(query)
+        return await self.asimilarity_search_by_vector(embedding, k)
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.embedding_function.embed_query(query)
+
+    async def aembed_query(self, query: str) -> List[float]:
+        return await self.embedding_function.aembed_query(query)
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed many queries at once through the batched (cached, scheduled) document path."""
+        return self.embedding_function.embed_documents(queries)
+
+    async def aembed_queries(self, queries: List[str]) -> List[List[float]]:
+        return await self.embedding_function.aembed_documents(queries)
+
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 2,
+        fetch_k: int = 12,
+        lambda_mult: float = 0.5
+    ) -> List[Document]:
+        query = np.asarray([embedding], dtype=np.float32)
+        snapshot = self._snapshot()
+        candidates = self._top_k(self._score(query, snapshot)[:, 0], fetch_k)
+        if not len(candidates):
+            return []
+
+        vectors = self._normalize(self._rows(candidates, snapshot))
+        relevance = vectors @ self._normalize(query)[0]
+        selected = [0]
+        while len(selected) < min(k, len(candidates)):
+            redundancy = (vectors @ vectors[selected].T).max(axis=1)
+            mmr = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+            mmr[selected] = -np.inf
+            selected.append(int(np.argmax(mmr)))
+
+        return [self._document(candidates[index], snapshot) for index in selected]
+
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 2,
+        fetch_k: int = 12
+    ) -> List[Document]:
+        return self.max_marginal_relevance_search_by_vector(self.embed_query(query), k=k, fetch_k=fetch_k)
+
+    async def amax_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 2,
+        fetch_k: int = 12
+    ) -> List[Document]:
+        embedding = await self.aembed_query(query)
+        return await run_blocking(self.max_marginal_relevance_search_by_vector, embedding, k=k, fetch_k=fetch_k)
+
+    def get_collection_count(self) -> int:
+        with self._lock:
+            return int(self._live.sum())
+
+    def delete_collection(self):
+        """Delete the collection's files; the manager must not be used afterwards."""
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,252 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import weakref
+from typing import Any, Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+from RateLimiter import RateLimiter
+from metrics import record_stage, register_gauge
+
+load_dotenv()
+
+# Limits of the OpenAI account; 0 learns them from the x-ratelimit-* headers of the first response
+OPENAI_REQUESTS_PER_MINUTE = float(os.getenv("openai_requests_per_minute", "0"))
+OPENAI_TOKENS_PER_MINUTE = float(os.getenv("openai_tokens_per_minute", "0"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("openai_max_connections", "100"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("openai_max_keepalive", "20"))
+# how long a request keeps being re-queued after 429s before the 429 is handed to the caller
+OPENAI_MAX_QUEUE_SECONDS = float(os.getenv("openai_max_queue_seconds", "120"))
+
+
+def estimate_request_tokens(request: httpx.Request) -> int:
+    """Estimate the tokens an OpenAI request counts against the token limit (4 characters per token)."""
+    try:
+        body = json.loads(request.content or b"{}")
+    except (ValueError, httpx.RequestNotRead):
+        return 0
+    if not isinstance(body, dict):
+        return 0
+
+    def count(value: Any) -> int:
+        if isinstance(value, str):
+            return len(value) // 4 + 1
+        if isinstance(value, list):
+            # embeddings may be sent as token ids
+            if value and all(isinstance(item, int) for item in value):
+                return len(value)
+            return sum(count(item) for item in value)
+        if isinstance(value, dict):
+            return count(value.get("content") or value.get("text") or "")
+        return 0
+
+    tokens = count(body.get("input")) + count(body.get("prompt")) + count(body.get("messages"))
+    # the API reserves the completion budget up front
+    max_completion = body.get("max_completion_tokens") or body.get("max_tokens") or 0
+    return tokens + max_completion * (body.get("n") or 1)
+
+
+def _should_retry(response: httpx.Response, deadline: float) -> bool:
+    """Whether a 429 is a rate limit worth waiting out; an exhausted quota is returned to the caller."""
+    if response.status_code != 429 or time.monotonic() >= deadline:
+        return False
+    return b"insufficient_quota" not in response.content
+
+
+class _RateLimitedTransport(httpx.BaseTransport):
+    """Sends every request through the limiter and re-queues it on 429."""
+
+    def __init__(self, transport: httpx.BaseTransport, limiter: RateLimiter, max_queue_seconds: float):
+        self.transport = transport
+        self.limiter = limiter
+        self.max_queue_seconds = max_queue_seconds
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        tokens = estimate_request_tokens(request)
+        deadline = time.monotonic() + self.max_queue_seconds
+        while True:
+            record_stage("openai_queue", self.limiter.acquire(tokens))
+            response = self.transport.handle_request(request)
+            self.limiter.observe(response.status_code, response.headers)
+            if response.status_code == 429:
+                response.read()
+            if not _should_retry(response, deadline):
+                return response
+            response.close()
+
+    def close(self):
+        self.transport.close()
+
+
+class _AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """
+    Async counterpart of _RateLimitedTransport. Pooled connections belong to the
+    event loop that opened them, so each loop gets its own pool; sync callers
+    that run asyncio.run() then never reuse a connection of a closed loop.
+    """
+
+    def __init__(self, limits: httpx.Limits, limiter: RateLimiter, max_queue_seconds: float):
+        self.limits = limits
+        self.limiter = limiter
+        self.max_queue_seconds = max_queue_seconds
+        self._transports: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncHTTPTransport]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.get(loop)
+            if transport is None:
+                transport = self._transports[loop] = httpx.AsyncHTTPTransport(limits=self.limits)
+            return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        transport = self._transport()
+        tokens = estimate_request_tokens(request)
+        deadline = time.monotonic() + self.max_queue_seconds
+        while True:
+            record_stage("openai_queue", await self.limiter.aacquire(tokens))
+            response = await transport.handle_async_request(request)
+            self.limiter.observe(response.status_code, response.headers)
+            if response.status_code == 429:
+                await response.aread()
+            if not _should_retry(response, deadline):
+                return response
+            await response.aclose()
+
+    async def aclose(self):
+        try:
+            transport = self._transports.pop(asyncio.get_running_loop(), None)
+        except RuntimeError:
+            transport = None
+        if transport is not None:
+            await transport.aclose()
+
+
+class OpenAIClientRegistry:
+    """
+    Process-wide OpenAI clients sharing one keep-alive connection pool and one rate limiter.
+
+    Chat models, embeddings and the math agent's completion model all send their
+    requests through the same httpx clients, so connections are reused across
+    components and pipeline rebuilds, and the request and token budgets of the
+    account are shared by all traffic. Requests over budget wait in the limiter
+    instead of failing.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 60.0,
+        max_queue_seconds: float = 120.0
+    ):
+        """
+        Initialize the client registry.
+
+        Args:
+            requests_per_minute: Request budget; 0 to learn it from response headers
+            tokens_per_minute: Token budget; 0 to learn it from response headers
+            max_connections: Upper bound for open connections per pool
+            max_keepalive_connections: Idle connections kept open for reuse
+            keepalive_expiry: Seconds an idle connection is kept open
+            timeout: Default request timeout in seconds
+            max_queue_seconds: How long a request is retried on 429 before the error is returned
+        """
+        self.limiter = RateLimiter(requests_per_minute=requests_per_minute, tokens_per_minute=tokens_per_minute)
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.http_client = httpx.Client(
+            transport=_RateLimitedTransport(httpx.HTTPTransport(limits=limits), self.limiter, max_queue_seconds),
+            timeout=timeout
+        )
+        self.http_async_client = httpx.AsyncClient(
+            transport=_AsyncRateLimitedTransport(limits, self.limiter, max_queue_seconds),
+            timeout=timeout
+        )
+        self._clients: Dict[Any, Any] = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, key: Any, factory):
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = factory()
+            return self._clients[key]
+
+    def openai_client(self, api_key: Optional[str] = None):
+        """openai.OpenAI client on the shared pool."""
+        import openai
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        return self._cached(("openai", api_key), lambda: openai.OpenAI(api_key=api_key, http_client=self.http_client))
+
+    def async_openai_client(self, api_key: Optional[str] = None):
+        """openai.AsyncOpenAI client on the shared pool."""
+        import openai
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        return self._cached(
+            ("async_openai", api_key),
+            lambda: openai.AsyncOpenAI(api_key=api_key, http_client=self.http_async_client)
+        )
+
+    def chat_model(self, api_key: str, model: str, temperature: float, max_tokens: int):
+        """ChatOpenAI on the shared pool, reused for identical settings."""
+        from langchain_openai import ChatOpenAI
+        return self._cached(
+            ("chat", api_key, model, temperature, max_tokens),
+            lambda: ChatOpenAI(
+                api_key=api_key,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                # report token usage on streamed answers too
+                stream_usage=True,
+                http_client=self.http_client,
+                http_async_client=self.http_async_client
+            )
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return self.limiter.stats()
+
+    def close(self):
+        self.http_client.close()
+
+
+_registry: Optional[OpenAIClientRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_client_registry() -> OpenAIClientRegistry:
+    """The process-wide registry, configured from the environment on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = OpenAIClientRegistry(
+                requests_per_minute=OPENAI_REQUESTS_PER_MINUTE,
+                tokens_per_minute=OPENAI_TOKENS_PER_MINUTE,
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+                max_queue_seconds=OPENAI_MAX_QUEUE_SECONDS
+            )
+            limiter = _registry.limiter
+            register_gauge(
+                "openai_limiter_waiting",
+                "Requests waiting in the OpenAI rate limiter",
+                lambda: {(): limiter.stats()["waiting"]}
+            )
+            register_gauge(
+                "openai_limiter_rate_factor",
+                "Fraction of the OpenAI limits currently used after 429 backoff",
+                lambda: {(): limiter.stats()["rate_factor"]}
+            )
+        return _registry
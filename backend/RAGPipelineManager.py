@@ -1,15 +1,29 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator, Tuple
 from ChromaDBManager import ChromaDBManager
 from AnswerGenerator import AnswerGenerator
 from LLMProvider import LLMProvider
 from PromptManager import PromptManager
+from AnswerCache import AnswerCache
+from ContextPacker import ContextPacker
+from BM25Index import BM25Index
+from blocking_executor import run_blocking
+from metrics import record_cache, stage
 from langchain.schema import Document
+import asyncio
+import time
+
+RETRIEVAL_MODES = ("vector", "hybrid", "lexical")
 
 
 class RAGPipelineManager:
     """
     Manager class that orchestrates the RAG (Retrieval Augmented Generation) pipeline,
     connecting vector database retrieval with LLM-based answer generation.
+    
+    Retrieval runs in one of three modes: "vector" (similarity search only),
+    "hybrid" (vector and BM25 results combined with reciprocal rank fusion,
+    falling back to BM25 alone when the vector side fails or times out) and
+    "lexical" (BM25 only, no embedding call at all).
     """
     
     def __init__(
@@ -17,7 +31,15 @@ class RAGPipelineManager:
         db_manager: ChromaDBManager,
         llm_provider: LLMProvider,
         prompt_manager: PromptManager,
-        retrieval_k: int = 4
+        retrieval_k: int = 4,
+        answer_cache: Optional[AnswerCache] = None,
+        corpus_version: Optional[str] = None,
+        lexical_index: Optional[BM25Index] = None,
+        retrieval_mode: str = "vector",
+        vector_timeout: Optional[float] = None,
+        rrf_k: int = 60,
+        context_packer: Optional[ContextPacker] = None,
+        duplicate_sources: Optional[Dict[str, List[str]]] = None
     ):
         """
         Initialize the RAG pipeline manager.
@@ -27,14 +49,199 @@ class RAGPipelineManager:
             llm_provider: LLMProvider instance for language model access
             prompt_manager: PromptManager instance for prompt templates
             retrieval_k: Number of documents to retrieve
+            answer_cache: Optional AnswerCache for near-identical repeat questions
+            corpus_version: Version of the indexed corpus; the answer cache is moved to it, dropping answers from other versions
+            lexical_index: BM25Index over the same chunks, required for the hybrid and lexical modes
+            retrieval_mode: "vector", "hybrid" or "lexical"
+            vector_timeout: Seconds to wait for the embedding service in hybrid mode before
+                answering from the lexical results alone (async path only; None waits forever)
+            rrf_k: Rank offset of reciprocal rank fusion
+            context_packer: Optional ContextPacker that dedupes overlapping chunks and caps the context size
+            duplicate_sources: Chunk id -> sources of the near-duplicate chunks dropped in its favour at
+                ingestion; they are cited together with the chunk
         """
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{retrieval_mode}', expected one of {RETRIEVAL_MODES}")
+        if retrieval_mode != "vector" and lexical_index is None:
+            raise ValueError(f"Retrieval mode '{retrieval_mode}' needs a lexical index")
+        
         self.db_manager = db_manager
-        self.answer_generator = AnswerGenerator(llm_provider, prompt_manager)
+        self.answer_generator = AnswerGenerator(llm_provider, prompt_manager, context_packer)
         self.retrieval_k = retrieval_k
+        self.answer_cache = answer_cache
+        self.corpus_version = corpus_version
+        if answer_cache is not None:
+            answer_cache.set_corpus_version(corpus_version)
+        self.lexical_index = lexical_index
+        self.retrieval_mode = retrieval_mode
+        self.vector_timeout = vector_timeout
+        self.rrf_k = rrf_k
+        self.duplicate_sources = duplicate_sources or {}
+        # each retriever contributes a deeper candidate list than the final k, so fusion has something to re-rank
+        self.candidate_k = max(retrieval_k * 3, 10)
+    
+    @staticmethod
+    def reciprocal_rank_fusion_with_scores(
+        result_lists: List[List[Document]],
+        k: int,
+        rrf_k: int = 60
+    ) -> List[Tuple[Document, float]]:
+        """
+        Merge ranked result lists: each document scores sum(1 / (rrf_k + rank)) over the
+        lists it appears in, and the k best are returned with their scores.
+        """
+        scores: Dict[str, float] = {}
+        documents: Dict[str, Document] = {}
+        for results in result_lists:
+            for rank, doc in enumerate(results, start=1):
+                key = doc.id or doc.page_content
+                scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+                documents.setdefault(key, doc)
+        best = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [(documents[key], scores[key]) for key in best]
+    
+    @staticmethod
+    def reciprocal_rank_fusion(result_lists: List[List[Document]], k: int, rrf_k: int = 60) -> List[Document]:
+        """Like reciprocal_rank_fusion_with_scores, without the scores."""
+        return [doc for doc, _ in RAGPipelineManager.reciprocal_rank_fusion_with_scores(result_lists, k, rrf_k)]
+    
+    @stage("lexical_search")
+    def lexical_search_with_scores(self, query: str, k: int) -> List[Tuple[Document, float]]:
+        return self.lexical_index.search(query, k=k)
+    
+    def lexical_search(self, query: str, k: int) -> List[Document]:
+        return [doc for doc, _ in self.lexical_search_with_scores(query, k)]
+    
+    def _lookup_answer(self, embedding: List[float]) -> Optional[Dict[str, Any]]:
+        with stage("answer_cache_lookup"):
+            cached = self.answer_cache.lookup(embedding, self.corpus_version)
+        record_cache("answer", int(cached is not None), int(cached is None))
+        return cached
+    
+    def _fuse(self, vector_docs: Optional[List[Document]], lexical_docs: List[Document]) -> List[Document]:
+        if vector_docs is None:
+            return lexical_docs[:self.retrieval_k]
+        return self.reciprocal_rank_fusion([vector_docs, lexical_docs], self.retrieval_k, self.rrf_k)
+    
+    def _vector_search(self, query: str, embedding: Optional[List[float]], k: int) -> List[Document]:
+        if embedding is not None:
+            return self.db_manager.similarity_search_by_vector(embedding, k=k)
+        return self.db_manager.similarity_search(query=query, k=k)
+    
+    async def _avector_search(self, query: str, embedding: Optional[List[float]], k: int) -> List[Document]:
+        if embedding is not None:
+            return await self.db_manager.asimilarity_search_by_vector(embedding, k=k)
+        return await self.db_manager.asimilarity_search(query=query, k=k)
+    
+    def _retrieve(self, query: str, embedding: Optional[List[float]] = None, use_vector: bool = True) -> List[Document]:
+        if self.retrieval_mode == "vector":
+            return self._vector_search(query, embedding, self.retrieval_k)
+        
+        lexical_docs = self.lexical_search(query, self.candidate_k)
+        if self.retrieval_mode == "lexical" or not use_vector:
+            return lexical_docs[:self.retrieval_k]
+        
+        try:
+            vector_docs = self._vector_search(query, embedding, self.candidate_k)
+        except Exception as e:
+            print(f"Vector search failed, answering from lexical results: {e}")
+            vector_docs = None
+        return self._fuse(vector_docs, lexical_docs)
+    
+    async def _aretrieve(self, query: str, embedding: Optional[List[float]] = None, use_vector: bool = True) -> List[Document]:
+        if self.retrieval_mode == "vector":
+            return await self._avector_search(query, embedding, self.retrieval_k)
+        
+        if self.retrieval_mode == "lexical" or not use_vector:
+            return await run_blocking(self.lexical_search, query, self.retrieval_k)
+        
+        return self._fuse(*await self._ahybrid_candidates(query, embedding))
+    
+    async def _ahybrid_candidates(
+        self,
+        query: str,
+        embedding: Optional[List[float]]
+    ) -> Tuple[Optional[List[Document]], List[Document]]:
+        """Vector and lexical candidates of a hybrid search; the vector side is None when it failed or timed out."""
+        # both retrievers run concurrently; the vector side is bounded by vector_timeout
+        vector_docs, lexical_docs = await asyncio.gather(
+            asyncio.wait_for(self._avector_search(query, embedding, self.candidate_k), self.vector_timeout),
+            run_blocking(self.lexical_search, query, self.candidate_k),
+            return_exceptions=True
+        )
+        if isinstance(lexical_docs, BaseException):
+            raise lexical_docs
+        if isinstance(vector_docs, BaseException):
+            print(f"Vector search failed, answering from lexical results: {vector_docs!r}")
+            vector_docs = None
+        return vector_docs, lexical_docs
+    
+    async def aretrieve_with_scores(
+        self,
+        query: str,
+        embedding: Optional[List[float]] = None,
+        use_vector: bool = True
+    ) -> List[Tuple[Document, float]]:
+        """
+        Retrieve like aretrieve_documents, returning the score each document was ranked by:
+        the vector store's relevance in vector mode, BM25 in lexical mode and the reciprocal
+        rank fusion score in hybrid mode. Pipelines with the same retrieval mode and embedding
+        model score on the same scale, so their results can be merged by score.
+        
+        Args:
+            query: User query string
+            embedding: Query embedding, if the caller already has it
+            use_vector: False answers hybrid retrieval from the lexical side alone
+            
+        Returns:
+            Up to retrieval_k (Document, score) pairs, highest score first
+        """
+        if self.retrieval_mode == "vector":
+            if embedding is None:
+                embedding = await self.db_manager.aembed_query(query)
+            return await self.db_manager.asimilarity_search_by_vector_with_scores(embedding, k=self.retrieval_k)
+        
+        if self.retrieval_mode == "lexical":
+            return await run_blocking(self.lexical_search_with_scores, query, self.retrieval_k)
+        
+        if use_vector:
+            vector_docs, lexical_docs = await self._ahybrid_candidates(query, embedding)
+        else:
+            vector_docs, lexical_docs = None, await run_blocking(self.lexical_search, query, self.candidate_k)
+        # a lexical-only list is still scored by rank, so it stays comparable with fused lists
+        result_lists = [docs for docs in (vector_docs, lexical_docs) if docs is not None]
+        return self.reciprocal_rank_fusion_with_scores(result_lists, self.retrieval_k, self.rrf_k)
+    
+    def _embed_for_cache(self, query: str) -> Tuple[Optional[List[float]], bool]:
+        """
+        Embed the query for the answer cache. Returns (embedding, use_vector); in hybrid mode an
+        embedding failure disables the cache and the vector search for this query instead of failing it.
+        """
+        if self.answer_cache is None or self.retrieval_mode == "lexical":
+            return None, True
+        if self.retrieval_mode == "vector":
+            return self.db_manager.embed_query(query), True
+        try:
+            return self.db_manager.embed_query(query), True
+        except Exception as e:
+            print(f"Query embedding failed, answering from lexical results: {e}")
+            return None, False
+    
+    async def _aembed_for_cache(self, query: str) -> Tuple[Optional[List[float]], bool]:
+        """Async variant of _embed_for_cache; in hybrid mode the embedding call is bounded by vector_timeout."""
+        if self.answer_cache is None or self.retrieval_mode == "lexical":
+            return None, True
+        if self.retrieval_mode == "vector":
+            return await self.db_manager.aembed_query(query), True
+        try:
+            return await asyncio.wait_for(self.db_manager.aembed_query(query), self.vector_timeout), True
+        except Exception as e:
+            print(f"Query embedding failed, answering from lexical results: {e!r}")
+            return None, False
     
     def retrieve_documents(self, query: str) -> List[Document]:
         """
-        Retrieve relevant documents based on the query using similarity search.
+        Retrieve relevant documents for the query with the configured retrieval mode.
         
         Args:
             query: User query string
@@ -42,10 +249,7 @@ class RAGPipelineManager:
         Returns:
             List of relevant Document objects
         """
-        return self.db_manager.similarity_search(
-            query=query,
-            k=self.retrieval_k
-        )
+        return self._retrieve(query)
     
     def process_query(self, query: str) -> Dict[str, Any]:
         """
@@ -57,28 +261,287 @@ class RAGPipelineManager:
         Returns:
             Dictionary containing the answer and metadata about the process
         """
+        # Embed once: the same vector serves the cache lookup and the similarity search
+        embedding, use_vector = self._embed_for_cache(query)
+        if embedding is not None:
+            cached = self._lookup_answer(embedding)
+            if cached is not None:
+                return self._build_cached_result(query, cached)
+        
         # Start with document retrieval
-        retrieved_docs = self.retrieve_documents(query)
+        retrieved_docs = self._retrieve(query, embedding, use_vector)
+        
+        # Generate answer from retrieved documents
+        context_stats = {}
+        answer = self.answer_generator.generate_answer(query, retrieved_docs, context_stats)
+        if embedding is not None:
+            self._store_answer(query, embedding, answer, retrieved_docs)
+        
+        return self._build_result(query, answer, retrieved_docs, context_stats)
+    
+    async def aretrieve_documents(self, query: str) -> List[Document]:
+        """Async variant of retrieve_documents that does not block the event loop."""
+        return await self._aretrieve(query)
+    
+    async def aprocess_query(self, query: str) -> Dict[str, Any]:
+        """
+        Async variant of process_query: the query embedding and the LLM call are awaited,
+        the Chroma and BM25 searches run on the bounded blocking executor.
         
-        # Track document sources for citation
+        Args:
+            query: User query string
+            
+        Returns:
+            Dictionary containing the answer and metadata about the process
+        """
+        embedding, use_vector = await self._aembed_for_cache(query)
+        if embedding is not None:
+            cached = self._lookup_answer(embedding)
+            if cached is not None:
+                return self._build_cached_result(query, cached)
+        
+        retrieved_docs = await self._aretrieve(query, embedding, use_vector)
+        context_stats = {}
+        answer = await self.answer_generator.agenerate_answer(query, retrieved_docs, context_stats)
+        if embedding is not None:
+            self._store_answer(query, embedding, answer, retrieved_docs)
+        return self._build_result(query, answer, retrieved_docs, context_stats)
+    
+    async def astream_query(self, query: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a query through the pipeline: the retrieved sources are emitted first,
+        then the answer tokens as they arrive, then the timings.
+        
+        Args:
+            query: User query string
+            
+        Yields:
+            Event dictionaries with an "event" name ("sources", "token", "done") and "data"
+        """
+        start_time = time.perf_counter()
+        embedding, use_vector = await self._aembed_for_cache(query)
+        if embedding is not None:
+            cached = self._lookup_answer(embedding)
+            if cached is not None:
+                yield {
+                    "event": "sources",
+                    "data": {"query": query, "sources": cached["sources"], "num_docs_retrieved": len(cached["documents"])}
+                }
+                yield {"event": "token", "data": {"token": cached["answer"]}}
+                total_time = time.perf_counter() - start_time
+                yield {
+                    "event": "done",
+                    "data": {
+                        "answer": cached["answer"],
+                        "cached": True,
+                        "time_to_first_token": round(total_time, 3),
+                        "total_time": round(total_time, 3)
+                    }
+                }
+                return
+        retrieved_docs = await self._aretrieve(query, embedding, use_vector)
+        
+        yield {
+            "event": "sources",
+            "data": {
+                "query": query,
+                "sources": self._collect_sources(retrieved_docs),
+                "num_docs_retrieved": len(retrieved_docs)
+            }
+        }
+        
+        time_to_first_token = None
+        tokens = []
+        context_stats = {}
+        async for token in self.answer_generator.astream_answer(query, retrieved_docs, context_stats):
+            if time_to_first_token is None:
+                time_to_first_token = time.perf_counter() - start_time
+            tokens.append(token)
+            yield {"event": "token", "data": {"token": token}}
+        
+        answer = "".join(tokens)
+        if embedding is not None:
+            self._store_answer(query, embedding, answer, retrieved_docs)
+        
+        total_time = time.perf_counter() - start_time
+        yield {
+            "event": "done",
+            "data": {
+                "answer": answer,
+                "cached": False,
+                "context": context_stats or None,
+                "time_to_first_token": round(time_to_first_token if time_to_first_token is not None else total_time, 3),
+                "total_time": round(total_time, 3)
+            }
+        }
+    
+    async def _aretrieve_many(
+        self,
+        queries: List[str],
+        embeddings: Optional[List[List[float]]],
+        use_vector: bool = True
+    ) -> List[List[Document]]:
+        """Retrieve for many queries with a single multi-query vector search."""
+        if self.retrieval_mode == "vector":
+            return await self.db_manager.asimilarity_search_by_vectors(embeddings, k=self.retrieval_k)
+        
+        if self.retrieval_mode == "lexical" or not use_vector:
+            return await run_blocking(lambda: [self.lexical_search(query, self.retrieval_k) for query in queries])
+        
+        vector_results, lexical_results = await asyncio.gather(
+            self.db_manager.asimilarity_search_by_vectors(embeddings, k=self.candidate_k),
+            run_blocking(lambda: [self.lexical_search(query, self.candidate_k) for query in queries]),
+            return_exceptions=True
+        )
+        if isinstance(lexical_results, BaseException):
+            raise lexical_results
+        if isinstance(vector_results, BaseException):
+            print(f"Vector search failed, answering from lexical results: {vector_results!r}")
+            vector_results = [None] * len(queries)
+        return [self._fuse(vector_docs, lexical_docs) for vector_docs, lexical_docs in zip(vector_results, lexical_results)]
+    
+    async def aprocess_queries(self, queries: List[str], max_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """
+        Process many queries at once: the queries are embedded in one batched call,
+        retrieval is one multi-query search, and answers are generated concurrently.
+        
+        Args:
+            queries: User query strings
+            max_concurrency: Maximum number of answers generated at the same time
+            
+        Returns:
+            One result per query, in input order. A failed item has an "error" message
+            instead of failing the whole batch.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+        
+        embeddings = None
+        use_vector = True
+        if self.retrieval_mode != "lexical" and queries:
+            try:
+                embeddings = await self.db_manager.aembed_queries(queries)
+            except Exception as e:
+                if self.retrieval_mode == "vector":
+                    return [self._build_error_result(query, e) for query in queries]
+                print(f"Query embedding failed, answering from lexical results: {e!r}")
+                use_vector = False
+        
+        pending = list(range(len(queries)))
+        if embeddings is not None and self.answer_cache is not None:
+            pending = []
+            for index, (query, embedding) in enumerate(zip(queries, embeddings)):
+                cached = self._lookup_answer(embedding)
+                if cached is not None:
+                    results[index] = self._build_cached_result(query, cached)
+                else:
+                    pending.append(index)
+        
+        if pending:
+            try:
+                retrieved = await self._aretrieve_many(
+                    [queries[index] for index in pending],
+                    [embeddings[index] for index in pending] if embeddings is not None else None,
+                    use_vector
+                )
+            except Exception as e:
+                for index in pending:
+                    results[index] = self._build_error_result(queries[index], e)
+                return results
+            
+            semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+            
+            async def answer(index: int, retrieved_docs: List[Document]):
+                query = queries[index]
+                async with semaphore:
+                    try:
+                        context_stats = {}
+                        answer = await self.answer_generator.agenerate_answer(query, retrieved_docs, context_stats)
+                        if embeddings is not None and self.answer_cache is not None:
+                            self._store_answer(query, embeddings[index], answer, retrieved_docs)
+                        result = self._build_result(query, answer, retrieved_docs, context_stats)
+                        if self.answer_generator.is_failure(answer):
+                            result["error"] = answer
+                        results[index] = result
+                    except Exception as e:
+                        results[index] = self._build_error_result(query, e)
+            
+            await asyncio.gather(*(answer(index, docs) for index, docs in zip(pending, retrieved)))
+        
+        return results
+    
+    def process_queries(self, queries: List[str], max_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """Synchronous wrapper around aprocess_queries, for scripts running outside an event loop."""
+        return asyncio.run(self.aprocess_queries(queries, max_concurrency))
+    
+    def _collect_sources(self, documents: List[Document]) -> List[str]:
+        """Track document sources for citation"""
         sources = []
-        for doc in retrieved_docs:
+        for doc in documents:
             if hasattr(doc, 'metadata') and 'source' in doc.metadata:
                 if doc.metadata['source'] not in sources:
                     sources.append(doc.metadata['source'])
-        
-        # Generate answer from retrieved documents
-        answer = self.answer_generator.generate_answer(query, retrieved_docs)
-        
+            # files whose copy of this chunk was dropped as a near-duplicate
+            for source in self.duplicate_sources.get(doc.id, ()):
+                if source not in sources:
+                    sources.append(source)
+        return sources
+    
+    def _build_result(
+        self,
+        query: str,
+        answer: str,
+        retrieved_docs: List[Document],
+        context_stats: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         # Return answer and metadata
         return {
             "query": query,
             "answer": answer,
             "num_docs_retrieved": len(retrieved_docs),
-            "sources": sources,
-            "documents": retrieved_docs
+            "sources": self._collect_sources(retrieved_docs),
+            "documents": retrieved_docs,
+            "cached": False,
+            "context": context_stats or None
+        }
+    
+    @staticmethod
+    def _build_cached_result(query: str, cached: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "query": query,
+            "answer": cached["answer"],
+            "num_docs_retrieved": len(cached["documents"]),
+            "sources": cached["sources"],
+            "documents": cached["documents"],
+            "cached": True,
+            "context": None
+        }
+    
+    @staticmethod
+    def _build_error_result(query: str, error: Exception) -> Dict[str, Any]:
+        return {
+            "query": query,
+            "answer": None,
+            "num_docs_retrieved": 0,
+            "sources": [],
+            "documents": [],
+            "cached": False,
+            "context": None,
+            "error": str(error) or repr(error)
         }
     
+    def _store_answer(self, query: str, embedding: List[float], answer: str, retrieved_docs: List[Document]):
+        # never cache failures, the next attempt may succeed
+        if self.answer_generator.is_failure(answer):
+            return
+        self.answer_cache.store(
+            query=query,
+            embedding=embedding,
+            answer=answer,
+            sources=self._collect_sources(retrieved_docs),
+            documents=retrieved_docs,
+            corpus_version=self.corpus_version
+        )
+    
     def get_collection_stats(self) -> Dict[str, int]:
         """Get basic statistics about the vector store collection"""
         return {
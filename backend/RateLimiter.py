@@ -0,0 +1,227 @@
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Mapping, Optional
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """Parse an OpenAI reset duration such as "20ms", "1.5s" or "6m0s" into seconds."""
+    if not value:
+        return None
+    seconds = 0.0
+    number = ""
+    i = 0
+    try:
+        while i < len(value):
+            char = value[i]
+            if char.isdigit() or char == ".":
+                number += char
+            elif value.startswith("ms", i):
+                seconds += float(number) / 1000
+                number = ""
+                i += 1
+            elif char in "hms":
+                seconds += float(number) * {"h": 3600, "m": 60, "s": 1}[char]
+                number = ""
+            else:
+                return None
+            i += 1
+        return seconds + float(number) if number else seconds
+    except ValueError:
+        return None
+
+
+class _Bucket:
+    """One token bucket. The level may go negative: later callers wait until the debt is repaid."""
+
+    def __init__(self, limit_per_minute: float, burst_seconds: float):
+        self.configured_limit = limit_per_minute
+        self.limit = limit_per_minute
+        self.burst_seconds = burst_seconds
+        self.level = self.capacity
+
+    @property
+    def capacity(self) -> float:
+        return self.limit * self.burst_seconds / 60
+
+    def refill(self, elapsed: float, rate_factor: float):
+        if self.limit:
+            self.level = min(self.capacity, self.level + elapsed * self.limit / 60 * rate_factor)
+
+    def reserve(self, amount: float, rate_factor: float) -> float:
+        """Take amount from the bucket and return the seconds until the level is back to zero."""
+        if not self.limit:
+            return 0.0
+        self.level -= amount
+        return max(0.0, -self.level / (self.limit / 60 * rate_factor))
+
+    def observe(self, limit: Optional[str], remaining: Optional[str]):
+        """Follow the limit and remaining budget the API reports."""
+        try:
+            if limit is not None:
+                learned = not self.limit
+                server_limit = float(limit)
+                self.limit = min(self.configured_limit, server_limit) if self.configured_limit else server_limit
+                self.level = self.capacity if learned else min(self.level, self.capacity)
+            if remaining is not None and self.limit:
+                self.level = min(self.level, float(remaining))
+        except ValueError:
+            pass
+
+
+class RateLimiter:
+    """
+    Token bucket limiter for requests per minute and tokens per minute.
+
+    Every caller reserves one request and its estimated tokens up front and then
+    sleeps until the buckets have refilled enough to cover it (a request larger
+    than the bucket leaves it in debt for the callers behind it), so callers are
+    served in arrival order at the allowed rate instead of bursting into 429s.
+    A limit of 0 is learned from the x-ratelimit-limit-* headers of the first
+    response. A 429 pauses all callers until the API says to retry and halves
+    the rate; every successful response then restores part of it.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        burst_seconds: float = 1.0,
+        min_rate_factor: float = 0.1,
+        recovery_step: float = 0.05,
+        default_retry_after: float = 1.0
+    ):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            requests_per_minute: Request budget; 0 to learn it from response headers
+            tokens_per_minute: Token budget; 0 to learn it from response headers
+            burst_seconds: Seconds of budget that may be spent at once after an idle period
+            min_rate_factor: Lowest fraction of the limits the rate drops to after 429s
+            recovery_step: Fraction of the limits restored by each successful response
+            default_retry_after: Pause after a 429 that carries no retry hint
+        """
+        self.requests = _Bucket(requests_per_minute, burst_seconds)
+        self.tokens = _Bucket(tokens_per_minute, burst_seconds)
+        self.min_rate_factor = min_rate_factor
+        self.recovery_step = recovery_step
+        self.default_retry_after = default_retry_after
+        self.rate_factor = 1.0
+        self._paused_until = 0.0
+        self._last_backoff = float("-inf")
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._stats = {"requests": 0, "tokens": 0, "rate_limited": 0, "wait_seconds": 0.0}
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        self.requests.refill(elapsed, self.rate_factor)
+        self.tokens.refill(elapsed, self.rate_factor)
+
+    def reserve(self, tokens: int = 0) -> float:
+        """Reserve one request and tokens; returns how long the caller has to wait before sending."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(
+                self.requests.reserve(1, self.rate_factor),
+                self.tokens.reserve(tokens, self.rate_factor),
+                self._paused_until - now
+            )
+            self._stats["requests"] += 1
+            self._stats["tokens"] += tokens
+            self._stats["wait_seconds"] += wait
+            return wait
+
+    def _pause_remaining(self) -> float:
+        with self._lock:
+            return self._paused_until - time.monotonic()
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until a request with tokens may be sent; returns the seconds waited."""
+        start = time.monotonic()
+        wait = self.reserve(tokens)
+        with self._lock:
+            self._waiting += 1
+        try:
+            while wait > 0:
+                time.sleep(wait)
+                # a 429 seen meanwhile extends the wait of everyone already queued
+                wait = self._pause_remaining()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        return time.monotonic() - start
+
+    async def aacquire(self, tokens: int = 0) -> float:
+        """Async variant of acquire that sleeps on the event loop."""
+        start = time.monotonic()
+        wait = self.reserve(tokens)
+        with self._lock:
+            self._waiting += 1
+        try:
+            while wait > 0:
+                await asyncio.sleep(wait)
+                wait = self._pause_remaining()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        return time.monotonic() - start
+
+    def observe(self, status_code: int, headers: Mapping[str, str]):
+        """Adapt to a response: follow the rate-limit headers, back off on 429 and recover on success."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.requests.observe(headers.get("x-ratelimit-limit-requests"), headers.get("x-ratelimit-remaining-requests"))
+            self.tokens.observe(headers.get("x-ratelimit-limit-tokens"), headers.get("x-ratelimit-remaining-tokens"))
+
+            pause = None
+            if status_code == 429:
+                self._stats["rate_limited"] += 1
+                # requests sent in the same burst all see the 429: back off once per burst
+                if now - self._last_backoff >= 1.0:
+                    self.rate_factor = max(self.min_rate_factor, self.rate_factor / 2)
+                    self._last_backoff = now
+                pause = self._retry_after(headers)
+                if pause is None:
+                    pause = self.default_retry_after
+            else:
+                if status_code < 400:
+                    self.rate_factor = min(1.0, self.rate_factor + self.recovery_step)
+                # an exhausted budget is paused until the API says it resets
+                for kind in ("requests", "tokens"):
+                    if headers.get(f"x-ratelimit-remaining-{kind}") == "0":
+                        reset = parse_reset(headers.get(f"x-ratelimit-reset-{kind}"))
+                        if reset is not None:
+                            pause = max(pause or 0.0, reset)
+            if pause:
+                self._paused_until = max(self._paused_until, now + pause)
+
+    @staticmethod
+    def _retry_after(headers: Mapping[str, str]) -> Optional[float]:
+        try:
+            if headers.get("retry-after-ms") is not None:
+                return float(headers["retry-after-ms"]) / 1000
+            if headers.get("retry-after") is not None:
+                return float(headers["retry-after"])
+        except ValueError:
+            pass
+        resets = [parse_reset(headers.get(f"x-ratelimit-reset-{kind}")) for kind in ("requests", "tokens")]
+        resets = [reset for reset in resets if reset is not None]
+        return max(resets) if resets else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "wait_seconds": round(self._stats["wait_seconds"], 3),
+                "requests_per_minute": self.requests.limit,
+                "tokens_per_minute": self.tokens.limit,
+                "rate_factor": round(self.rate_factor, 3),
+                "waiting": self._waiting,
+                "paused_seconds": round(max(0.0, self._paused_until - time.monotonic()), 3)
+            }
@@ -1,17 +1,64 @@
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import DirectoryLoader
-from typing import List, Optional
+from langchain_community.document_loaders import DirectoryLoader, UnstructuredFileLoader
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from langchain.schema import Document
+from pathlib import Path
 import re
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from metrics import record_stage, stage
+from FastTextSplitter import FastTextSplitter
+
+URL_PATTERN = re.compile(r'http[s]?://\S+')
+HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+SPECIAL_CHARACTERS_PATTERN = re.compile(r'[^\w\s.,!?]+')
+
+
+def _load_and_clean_file(file_path: str) -> Tuple[List[Document], float]:
+    """Process pool entry point: parse one file and clean its documents in the worker; also returns the seconds it took."""
+    start = time.perf_counter()
+    documents = TextProcessor.load_file(file_path)
+    return [TextProcessor._clean_document(doc) for doc in documents], time.perf_counter() - start
+
 
 class TextProcessor:
 
-    def __init__(self, directory_path: str, file_types: Optional[List[str]] = None):
+    def __init__(
+        self,
+        directory_path: str,
+        file_types: Optional[List[str]] = None,
+        parallel_workers: int = 0,
+        file_timeout: float = 300.0,
+        mp_context: str = "spawn",
+        splitter: str = "fast"
+    ):
+        """
+        Args:
+            directory_path: Directory holding the raw documents
+            file_types: Glob patterns of the files to load
+            parallel_workers: Size of the process pool used to parse files; 0 or 1 parses in-process
+            file_timeout: Seconds to wait for a single file before it is reported as failed
+            mp_context: Multiprocessing start method for the pool ("spawn" is safe next to Chroma's threads)
+            splitter: "fast" tokenizes every document once (FastTextSplitter), "recursive" uses
+                RecursiveCharacterTextSplitter directly; both produce the same chunks
+        """
 
         self.directory_path = directory_path
         self.file_types = file_types or ["*.txt", "*.pdf"]
+        self.parallel_workers = parallel_workers
+        self.file_timeout = file_timeout
+        self.mp_context = mp_context
+        if splitter not in ("fast", "recursive"):
+            raise ValueError(f"Unknown splitter: {splitter}")
+        self.splitter = splitter
+        self._fast_splitters: Dict[Tuple[int, int], FastTextSplitter] = {}
+        # path -> error message of files that failed to load in the last call
+        self.failed_files: Dict[str, str] = {}
+        self._process_pool: Optional[ProcessPoolExecutor] = None
         
         # Validate directory exists
         if not os.path.isdir(directory_path):
@@ -25,7 +72,187 @@ class TextProcessor:
         )
         return loader.load()
 
+    def list_files(self) -> List[str]:
+        """List the files in the directory matching the configured file types, sorted by name."""
+        paths = set()
+        for pattern in self.file_types:
+            paths.update(str(p) for p in Path(self.directory_path).glob(pattern) if p.is_file())
+        return sorted(paths)
+
     @staticmethod
+    def load_file(file_path: str) -> List[Document]:
+        return UnstructuredFileLoader(file_path).load()
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.parallel_workers,
+                mp_context=multiprocessing.get_context(self.mp_context)
+            )
+        return self._process_pool
+
+    def _discard_process_pool(self):
+        """Kill the pool's workers, e.g. when one of them is stuck on a file or the pool is broken."""
+        pool, self._process_pool = self._process_pool, None
+        if pool is None:
+            return
+        # the executor has no public way to stop a worker that is busy with a task: shutdown() waits
+        # for (or, with wait=False, abandons) it, so a worker stuck in a parser would live on. The
+        # private _processes map is the only handle on the workers; getattr keeps this a no-op if it goes.
+        for process in list(getattr(pool, "_processes", {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def load_and_clean_files(
+        self,
+        file_paths: List[str],
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, List[Document]]:
+        """
+        Load and clean the given files, across a process pool when parallel_workers > 1.
+
+        A file that raises or exceeds file_timeout is recorded in failed_files and left
+        out of the result instead of failing the whole batch.
+
+        Returns:
+            Cleaned documents per file path, in the order of file_paths
+        """
+        return {
+            file_path: documents
+            for file_path, documents in self.iter_load_and_clean_files(file_paths, progress)
+            if documents is not None
+        }
+
+    def iter_load_and_clean_files(
+        self,
+        file_paths: List[str],
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Iterator[Tuple[str, Optional[List[Document]]]]:
+        """
+        Yield (file_path, cleaned documents) in the order of file_paths; documents is None
+        for files that failed. At most two files per worker are in flight, so memory stays
+        bounded however many files are passed.
+        """
+        self.failed_files = {}
+        for i, (file_path, documents) in enumerate(self._iter_load_and_clean(file_paths)):
+            if progress:
+                progress(i + 1, len(file_paths))
+            yield file_path, documents
+
+    def _iter_load_and_clean(
+        self,
+        file_paths: List[str],
+        isolate: bool = False
+    ) -> Iterator[Tuple[str, Optional[List[Document]]]]:
+        """
+        Load and clean files, in a process pool when there are several and parallel_workers > 1.
+
+        Args:
+            file_paths: Files to load
+            isolate: Load one file at a time in the pool, so a file that kills its worker is
+                the only one in flight and the only one marked failed
+        """
+        if not file_paths:
+            return
+        if self.parallel_workers <= 1 or (len(file_paths) <= 1 and not isolate):
+            for file_path in file_paths:
+                try:
+                    documents, seconds = _load_and_clean_file(file_path)
+                    record_stage("ingest_parse", seconds)
+                except Exception as e:
+                    print(f"Failed to load {file_path}: {e}")
+                    self.failed_files[file_path] = str(e)
+                    documents = None
+                yield file_path, documents
+            return
+
+        pool = self._get_process_pool()
+        window = deque()
+        window_size = 1 if isolate else self.parallel_workers * 2
+        pending_paths = iter(file_paths)
+        # files taken from pending_paths that could not be submitted because the pool broke
+        unsubmitted = []
+        # files in flight when a worker died: any of them may have killed it, so each is retried alone
+        suspects = []
+        restart = False
+
+        def fill_window():
+            nonlocal restart
+            while not restart and len(window) < window_size:
+                file_path = next(pending_paths, None)
+                if file_path is None:
+                    return
+                try:
+                    window.append((file_path, pool.submit(_load_and_clean_file, file_path)))
+                except BrokenProcessPool:
+                    unsubmitted.append(file_path)
+                    restart = True
+
+        fill_window()
+        # collect in submission order so the output does not depend on which worker finishes first
+        while window and not restart:
+            file_path, future = window.popleft()
+            documents = None
+            try:
+                documents, seconds = future.result(timeout=self.file_timeout)
+                record_stage("ingest_parse", seconds)
+            except FutureTimeoutError:
+                print(f"Timed out loading {file_path} after {self.file_timeout}s")
+                self.failed_files[file_path] = f"timed out after {self.file_timeout}s"
+                future.cancel()
+                restart = True
+            except BrokenProcessPool as e:
+                if not isolate:
+                    suspects.append(file_path)
+                    restart = True
+                    continue
+                # alone in the pool: this file killed the worker (OOM kill, crash in a native parser)
+                print(f"Parser worker died while loading {file_path}: {e}")
+                self.failed_files[file_path] = f"parser worker died: {e}"
+                restart = True
+            except Exception as e:
+                print(f"Failed to load {file_path}: {e}")
+                self.failed_files[file_path] = str(e)
+            fill_window()
+            yield file_path, documents
+
+        if restart:
+            # keep what finished before the pool went down; everything else was lost with it
+            in_flight = [
+                (file_path, future if future.done() and not future.cancelled() and future.exception() is None else None)
+                for file_path, future in window
+            ]
+            self._discard_process_pool()
+            for file_path, future in in_flight:
+                if future is None:
+                    suspects.append(file_path)
+                    continue
+                # retry the lost files first, so the output keeps the order of file_paths
+                yield from self._iter_load_and_clean(suspects, isolate=True)
+                suspects = []
+                documents, seconds = future.result()
+                record_stage("ingest_parse", seconds)
+                yield file_path, documents
+            yield from self._iter_load_and_clean(suspects, isolate=True)
+            # files not submitted yet when a worker got stuck or died are loaded with a fresh pool
+            yield from self._iter_load_and_clean(unsubmitted + list(pending_paths), isolate)
+
+    def iter_process_files(
+        self,
+        file_paths: List[str],
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Iterator[Tuple[str, Optional[List[Document]]]]:
+        """Yield (file_path, chunks) one file at a time; chunks is None for files that failed to load."""
+        for file_path, documents in self.iter_load_and_clean_files(file_paths, progress):
+            if documents is None:
+                yield file_path, None
+            else:
+                yield file_path, self.split_cleaned_documents(documents, chunk_size, chunk_overlap)
+
+    @staticmethod
+    @stage("ingest_split")
     def split_text_recursive(documents: List[Document], chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Document]:
 
         text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
@@ -33,44 +260,71 @@ class TextProcessor:
         )
         return text_splitter.split_documents(documents)
 
+    @stage("ingest_split")
+    def split_text_fast(self, documents: List[Document], chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Document]:
+        """Same chunks as split_text_recursive, tokenizing every document only once."""
+        key = (chunk_size, chunk_overlap)
+        if key not in self._fast_splitters:
+            self._fast_splitters[key] = FastTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        return self._fast_splitters[key].split_documents(documents)
+
     @staticmethod
     def clean_text(text: str) -> str:
+        """
+        Lowercase the text, drop URLs, HTML tags and special characters, and collapse whitespace.
+
+        The patterns are compiled once, the URL and tag passes are skipped when the text
+        cannot contain a match, and the whitespace is collapsed with split/join instead of
+        another regex pass.
+        """
 
         if not isinstance(text, str) or not text.strip():
             return ""
         
         text = text.lower()
         # Remove URLs
-        text = re.sub(r'http[s]?://\S+', '', text)
+        if "http" in text:
+            text = URL_PATTERN.sub('', text)
         # Remove HTML tags
-        text = re.sub(r'<[^>]+>', '', text)
+        if "<" in text:
+            text = HTML_TAG_PATTERN.sub('', text)
         # Remove special characters except punctuation
-        text = re.sub(r'[^\w\s.,!?]', '', text)
+        text = SPECIAL_CHARACTERS_PATTERN.sub('', text)
         # Normalize whitespace
-        text = re.sub(r'\s+', ' ', text)
-        
-        return text.strip()
+        return " ".join(text.split())
 
     def process_documents(self, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Document]:
 
     
         documents = self.load_documents()
-        
+        return self._process(documents, chunk_size, chunk_overlap)
+
+    def process_files(self, file_paths: List[str], chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Document]:
+        """Load, clean and split only the given files; chunk ids are numbered per call."""
+        loaded = self.load_and_clean_files(file_paths)
+        documents = [doc for docs in loaded.values() for doc in docs]
+        return self._process(documents, chunk_size, chunk_overlap, cleaned=True)
+
+    def split_cleaned_documents(self, documents: List[Document], chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Document]:
+        """Split documents returned by load_and_clean_files; chunk ids are numbered per call."""
+        return self._process(documents, chunk_size, chunk_overlap, cleaned=True)
+
+    def _process(self, documents: List[Document], chunk_size: int, chunk_overlap: int, cleaned: bool = False) -> List[Document]:
+
         if not documents:
             return []
             
-        with ThreadPoolExecutor() as executor:
-            futures = []
-            for doc in documents:
-                futures.append(
-                    executor.submit(self._clean_document, doc)
-                )
-            
-            cleaned_docs = []
-            for future in as_completed(futures):
-                cleaned_docs.append(future.result())
+        if cleaned:
+            cleaned_docs = documents
+        else:
+            # map keeps the input order, so chunk ids are deterministic
+            with ThreadPoolExecutor() as executor:
+                cleaned_docs = list(executor.map(self._clean_document, documents))
         
-        doc_splits = self.split_text_recursive(cleaned_docs, chunk_size, chunk_overlap)
+        if self.splitter == "fast":
+            doc_splits = self.split_text_fast(cleaned_docs, chunk_size, chunk_overlap)
+        else:
+            doc_splits = self.split_text_recursive(cleaned_docs, chunk_size, chunk_overlap)
         
         for i, doc in enumerate(doc_splits):
             if doc.metadata is None:
@@ -1,26 +1,268 @@
-from langchain_community.llms import OpenAI
-from langchain.agents import Tool, initialize_agent, AgentType
-from langchain.prompts import PromptTemplate
-from langchain_experimental.utilities import PythonREPL
-import asteval
-import sympy as sp
+import ast
+import math
 import re
+import sys
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# langchain, sympy, numpy and asteval are imported where they are first used, so importing
+# this module (and the strict fast path) stays cheap
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def _exact_zeros(function: Callable[[float], float]) -> Callable[[float], float]:
+    """
+    Round a trigonometric result to 0 when it is below the rounding error of its argument,
+    e.g. sin(pi) = 1.2e-16 only because pi is not exact in floating point. sympy evaluates
+    pi symbolically and returns 0, and the fast path must give the same answer.
+    """
+    def evaluate(value: float) -> float:
+        result = function(value)
+        return 0.0 if abs(result) < 4 * sys.float_info.epsilon * abs(value) else result
+    return evaluate
+
+
+_STRICT_FUNCTIONS = {
+    "sqrt": math.sqrt, "log": math.log10,
+    "sin": _exact_zeros(math.sin), "cos": _exact_zeros(math.cos), "tan": _exact_zeros(math.tan)
+}
+_STRICT_CONSTANTS = {"pi": math.pi, "e": math.e}
+_STRICT_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.UAdd, ast.USub)
+
+
+class _FloatLiterals(ast.NodeTransformer):
+    """Turn integer literals into floats, so huge powers overflow instead of building giant integers."""
+
+    def visit_Constant(self, node: ast.Constant) -> ast.Constant:
+        return ast.copy_location(ast.Constant(value=float(node.value)), node)
+
+
+def _is_strict_node(node: ast.AST, variables: Tuple[str, ...] = ()) -> bool:
+    if isinstance(node, ast.Expression):
+        return _is_strict_node(node.body, variables)
+    if isinstance(node, ast.Constant):
+        return type(node.value) in (int, float)
+    if isinstance(node, ast.Name):
+        return node.id in _STRICT_CONSTANTS or node.id in variables
+    if isinstance(node, ast.BinOp):
+        return (
+            isinstance(node.op, _STRICT_OPERATORS)
+            and _is_strict_node(node.left, variables)
+            and _is_strict_node(node.right, variables)
+        )
+    if isinstance(node, ast.UnaryOp):
+        return isinstance(node.op, _STRICT_OPERATORS) and _is_strict_node(node.operand, variables)
+    if isinstance(node, ast.Call):
+        return (
+            isinstance(node.func, ast.Name)
+            and node.func.id in _STRICT_FUNCTIONS
+            and len(node.args) == 1
+            and not node.keywords
+            and _is_strict_node(node.args[0], variables)
+        )
+    return False
+
+
+@lru_cache(maxsize=4096)
+def _compile_strict(expression: str):
+    """
+    Compile a plain arithmetic expression, or return None if it is anything else.
+    Only numbers, + - * / ^, parentheses, pi, e and sqrt/log/sin/cos/tan calls are accepted.
+    """
+    try:
+        tree = ast.parse(expression.replace("^", "**"), mode="eval")
+    except (SyntaxError, ValueError):
+        return None
+    if not _is_strict_node(tree):
+        return None
+    try:
+        tree = ast.fix_missing_locations(_FloatLiterals().visit(tree))
+    except OverflowError:
+        return None
+    return compile(tree, "<math>", "eval")
+
+
+class _NumpyLiterals(ast.NodeTransformer):
+    """Replace number literals with names bound to NumPy floats, so constant subtrees follow NumPy semantics too."""
+
+    def __init__(self):
+        self.literals: Dict[str, Any] = {}
+
+    def visit_Constant(self, node: ast.Constant) -> ast.Name:
+        import numpy as np
+
+        name = f"__literal{len(self.literals)}"
+        self.literals[name] = np.float64(node.value)
+        return ast.copy_location(ast.Name(id=name, ctx=ast.Load()), node)
+
+
+@lru_cache(maxsize=1024)
+def _compile_vectorized(expression: str, variables: Tuple[str, ...]) -> Callable[..., Any]:
+    """
+    Compile an arithmetic expression over the given variables into a NumPy function.
+    The expression is checked against the same whitelist as _compile_strict and then
+    compiled from its AST; ValueError is raised if it does not pass.
+
+    Every number is a NumPy float, so even an all-constant expression such as
+    10^10^10^10 is evaluated in float64 and overflows to inf instead of being
+    computed exactly (which is what sympy does, at the cost of all memory).
+    """
+    import numpy as np
+
+    for name in variables:
+        if not name.isidentifier() or name.startswith("__") or name in _STRICT_FUNCTIONS or name in _STRICT_CONSTANTS:
+            raise ValueError(f"Invalid variable name '{name}'")
+    try:
+        tree = ast.parse(expression.replace("^", "**"), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression '{expression}': {e.msg}")
+    if not _is_strict_node(tree, variables):
+        raise ValueError(
+            f"Invalid expression '{expression}'. Use numbers, the variables {list(variables)}, "
+            "operators (+, -, *, /, ^), pi, e and sqrt, log, sin, cos, tan."
+        )
+
+    literals = _NumpyLiterals()
+    body = literals.visit(tree).body
+    arguments = ast.arguments(
+        posonlyargs=[], args=[ast.arg(arg=name) for name in variables], kwonlyargs=[], kw_defaults=[], defaults=[]
+    )
+    code = compile(ast.fix_missing_locations(ast.Expression(ast.Lambda(args=arguments, body=body))), "<math>", "eval")
+    namespace = {
+        "__builtins__": {}, "sqrt": np.sqrt, "log": np.log10, "sin": np.sin, "cos": np.cos, "tan": np.tan,
+        "pi": np.float64(math.pi), "e": np.float64(math.e), **literals.literals
+    }
+    return eval(code, namespace)
 
 
 class SafeCalculator:
+
+    QUESTION_PREFIXES = [
+        "what is ", "what's ", "calculate ", "compute ", "find ", "what would be ",
+        "can you tell me ", "tell me ", "solve ", "evaluate "
+    ]
+
     def __init__(self):
-        self.a_eval = asteval.Interpreter(use_numpy=True)
-        self.repl = PythonREPL()
+        self._a_eval = None
+        self._repl = None
+
+    @property
+    def a_eval(self):
+        if self._a_eval is None:
+            import asteval
+            self._a_eval = asteval.Interpreter(use_numpy=True)
+        return self._a_eval
+
+    @property
+    def repl(self):
+        if self._repl is None:
+            from langchain_experimental.utilities import PythonREPL
+            self._repl = PythonREPL()
+        return self._repl
+
+    def evaluate_strict(self, expression: str) -> Optional[str]:
+        """
+        Evaluate plain arithmetic without any interpretation.
+
+        Only a leading question prefix ("what is ...") and trailing "?" or "=" are
+        stripped; anything that is not then a strict arithmetic expression returns
+        None so the caller can fall back to the agent. Compiled expressions are kept
+        in an LRU cache, and results are rounded to 10 significant digits like evaluate();
+        integral results are written without a decimal point ("8", not "8.0").
+
+        Raises:
+            ValueError: The expression is arithmetic but has no finite real value (e.g. 1/0)
+        """
+        text = expression.strip().lower()
+        for prefix in self.QUESTION_PREFIXES:
+            if text.startswith(prefix):
+                text = text[len(prefix):]
+                break
+        text = text.rstrip("?= ").strip()
+        if not text:
+            return None
+
+        code = _compile_strict(text)
+        if code is None:
+            return None
+        try:
+            result = eval(code, {"__builtins__": {}}, {**_STRICT_FUNCTIONS, **_STRICT_CONSTANTS})
+            if isinstance(result, complex):
+                raise ValueError("result is not a real number")
+            if not math.isfinite(result):
+                raise OverflowError("result is out of range")
+        except (ArithmeticError, ValueError) as e:
+            raise ValueError(f"Unable to evaluate '{expression}': {str(e) or type(e).__name__}") from e
+        # floats represent every integer below 2^53 exactly; smaller rounded values such as
+        # 0.1 * 30 = 3.0000000000000004 become integers once rounded to 10 digits
+        if result.is_integer() and abs(result) < 2 ** 53:
+            return str(int(result))
+        result = float(f"{result:.10g}")
+        if result.is_integer() and abs(result) < 1e10:
+            return str(int(result))
+        return str(result)
         
+    def evaluate_vectorized(
+        self,
+        expression: str,
+        variables: Optional[Dict[str, Sequence[float]]] = None,
+        grid: bool = False
+    ) -> "np.ndarray":
+        """
+        Evaluate an expression over arrays of inputs in one vectorized call.
+
+        The expression is compiled once per (expression, variable names) and cached.
+
+        Args:
+            expression: Arithmetic expression, e.g. "x^2 + sqrt(y)"
+            variables: Values of each variable
+            grid: Evaluate over the Cartesian product of the values instead of pairing them up
+
+        Returns:
+            Float array; broadcast shape of the inputs, or one axis per variable with grid.
+            Undefined points (division by zero, sqrt of a negative) are NaN or inf.
+        """
+        import numpy as np
+
+        variables = variables or {}
+        names = tuple(variables)
+        function = _compile_vectorized(expression, names)
+        arrays = [np.asarray(values, dtype=np.float64) for values in variables.values()]
+        if grid:
+            arrays = np.meshgrid(*arrays, indexing="ij")
+        with np.errstate(all="ignore"):
+            result = np.asarray(function(*arrays))
+        shape = np.broadcast_shapes(*(array.shape for array in arrays)) if arrays else ()
+        return np.broadcast_to(result.astype(np.float64), shape)
+
+    def evaluate_batch(
+        self,
+        expressions: List[str],
+        variables: Optional[Dict[str, Sequence[float]]] = None,
+        grid: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Evaluate many expressions over the same inputs.
+
+        Returns:
+            One {"expression", "values", "error"} per expression, in input order;
+            values is None for an expression that failed to compile.
+        """
+        results = []
+        for expression in expressions:
+            try:
+                values = self.evaluate_vectorized(expression, variables, grid)
+                results.append({"expression": expression, "values": values, "error": None})
+            except (ArithmeticError, ValueError, TypeError, MemoryError) as e:
+                results.append({"expression": expression, "values": None, "error": str(e) or type(e).__name__})
+        return results
+
     def _preprocess_natural_language(self, query: str) -> str:
         """Convert natural language math questions into symbolic expressions."""
         query = query.lower().strip()
         
-        prefixes = [
-            "what is ", "what's ", "calculate ", "compute ", "find ", "what would be ",
-            "can you tell me ", "tell me ", "solve ", "evaluate "
-        ]
-        for prefix in prefixes:
+        for prefix in self.QUESTION_PREFIXES:
             if query.startswith(prefix):
                 query = query[len(prefix):]
                 break
@@ -57,6 +299,8 @@ class SafeCalculator:
     
     def evaluate(self, expression: str) -> str:
         """Evaluates mathematical expressions, including natural language inputs."""
+        import sympy as sp
+
         try:
             if not expression.strip().replace('.', '').isdigit() and any(c.isalpha() for c in expression):
                 cleaned_expr = self._preprocess_natural_language(expression)
@@ -92,14 +336,27 @@ class SafeCalculator:
 
 
 class MathAgent:
-    def __init__(self, temperature: float = 0.1):  
-        self.llm = OpenAI(temperature=temperature)
+    def __init__(self, temperature: float = 0.1, llm: Optional[Any] = None):
+        # llm replaces the OpenAI completion model, e.g. with FakeProviders.FakeMathLLM
+        if llm is None:
+            from langchain_community.llms import OpenAI
+            from OpenAIClientRegistry import get_client_registry
+
+            registry = get_client_registry()
+            llm = OpenAI(
+                temperature=temperature,
+                client=registry.openai_client().completions,
+                async_client=registry.async_openai_client().completions
+            )
+        self.llm = llm
         self.calculator = SafeCalculator()
         self.tool = self._create_tool()
         self.prompt_template = self._create_prompt_template()
         self.agent = self._initialize_agent()
 
     def _create_tool(self):
+        from langchain.agents import Tool
+
         return Tool(
             name="Calculator",
             func=self.calculator.evaluate,
@@ -107,6 +364,8 @@ class MathAgent:
         )
 
     def _create_prompt_template(self):
+        from langchain.prompts import PromptTemplate
+
         return PromptTemplate(
             input_variables=["input"],
             template=(
@@ -121,6 +380,8 @@ class MathAgent:
         )
 
     def _initialize_agent(self):
+        from langchain.agents import AgentType, initialize_agent
+
         return initialize_agent(
             tools=[self.tool],
             llm=self.llm,
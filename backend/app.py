@@ -1,24 +1,41 @@
 # app.py
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+import time
+from startup_timing import record, timed, startup_report, print_startup_report
+
+_import_start = time.perf_counter()
+
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import shutil
 import os
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 import uuid
-import uvicorn
 from pydantic import BaseModel
 from pathlib import Path
-import time
+import hashlib
+import json
+import math
+import re
+import threading
 from dotenv import load_dotenv
 
-from TextProcessor import TextProcessor
-from ChromaDBManager import ChromaDBManager
-from LLMProvider import LLMProvider
-from PromptManager import PromptManager
-from RAGPipelineManager import RAGPipelineManager
+import asyncio
+from typing import TYPE_CHECKING
+
+from IngestionJobManager import IngestionJobManager
+from agent import SafeCalculator
+from blocking_executor import run_blocking
+import metrics
 
-from agent import MathAgent
+# The RAG stack (langchain, chromadb, numpy) and the math agent are imported on first use,
+# so the server binds without paying for them; startup_timing records what each one costs.
+if TYPE_CHECKING:
+    from AnswerCache import AnswerCache
+    from EmbeddingProvider import EmbeddingProvider
+    from IndexManager import IndexManager
+    from LLMProvider import LLMProvider
+    from agent import MathAgent
 
 load_dotenv()
 
@@ -32,14 +49,71 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    start_time = time.perf_counter()
+    response = await call_next(request)
+    # the route template (/jobs/{job_id}) keeps the label set small
+    route = request.scope.get("route")
+    metrics.observe(
+        "http_request_duration_seconds",
+        time.perf_counter() - start_time,
+        method=request.method,
+        path=getattr(route, "path", "unmatched"),
+        status=response.status_code
+    )
+    return response
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """
+    Reject an oversized upload from its Content-Length header, before Starlette spools the
+    multipart body to disk; save_upload still enforces the per-file limit on what arrives.
+    """
+    if request.method == "POST" and request.url.path == "/upload":
+        content_length = request.headers.get("content-length")
+        if content_length is None or not content_length.isdigit():
+            return JSONResponse(status_code=411, content={"detail": "Uploads must declare a Content-Length."})
+        if int(content_length) > MAX_UPLOAD_REQUEST_MB * 1024 * 1024 + UPLOAD_FORM_OVERHEAD_BYTES:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"The upload exceeds the limit of {MAX_UPLOAD_REQUEST_MB} MB per request."}
+            )
+    return await call_next(request)
+
 class QueryRequest(BaseModel):
     query: str
+    # namespace to search; several namespaces are searched in parallel and merged by score
+    namespace: Optional[str] = None
+    namespaces: Optional[List[str]] = None
+    # return the per-stage timings, token counts and cache hits of this request
+    include_timings: bool = False
 
 class QueryResponse(BaseModel):
     query: str
     answer: str
     sources: List[str] = []
     processing_time: float
+    cached: bool = False
+    context_tokens_saved: Optional[int] = None
+    timings: Optional[Dict[str, Any]] = None
+    namespaces: List[str] = []
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    max_concurrency: Optional[int] = None
+    namespace: Optional[str] = None
+
+class BatchQueryItem(BaseModel):
+    query: str
+    answer: Optional[str] = None
+    sources: List[str] = []
+    cached: bool = False
+    error: Optional[str] = None
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchQueryItem]
+    processing_time: float
 
 class MathRequest(BaseModel):
     expression: str
@@ -48,81 +122,516 @@ class MathResponse(BaseModel):
     expression: str
     result: str
     processing_time: float
+    # "fast" (local strict evaluation) or "agent" (LLM agent)
+    path: str = "agent"
+
+class MathBatchRequest(BaseModel):
+    expressions: List[str]
+    # values of each variable; without variables every expression evaluates to a single value
+    variables: Dict[str, List[float]] = {}
+    # evaluate over the Cartesian product of the variable values instead of pairing them up
+    grid: bool = False
+
+class MathBatchItem(BaseModel):
+    expression: str
+    # flattened row-major values; undefined points (e.g. 1/0, sqrt(-1)) are null
+    values: Optional[List[Optional[float]]] = None
+    shape: List[int] = []
+    error: Optional[str] = None
+
+class MathBatchResponse(BaseModel):
+    results: List[MathBatchItem]
+    processing_time: float
 
 DOCS_DIRECTORY = os.getenv("docs_directory")
 DB_DIRECTORY = os.getenv("db_directory")
 ALLOWED_EXTENSIONS = {"txt", "pdf"}
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("embedding_cache_max_mb", "512"))
+EMBEDDING_BATCH_TOKENS = int(os.getenv("embedding_batch_tokens", "50000"))
+EMBEDDING_CONCURRENCY = int(os.getenv("embedding_concurrency", "4"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("answer_cache_threshold", "0.95"))
+ANSWER_CACHE_TTL = float(os.getenv("answer_cache_ttl", "3600"))
+ANSWER_CACHE_SIZE = int(os.getenv("answer_cache_size", "1000"))
+INGESTION_WORKERS = int(os.getenv("ingestion_workers", "1"))
+PARSER_WORKERS = int(os.getenv("parser_workers", str(os.cpu_count() or 1)))
+# "fast" (tokenize every document once) or "recursive" (langchain splitter); both produce the same chunks
+TEXT_SPLITTER = os.getenv("text_splitter", "fast")
+# "vector", "hybrid" (vector + BM25 with reciprocal rank fusion) or "lexical" (BM25 only, no embedding calls)
+RETRIEVAL_MODE = os.getenv("retrieval_mode", "hybrid")
+VECTOR_TIMEOUT = float(os.getenv("vector_timeout", "5"))
+# "chroma" or "numpy" (exact scan over a memory-mapped matrix); vector_dtype applies to numpy only
+VECTOR_BACKEND = os.getenv("vector_backend", "chroma")
+VECTOR_DTYPE = os.getenv("vector_dtype", "float32")
+CONTEXT_MAX_TOKENS = int(os.getenv("context_max_tokens", "3000"))
+BATCH_QUERY_MAX_SIZE = int(os.getenv("batch_query_max_size", "1000"))
+BATCH_QUERY_CONCURRENCY = int(os.getenv("batch_query_concurrency", "8"))
+MATH_BATCH_MAX_POINTS = int(os.getenv("math_batch_max_points", "1000000"))
+# open a verified persisted index at startup and catch up on changed files in the background
+WARM_START = os.getenv("warm_start", "true").lower() in ("1", "true", "yes")
+# serve with FakeProviders instead of OpenAI (load tests, offline demos); the latencies are simulated
+FAKE_PROVIDERS = os.getenv("fake_providers", "false").lower() in ("1", "true", "yes")
+FAKE_EMBEDDING_LATENCY = float(os.getenv("fake_embedding_latency", "0.02"))
+FAKE_LLM_LATENCY = float(os.getenv("fake_llm_latency", "0.2"))
+FAKE_TOKEN_LATENCY = float(os.getenv("fake_token_latency", "0.01"))
+# upper bound for the namespaces one query may fan out to
+MAX_QUERY_NAMESPACES = int(os.getenv("max_query_namespaces", "16"))
+# the default namespace keeps the original single-collection layout; every other namespace
+# gets its own documents directory, collection, manifest and BM25 index under "namespaces/"
+DEFAULT_NAMESPACE = "default"
+# chunks at least this similar (estimated Jaccard of word shingles) to an indexed chunk are not embedded; 0 disables
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("near_duplicate_threshold", "0.9"))
+# uploads are streamed to disk in blocks of UPLOAD_BLOCK_BYTES; larger files or requests get a 413
+MAX_UPLOAD_FILE_MB = int(os.getenv("max_upload_file_mb", "100"))
+MAX_UPLOAD_REQUEST_MB = int(os.getenv("max_upload_request_mb", "500"))
+UPLOAD_BLOCK_BYTES = 1 << 20
+# room for the multipart boundaries and part headers on top of the file bytes
+UPLOAD_FORM_OVERHEAD_BYTES = 1 << 20
+# uploads are staged next to the documents (same filesystem, so os.replace is atomic) but outside
+# any documents directory, so half-written files are never listed, deleted or ingested
+UPLOAD_STAGING_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(DOCS_DIRECTORY)), ".uploads")
+NAMESPACE_PATTERN = re.compile(r"^[a-z0-9](?:[a-z0-9_-]{0,46}[a-z0-9])?$")
+if FAKE_PROVIDERS:
+    # fake vectors get their own store and embedding cache, so they never mix with real ones
+    DB_DIRECTORY = os.path.join(DB_DIRECTORY, "fake_providers")
+# each backend keeps its own manifest and BM25 index, so switching backends re-indexes instead of
+# trusting a manifest that describes the other store (the embedding cache is shared)
+INDEX_DIRECTORY = DB_DIRECTORY if VECTOR_BACKEND == "chroma" else os.path.join(DB_DIRECTORY, f"{VECTOR_BACKEND}_index")
 
 Path(DOCS_DIRECTORY).mkdir(parents=True, exist_ok=True)
 Path(DB_DIRECTORY).mkdir(parents=True, exist_ok=True)
+Path(INDEX_DIRECTORY).mkdir(parents=True, exist_ok=True)
+
+# namespace -> pipeline; a namespace without documents has none
+rag_pipelines: Dict[str, Any] = {}
+pipeline_lock = threading.Lock()
+# guards the lazily built singletons below
+init_lock = threading.RLock()
+index_managers: Dict[str, "IndexManager"] = {}
+answer_caches: Dict[str, "AnswerCache"] = {}
+embedding_function = None
+llm_provider = None
+math_agent = None
+# the strict arithmetic fast path needs none of the agent's dependencies
+calculator = SafeCalculator()
+warm_up_task = None
+
+def validate_namespace(namespace: Optional[str]) -> str:
+    """The namespace to use, or a 400 when the name cannot be used as a directory and collection name"""
+    namespace = namespace or DEFAULT_NAMESPACE
+    if not NAMESPACE_PATTERN.match(namespace):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid namespace '{namespace}': use 1-48 lowercase letters, digits, '-' or '_', starting and ending with a letter or digit."
+        )
+    return namespace
+
+def namespace_paths(namespace: str) -> Tuple[str, str]:
+    """Documents directory and index directory of a namespace"""
+    if namespace == DEFAULT_NAMESPACE:
+        return DOCS_DIRECTORY, INDEX_DIRECTORY
+    return (
+        os.path.join(DOCS_DIRECTORY, "namespaces", namespace),
+        os.path.join(INDEX_DIRECTORY, "namespaces", namespace)
+    )
 
-rag_pipeline = None
+def list_namespaces() -> List[str]:
+    """The default namespace and every namespace that has a documents directory"""
+    namespaces = {DEFAULT_NAMESPACE}
+    root = Path(DOCS_DIRECTORY) / "namespaces"
+    if root.is_dir():
+        namespaces.update(path.name for path in root.iterdir() if path.is_dir() and NAMESPACE_PATTERN.match(path.name))
+    return sorted(namespaces)
 
-math_agent = MathAgent()
+def get_answer_cache(namespace: str = DEFAULT_NAMESPACE) -> "AnswerCache":
+    """Answer cache of a namespace; each cache follows the corpus version of its own namespace"""
+    with init_lock:
+        if namespace not in answer_caches:
+            with timed("import AnswerCache"):
+                from AnswerCache import AnswerCache
+            answer_caches[namespace] = AnswerCache(
+                similarity_threshold=ANSWER_CACHE_THRESHOLD,
+                ttl_seconds=ANSWER_CACHE_TTL,
+                max_entries=ANSWER_CACHE_SIZE
+            )
+        return answer_caches[namespace]
+
+def get_llm_provider() -> "LLMProvider":
+    """One LLMProvider for every pipeline rebuild, so its client and connections are reused"""
+    global llm_provider
+    with init_lock:
+        if llm_provider is None:
+            if FAKE_PROVIDERS:
+                from FakeProviders import FakeLLMProvider
+                llm_provider = FakeLLMProvider(latency=FAKE_LLM_LATENCY, token_latency=FAKE_TOKEN_LATENCY)
+            else:
+                with timed("import LLMProvider"):
+                    from LLMProvider import LLMProvider
+                llm_provider = LLMProvider()
+        return llm_provider
+
+def get_math_agent() -> "MathAgent":
+    global math_agent
+    with init_lock:
+        if math_agent is None:
+            from agent import MathAgent
+            with timed("init MathAgent"):
+                if FAKE_PROVIDERS:
+                    from FakeProviders import FakeMathLLM
+                    math_agent = MathAgent(llm=FakeMathLLM(latency=FAKE_LLM_LATENCY))
+                else:
+                    math_agent = MathAgent()
+        return math_agent
 
 def file_extension_is_valid(filename: str) -> bool:
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def build_rag_pipeline():
-    """Build/rebuild the RAG pipeline with current documents"""
-    processor = TextProcessor(directory_path=DOCS_DIRECTORY)
-    processed_docs = processor.process_documents(chunk_size=600, chunk_overlap=200)
+def get_embedding_function() -> "EmbeddingProvider":
+    """One embedding provider for every namespace, so they share the embedding cache, scheduler and connections"""
+    global embedding_function
+    with init_lock:
+        if embedding_function is None:
+            with timed("import EmbeddingCache, EmbeddingScheduler"):
+                from EmbeddingCache import EmbeddingCache
+                from EmbeddingScheduler import EmbeddingScheduler
+            embedding_cache = EmbeddingCache(
+                path=os.path.join(DB_DIRECTORY, "embedding_cache.sqlite"),
+                max_bytes=EMBEDDING_CACHE_MAX_MB * 1024 * 1024
+            )
+            embedding_scheduler = EmbeddingScheduler(
+                max_batch_tokens=EMBEDDING_BATCH_TOKENS,
+                max_concurrency=EMBEDDING_CONCURRENCY
+            )
+            if FAKE_PROVIDERS:
+                from FakeProviders import FakeEmbeddingProvider
+                embedding_function = FakeEmbeddingProvider(
+                    latency=FAKE_EMBEDDING_LATENCY,
+                    cache=embedding_cache,
+                    scheduler=embedding_scheduler
+                )
+            else:
+                with timed("import EmbeddingProvider"):
+                    from EmbeddingProvider import EmbeddingProvider
+                embedding_function = EmbeddingProvider(cache=embedding_cache, scheduler=embedding_scheduler)
+        return embedding_function
+
+def create_db_manager(index_directory: str = INDEX_DIRECTORY, collection_name: str = "Book"):
+    """Build the configured vector store for one collection; all collections share the embedding provider"""
+    if VECTOR_BACKEND == "numpy":
+        with timed("import NumpyDBManager"):
+            from NumpyDBManager import NumpyDBManager
+        return NumpyDBManager(
+            path=index_directory,
+            collection_name=collection_name,
+            dtype=VECTOR_DTYPE,
+            embedding_function=get_embedding_function()
+        )
+    if VECTOR_BACKEND != "chroma":
+        raise ValueError(f"Unknown vector backend '{VECTOR_BACKEND}'")
+    with timed("import ChromaDBManager"):
+        from ChromaDBManager import ChromaDBManager
+    return ChromaDBManager(
+        path=DB_DIRECTORY,
+        collection_name=collection_name,
+        embedding_function=get_embedding_function()
+    )
+
+def get_index_manager(namespace: str = DEFAULT_NAMESPACE) -> "IndexManager":
+    """Index manager of a namespace, over its own documents directory, collection, manifest and BM25 index"""
+    with init_lock:
+        if namespace not in index_managers:
+            docs_directory, index_directory = namespace_paths(namespace)
+            Path(docs_directory).mkdir(parents=True, exist_ok=True)
+            Path(index_directory).mkdir(parents=True, exist_ok=True)
+            db_manager = create_db_manager(
+                index_directory,
+                "Book" if namespace == DEFAULT_NAMESPACE else f"ns_{namespace}"
+            )
+            with timed("import IndexManager, BM25Index"):
+                from IndexManager import IndexManager
+                from BM25Index import BM25Index
+                from NearDuplicateFilter import NearDuplicateFilter
+            near_duplicate_filter = None
+            if NEAR_DUPLICATE_THRESHOLD > 0:
+                near_duplicate_filter = NearDuplicateFilter(
+                    path=os.path.join(index_directory, "near_duplicates.npz"),
+                    threshold=NEAR_DUPLICATE_THRESHOLD
+                )
+            with timed("init IndexManager"):
+                index_managers[namespace] = IndexManager(
+                    docs_directory=docs_directory,
+                    db_manager=db_manager,
+                    manifest_path=os.path.join(index_directory, "index_manifest.json"),
+                    chunk_size=600,
+                    chunk_overlap=200,
+                    parallel_workers=PARSER_WORKERS,
+                    splitter=TEXT_SPLITTER,
+                    lexical_index=BM25Index(os.path.join(index_directory, "bm25_index.json")),
+                    near_duplicate_filter=near_duplicate_filter
+                )
+        return index_managers[namespace]
+
+def build_rag_pipeline(manager: "IndexManager", namespace: str = DEFAULT_NAMESPACE):
+    """Build the RAG pipeline on top of the current index of a namespace"""
+    if not manager.has_documents():
+        return None
     
-    chroma_db = ChromaDBManager(path=DB_DIRECTORY)
-    chroma_db.add_documents(processed_docs)
+    with timed("import RAGPipelineManager"):
+        from PromptManager import PromptManager
+        from RAGPipelineManager import RAGPipelineManager
+        from ContextPacker import ContextPacker
     
-    llm_provider = LLMProvider()
+    llm_provider = get_llm_provider()
     prompt_manager = PromptManager()
     
+    snapshot = manager.snapshot
     return RAGPipelineManager(
-        db_manager=chroma_db,
+        db_manager=snapshot.vector_store,
         llm_provider=llm_provider,
         prompt_manager=prompt_manager,
-        retrieval_k=4
+        retrieval_k=4,
+        answer_cache=get_answer_cache(namespace),
+        corpus_version=manager.corpus_version,
+        lexical_index=snapshot.lexical_index,
+        retrieval_mode=RETRIEVAL_MODE,
+        vector_timeout=VECTOR_TIMEOUT,
+        context_packer=ContextPacker(max_tokens=CONTEXT_MAX_TOKENS, model_name=llm_provider.model),
+        duplicate_sources=manager.duplicate_sources()
     )
 
+def swap_pipeline(namespace: str, new_pipeline):
+    # queries read the pipelines once per request, so they see either the old or the new pipeline
+    with pipeline_lock:
+        if new_pipeline is None:
+            rag_pipelines.pop(namespace, None)
+        else:
+            rag_pipelines[namespace] = new_pipeline
+
+def ingest_documents(progress=None, namespace: Optional[str] = None):
+    """
+    Sync a namespace's index with its documents. The pipeline serving queries keeps answering from
+    the previous corpus until the new one is complete, then a pipeline built on it is swapped in.
+    """
+    namespace = namespace or DEFAULT_NAMESPACE
+    manager = get_index_manager(namespace)
+    new_pipeline = None
+    
+    def publish():
+        nonlocal new_pipeline
+        if progress:
+            progress("swapping", 0, 1)
+        new_pipeline = build_rag_pipeline(manager, namespace)
+        swap_pipeline(namespace, new_pipeline)
+        if progress:
+            progress("swapping", 1, 1)
+    
+    stats = manager.sync(progress, publish)
+    
+    docs_directory, index_directory = namespace_paths(namespace)
+    if namespace != DEFAULT_NAMESPACE and new_pipeline is None and not os.path.isdir(docs_directory):
+        # the namespace was deleted and its chunks are gone: forget it and drop its collection and index files
+        with init_lock:
+            index_managers.pop(namespace, None)
+            answer_caches.pop(namespace, None)
+        manager.db_manager.delete_collection()
+        shutil.rmtree(index_directory, ignore_errors=True)
+    
+    return stats
+
+ingestion_jobs = IngestionJobManager(ingest=ingest_documents, max_workers=INGESTION_WORKERS)
+
+def warm_up():
+    """Build what startup did not need, so the first /math agent call does not pay for it"""
+    get_math_agent()
+    with timed("import sympy"):
+        import sympy
+    print_startup_report()
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize RAG pipeline on startup if documents exist"""
-    global rag_pipeline
-    if any(Path(DOCS_DIRECTORY).iterdir()):
-        rag_pipeline = build_rag_pipeline()
+    """Initialize RAG pipeline on startup, indexing only files that changed since the last run"""
+    with timed("startup: open index"):
+        await open_index()
+    # the math agent is only needed by /math requests the fast path cannot answer
+    global warm_up_task
+    warm_up_task = asyncio.create_task(run_blocking(warm_up))
+
+async def open_index():
+    """Open the index of every namespace; the namespaces are independent, so they open concurrently"""
+    await asyncio.gather(*(open_namespace(namespace) for namespace in list_namespaces()))
+
+async def open_namespace(namespace: str):
+    if WARM_START:
+        start_time = time.time()
+        manager = await run_blocking(get_index_manager, namespace)
+        if await run_blocking(manager.verify):
+            # the persisted index matches its fingerprint: serve it right away
+            new_pipeline = await run_blocking(build_rag_pipeline, manager, namespace)
+            swap_pipeline(namespace, new_pipeline)
+            drift = await run_blocking(manager.detect_drift)
+            print(
+                f"Warm start: opened the persisted index of namespace '{namespace}' ({manager.chunk_count()} chunks) "
+                f"in {time.time() - start_time:.2f}s."
+            )
+            if any(drift.values()):
+                job = ingestion_jobs.submit(action="startup", namespace=namespace)
+                print(
+                    f"Documents changed since the last run ({len(drift['added'])} added, {len(drift['changed'])} changed, "
+                    f"{len(drift['removed'])} removed); syncing in background job {job['job_id']}."
+                )
+            return
+        print(f"Persisted index of namespace '{namespace}' does not match its fingerprint; re-indexing.")
+    await run_blocking(ingest_documents, None, namespace)
+
+@app.get("/startup")
+async def startup_timings():
+    """Import and initialization costs recorded during startup, in milliseconds"""
+    return startup_report()
+
+async def save_upload(file: UploadFile, directory: str, max_bytes: int) -> Tuple[str, str, int]:
+    """
+    Stream an upload to a temporary file in directory, hashing it on the way, so the
+    event loop never blocks on the disk and the content is read only once.
+
+    Returns:
+        (temporary file path, SHA-256 of the content, size in bytes); the temporary file
+        is removed and a 413 raised when the upload exceeds max_bytes
+    """
+    tmp_path = os.path.join(directory, f"{uuid.uuid4().hex}.upload")
+    digest = hashlib.sha256()
+    size = 0
+    buffer = await run_blocking(open, tmp_path, "wb")
+
+    def write_block(block: bytes):
+        digest.update(block)
+        buffer.write(block)
+
+    try:
+        while block := await file.read(UPLOAD_BLOCK_BYTES):
+            size += len(block)
+            if size > max_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"File {file.filename} exceeds the upload limit of {MAX_UPLOAD_FILE_MB} MB per file and {MAX_UPLOAD_REQUEST_MB} MB per request."
+                )
+            await run_blocking(write_block, block)
+        await run_blocking(buffer.close)
+    except BaseException:
+        buffer.close()
+        os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest(), size
 
 @app.post("/upload")
-async def upload_files(files: List[UploadFile] = File(...)):
-    """Upload multiple files and rebuild the RAG pipeline"""
-    global rag_pipeline
-    
-    uploaded_files = []
+async def upload_files(files: List[UploadFile] = File(...), namespace: Optional[str] = Form(None)):
+    """
+    Upload multiple files into a namespace and start a background job that updates its index.
+
+    Files whose content is already indexed under the same name are skipped without starting
+    a job. The other files are moved into place only once every file of the request has
+    arrived within the size limits.
+    """
+    namespace = validate_namespace(namespace)
+    docs_directory, _ = namespace_paths(namespace)
     for file in files:
         if not file_extension_is_valid(file.filename):
             raise HTTPException(status_code=400, detail=f"File {file.filename} has an invalid extension. Allowed: {ALLOWED_EXTENSIONS}")
+    # both copies would be staged and the second would silently replace the first
+    filenames = [file.filename for file in files]
+    repeated = sorted({filename for filename in filenames if filenames.count(filename) > 1})
+    if repeated:
+        raise HTTPException(status_code=400, detail=f"Files uploaded more than once in the same request: {', '.join(repeated)}")
 
-        file_path = os.path.join(DOCS_DIRECTORY, file.filename)
-       
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        uploaded_files.append(file.filename)
-    
-    
-    rag_pipeline = build_rag_pipeline()
+    # creates the documents directory; the manifest tells which uploads are already indexed
+    manager = await run_blocking(get_index_manager, namespace)
+    Path(UPLOAD_STAGING_DIRECTORY).mkdir(parents=True, exist_ok=True)
+    staged = []
+    skipped = []
+    duplicates = {}
+    remaining_bytes = MAX_UPLOAD_REQUEST_MB * 1024 * 1024
+    try:
+        for file in files:
+            tmp_path, file_hash, size = await save_upload(
+                file, UPLOAD_STAGING_DIRECTORY, min(MAX_UPLOAD_FILE_MB * 1024 * 1024, remaining_bytes)
+            )
+            remaining_bytes -= size
+            indexed = await run_blocking(manager.find_indexed, file_hash, file.filename)
+            if indexed == file.filename:
+                # same name, same bytes: nothing to re-process
+                os.remove(tmp_path)
+                skipped.append(file.filename)
+                continue
+            if indexed is not None:
+                # same bytes under another name: still indexed under this name, but its chunks are dropped
+                # as near-duplicates or hit the embedding cache, so nothing is embedded again
+                duplicates[file.filename] = indexed
+            staged.append((file.filename, tmp_path))
+        for filename, tmp_path in staged:
+            os.replace(tmp_path, os.path.join(docs_directory, filename))
+    except BaseException:
+        for _, tmp_path in staged:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+
+    uploaded_files = [filename for filename, _ in staged]
+    job = ingestion_jobs.submit(files=uploaded_files, action="upload", namespace=namespace) if uploaded_files else None
     
     return JSONResponse(
-        status_code=200,
-        content={"message": f"Successfully uploaded {len(uploaded_files)} files", "files": uploaded_files}
+        status_code=202 if job else 200,
+        content={
+            "message": f"Successfully uploaded {len(uploaded_files)} files, {len(skipped)} unchanged",
+            "files": uploaded_files,
+            "skipped": skipped,
+            "duplicates": duplicates,
+            "namespace": namespace,
+            "job_id": job["job_id"] if job else None
+        }
     )
 
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status and per-stage progress of an ingestion job"""
+    job = ingestion_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@app.get("/jobs")
+async def list_jobs():
+    """List recent ingestion jobs"""
+    return {"jobs": ingestion_jobs.list_jobs()}
+
+def resolve_pipeline(namespace: Optional[str], namespaces: Optional[List[str]] = None):
+    """
+    The pipeline answering a query: the namespace's own pipeline, or a FanOutSearch when several
+    namespaces are given. Returns (pipeline, searched namespaces); namespaces without documents are skipped.
+    """
+    names = list(dict.fromkeys(validate_namespace(name) for name in (namespaces or [namespace])))
+    if len(names) > MAX_QUERY_NAMESPACES:
+        raise HTTPException(status_code=400, detail=f"A query can search at most {MAX_QUERY_NAMESPACES} namespaces.")
+    
+    # read the pipelines once; a background job may swap them while this request runs
+    with pipeline_lock:
+        pipelines = {name: rag_pipelines[name] for name in names if name in rag_pipelines}
+    
+    if not pipelines:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No documents have been uploaded to {', '.join(names)} yet. Please upload documents first."
+        )
+    if len(names) == 1:
+        return pipelines[names[0]], names
+    from FanOutSearch import FanOutSearch
+    return FanOutSearch(pipelines), list(pipelines)
+
 @app.post("/query", response_model=QueryResponse)
 async def query_documents(request: QueryRequest):
-    """Query the RAG pipeline with a question"""
-    global rag_pipeline
-    
-    if not rag_pipeline:
-        raise HTTPException(status_code=404, detail="No documents have been uploaded yet. Please upload documents first.")
+    """Query the RAG pipeline of one or several namespaces with a question"""
+    pipeline, namespaces = resolve_pipeline(request.namespace, request.namespaces)
     
     start_time = time.time()
-    result = rag_pipeline.process_query(request.query)
+    with metrics.request_breakdown() as breakdown:
+        result = await pipeline.aprocess_query(request.query)
     processing_time = time.time() - start_time
     
     
@@ -134,65 +643,223 @@ async def query_documents(request: QueryRequest):
         query=result["query"],
         answer=result["answer"],
         sources=sources,
+        processing_time=round(processing_time, 2),
+        cached=result.get("cached", False),
+        context_tokens_saved=(result.get("context") or {}).get("tokens_saved"),
+        timings=breakdown if request.include_timings else None,
+        namespaces=namespaces
+    )
+
+@app.post("/query/batch", response_model=BatchQueryResponse)
+async def query_documents_batch(request: BatchQueryRequest):
+    """Answer many questions in one request; results come back in input order with per-item errors"""
+    pipeline, _ = resolve_pipeline(request.namespace)
+    
+    if len(request.queries) > BATCH_QUERY_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"A batch can hold at most {BATCH_QUERY_MAX_SIZE} queries.")
+    
+    # the server-side limit caps what a client may ask for
+    max_concurrency = min(request.max_concurrency or BATCH_QUERY_CONCURRENCY, BATCH_QUERY_CONCURRENCY)
+    
+    start_time = time.time()
+    results = await pipeline.aprocess_queries(request.queries, max_concurrency=max_concurrency)
+    processing_time = time.time() - start_time
+    
+    return BatchQueryResponse(
+        results=[
+            BatchQueryItem(
+                query=result["query"],
+                answer=result["answer"],
+                sources=result["sources"],
+                cached=result["cached"],
+                error=result.get("error")
+            )
+            for result in results
+        ],
         processing_time=round(processing_time, 2)
     )
 
+@app.post("/query/stream")
+async def query_documents_stream(request: QueryRequest):
+    """Query the RAG pipeline and stream sources, answer tokens and timings as Server-Sent Events"""
+    # keep a reference so a concurrent rebuild does not swap the pipeline mid-stream
+    pipeline, _ = resolve_pipeline(request.namespace, request.namespaces)
+    
+    async def event_stream():
+        with metrics.request_breakdown() as breakdown:
+            async for event in pipeline.astream_query(request.query):
+                if event["event"] == "done" and request.include_timings:
+                    event["data"]["timings"] = breakdown
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/math", response_model=MathResponse)
 async def calculate_math(request: MathRequest):
     """Process mathematical calculations using MathAgent"""
-    global math_agent
-    
     start_time = time.time()
     try:
-        result = math_agent.run(request.expression)
+        # plain arithmetic is evaluated locally in microseconds, right on the event loop
+        result = calculator.evaluate_strict(request.expression)
+        path = "fast"
+        if result is None:
+            # the agent is synchronous; keep it off the event loop
+            result = await run_blocking(lambda: get_math_agent().run(request.expression))
+            path = "agent"
         processing_time = time.time() - start_time
+        metrics.record_stage(f"math_{path}", processing_time)
         
         return MathResponse(
             expression=request.expression,
             result=result,
-            processing_time=round(processing_time, 2)
+            processing_time=round(processing_time, 6),
+            path=path
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error processing mathematical expression: {str(e)}")
 
+@app.post("/math/batch", response_model=MathBatchResponse)
+async def calculate_math_batch(request: MathBatchRequest):
+    """Evaluate many expressions, optionally over arrays of variable values, with compiled vectorized code"""
+    lengths = [len(values) for values in request.variables.values()]
+    points_per_expression = math.prod(lengths) if request.grid else max(lengths, default=1)
+    if points_per_expression * max(len(request.expressions), 1) > MATH_BATCH_MAX_POINTS:
+        raise HTTPException(status_code=413, detail=f"A batch can evaluate at most {MATH_BATCH_MAX_POINTS} points.")
+    
+    start_time = time.time()
+    results = await run_blocking(
+        calculator.evaluate_batch, request.expressions, request.variables, request.grid
+    )
+    processing_time = time.time() - start_time
+    
+    items = []
+    for result in results:
+        values = result["values"]
+        if values is None:
+            items.append(MathBatchItem(expression=result["expression"], error=result["error"]))
+            continue
+        flat = values.ravel()
+        items.append(MathBatchItem(
+            expression=result["expression"],
+            # JSON has no NaN or infinity
+            values=[float(value) if math.isfinite(value) else None for value in flat.tolist()],
+            shape=list(values.shape)
+        ))
+    
+    return MathBatchResponse(results=items, processing_time=round(processing_time, 6))
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Stage latencies, token counts and cache hit rates in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit rates of the answer cache of every namespace and of the shared embedding cache"""
+    with init_lock:
+        caches = dict(answer_caches)
+    stats = {
+        "answer_cache": get_answer_cache().stats(),
+        "namespaces": {namespace: cache.stats() for namespace, cache in sorted(caches.items())}
+    }
+    if embedding_function is not None and embedding_function.cache is not None:
+        stats["embedding_cache"] = embedding_function.cache.stats()
+    return stats
+
+def namespace_documents(namespace: str) -> List[str]:
+    docs_directory, _ = namespace_paths(namespace)
+    if not os.path.isdir(docs_directory):
+        return []
+    return [f.name for f in Path(docs_directory).iterdir() if f.is_file()]
+
+def namespace_stats(namespace: str) -> Dict[str, Any]:
+    manager = index_managers.get(namespace)
+    return {
+        "namespace": namespace,
+        "documents": len(namespace_documents(namespace)),
+        "chunks": manager.chunk_count() if manager is not None else 0,
+        "corpus_version": manager.corpus_version if manager is not None else None,
+        "ready": namespace in rag_pipelines
+    }
+
+@app.get("/namespaces")
+async def list_namespace_stats():
+    """Every namespace with its document and chunk counts"""
+    return {"namespaces": [namespace_stats(namespace) for namespace in list_namespaces()]}
+
+@app.get("/namespaces/{namespace}")
+async def get_namespace_stats(namespace: str):
+    """Document and chunk counts and the answer cache of one namespace"""
+    namespace = validate_namespace(namespace)
+    if namespace not in list_namespaces():
+        raise HTTPException(status_code=404, detail=f"Namespace {namespace} not found")
+    stats = namespace_stats(namespace)
+    if namespace in answer_caches:
+        stats["answer_cache"] = answer_caches[namespace].stats()
+    return stats
+
+@app.delete("/namespaces/{namespace}")
+async def delete_namespace(namespace: str):
+    """Delete a namespace with its documents; a background job removes its chunks and index files"""
+    namespace = validate_namespace(namespace)
+    if namespace == DEFAULT_NAMESPACE:
+        raise HTTPException(status_code=400, detail="The default namespace cannot be deleted; use DELETE /documents to empty it.")
+    if namespace not in list_namespaces():
+        raise HTTPException(status_code=404, detail=f"Namespace {namespace} not found")
+    
+    # the job syncs through this manager, so it must exist before the documents directory is gone
+    await run_blocking(get_index_manager, namespace)
+    docs_directory, _ = namespace_paths(namespace)
+    deleted_files = namespace_documents(namespace)
+    shutil.rmtree(docs_directory, ignore_errors=True)
+    
+    job = ingestion_jobs.submit(files=deleted_files, action="delete", namespace=namespace)
+    
+    return {"message": f"Namespace {namespace} deleted successfully", "job_id": job["job_id"]}
+
 @app.get("/documents")
-async def list_documents():
-    """List all uploaded documents"""
-    files = [f.name for f in Path(DOCS_DIRECTORY).iterdir() if f.is_file()]
+async def list_documents(namespace: Optional[str] = None):
+    """List all uploaded documents of a namespace"""
+    files = namespace_documents(validate_namespace(namespace))
     return {"documents": files, "count": len(files)}
 
 @app.delete("/documents/{filename}")
-async def delete_document(filename: str):
+async def delete_document(filename: str, namespace: Optional[str] = None):
     """Delete a specific document"""
-    file_path = Path(DOCS_DIRECTORY) / filename
+    namespace = validate_namespace(namespace)
+    docs_directory, _ = namespace_paths(namespace)
+    file_path = Path(docs_directory) / filename
     
-    if not file_path.exists():
+    if not file_path.is_file():
         raise HTTPException(status_code=404, detail=f"Document {filename} not found")
     
     file_path.unlink()
     
-   
-    global rag_pipeline
-    if any(Path(DOCS_DIRECTORY).iterdir()):
-        rag_pipeline = build_rag_pipeline()
-    else:
-        rag_pipeline = None
+    # queries keep using the current pipeline until the job has removed the chunks
+    job = ingestion_jobs.submit(files=[filename], action="delete", namespace=namespace)
     
-    return {"message": f"Document {filename} deleted successfully"}
+    return {"message": f"Document {filename} deleted successfully", "job_id": job["job_id"]}
 
 @app.delete("/documents")
-async def delete_all_documents():
-    """Delete all documents"""
-    for file_path in Path(DOCS_DIRECTORY).iterdir():
-        if file_path.is_file():
-            file_path.unlink()
+async def delete_all_documents(namespace: Optional[str] = None):
+    """Delete all documents of a namespace"""
+    namespace = validate_namespace(namespace)
+    deleted_files = []
+    for filename in namespace_documents(namespace):
+        (Path(namespace_paths(namespace)[0]) / filename).unlink()
+        deleted_files.append(filename)
     
+    job = ingestion_jobs.submit(files=deleted_files, action="delete", namespace=namespace)
     
-    global rag_pipeline
-    rag_pipeline = None
-    
-    return {"message": "All documents deleted successfully"}
+    return {"message": "All documents deleted successfully", "job_id": job["job_id"]}
+
 
+record("import app", time.perf_counter() - _import_start)
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,205 @@
+"""
+Benchmark ingestion, indexing and query latency of the RAG pipeline offline.
+
+Embeddings and answers come from FakeProviders, so no API calls are made and the
+numbers only reflect this code (plus any simulated latency). For every corpus size
+a synthetic corpus is generated and run through:
+
+    ingestion  TextProcessor.process_documents (load, clean, split)
+    indexing   ChromaDBManager.add_documents (embed, upsert)
+    query      RAGPipelineManager.process_query (embed, search, pack, generate)
+
+Results are written as JSON; pass an earlier file to --compare to print the
+change of every metric. Run from the backend directory:
+
+    python benchmarks/rag_pipeline.py --sizes 10,100,1000 --output bench.json
+    python benchmarks/rag_pipeline.py --sizes 10,100,1000 --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from BM25Index import BM25Index
+from ChromaDBManager import ChromaDBManager
+from FakeProviders import FakeEmbeddingProvider, FakeLLMProvider
+from PromptManager import PromptManager
+from RAGPipelineManager import RAGPipelineManager
+from TextProcessor import TextProcessor
+
+
+def make_corpus(directory: str, documents: int, words_per_document: int, seed: int = 0) -> List[str]:
+    """Write synthetic .txt documents and return a few of their sentences to use as queries."""
+    rng = random.Random(seed)
+    vocabulary = [f"{rng.choice('bcdfghklmnprstvz')}{rng.choice('aeiou')}{rng.choice('lmnrst')}{i}" for i in range(5000)]
+    sentences = []
+    for i in range(documents):
+        # each document leans towards its own slice of the vocabulary, so queries have a right answer
+        topic = rng.randrange(len(vocabulary) - 200)
+        words = [
+            vocabulary[topic + rng.randrange(200)] if rng.random() < 0.7 else rng.choice(vocabulary)
+            for _ in range(words_per_document)
+        ]
+        text = ". ".join(" ".join(words[j:j + 12]) for j in range(0, len(words), 12))
+        with open(os.path.join(directory, f"doc_{i:05d}.txt"), "w", encoding="utf-8") as f:
+            f.write(text)
+        sentences.append(" ".join(words[:8]))
+    return sentences
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    milliseconds = np.asarray(latencies) * 1000
+    return {
+        "mean_ms": float(milliseconds.mean()),
+        "p50_ms": float(np.percentile(milliseconds, 50)),
+        "p95_ms": float(np.percentile(milliseconds, 95)),
+        "p99_ms": float(np.percentile(milliseconds, 99))
+    }
+
+
+def run_size(documents: int, args: argparse.Namespace) -> Dict[str, Any]:
+    directory = tempfile.mkdtemp(prefix="rag_benchmark_")
+    try:
+        docs_directory = os.path.join(directory, "docs")
+        os.makedirs(docs_directory)
+        queries = make_corpus(docs_directory, documents, args.words, seed=documents)
+        corpus_bytes = sum(os.path.getsize(os.path.join(docs_directory, name)) for name in os.listdir(docs_directory))
+
+        start = time.perf_counter()
+        chunks = TextProcessor(docs_directory).process_documents(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+        ingestion_seconds = time.perf_counter() - start
+
+        embeddings = FakeEmbeddingProvider(dimension=args.dimension, latency=args.embedding_latency)
+        db_manager = ChromaDBManager(path=os.path.join(directory, "db"), embedding_function=embeddings)
+        start = time.perf_counter()
+        ids = db_manager.add_documents(chunks)
+        indexing_seconds = time.perf_counter() - start
+
+        lexical_index = None
+        if args.retrieval_mode != "vector":
+            lexical_index = BM25Index(os.path.join(directory, "bm25_index.json"), get_documents=db_manager.get_documents)
+            lexical_index.add(ids, [chunk.page_content for chunk in chunks], [chunk.metadata for chunk in chunks])
+
+        pipeline = RAGPipelineManager(
+            db_manager=db_manager,
+            llm_provider=FakeLLMProvider(latency=args.llm_latency, token_latency=args.token_latency),
+            prompt_manager=PromptManager(),
+            retrieval_k=4,
+            lexical_index=lexical_index,
+            retrieval_mode=args.retrieval_mode
+        )
+        rng = random.Random(documents)
+        for query in queries[:args.warmup]:
+            pipeline.process_query(query)
+        latencies = []
+        for _ in range(args.queries):
+            query = rng.choice(queries)
+            start = time.perf_counter()
+            pipeline.process_query(query)
+            latencies.append(time.perf_counter() - start)
+
+        return {
+            "documents": documents,
+            "chunks": len(chunks),
+            "corpus_mb": corpus_bytes / 1e6,
+            "ingestion": {
+                "seconds": ingestion_seconds,
+                "documents_per_s": documents / ingestion_seconds,
+                "chunks_per_s": len(chunks) / ingestion_seconds,
+                "mb_per_s": corpus_bytes / 1e6 / ingestion_seconds
+            },
+            "indexing": {
+                "seconds": indexing_seconds,
+                "chunks_per_s": len(chunks) / indexing_seconds
+            },
+            "query": {"queries": len(latencies), **latency_summary(latencies)}
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]):
+    """Print every metric next to the baseline; for latencies lower is better, for rates higher is."""
+    baseline_by_size = {result["documents"]: result for result in baseline["results"]}
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for result in current["results"]:
+        previous = baseline_by_size.get(result["documents"])
+        if previous is None:
+            continue
+        for stage in ("ingestion", "indexing", "query"):
+            for metric, value in result[stage].items():
+                old = previous.get(stage, {}).get(metric)
+                if not isinstance(value, (int, float)) or not old or metric in ("queries", "seconds"):
+                    continue
+                change = (value - old) / old * 100
+                better = change < 0 if metric.endswith("_ms") else change > 0
+                flag = "" if abs(change) < 5 else (" better" if better else " WORSE")
+                print(f"  {result['documents']:>6} docs  {stage}.{metric:<18}{old:>12.3f} -> {value:>12.3f}  {change:+7.1f}%{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000", help="Comma-separated corpus sizes in documents")
+    parser.add_argument("--words", type=int, default=500, help="Words per document")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=600)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--retrieval-mode", default="vector", choices=["vector", "hybrid", "lexical"])
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="Simulated seconds per embedding call")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated seconds before the first answer token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Simulated seconds per answer token")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    results = []
+    for size in (int(value) for value in args.sizes.split(",")):
+        result = run_size(size, args)
+        results.append(result)
+        print(
+            f"{size:>6} docs {result['chunks']:>7} chunks | ingest {result['ingestion']['chunks_per_s']:>9.1f} chunks/s"
+            f" | index {result['indexing']['chunks_per_s']:>9.1f} chunks/s"
+            f" | query p50 {result['query']['p50_ms']:>8.2f} ms p95 {result['query']['p95_ms']:>8.2f} ms"
+        )
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {name: value for name, value in vars(args).items() if name not in ("output", "compare")},
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Micro-benchmark of text cleaning and splitting, the CPU-bound part of ingestion.
+
+Compares the single-pass TextProcessor.clean_text with the original five-pass
+cleaner, and FastTextSplitter with RecursiveCharacterTextSplitter.from_tiktoken_encoder.
+Before timing, both pairs are checked to produce identical output on the synthetic
+corpus and on random text (Unicode, repeated spaces, line breaks, tiny chunk sizes);
+the benchmark fails if they differ. Run from the backend directory:
+
+    python benchmarks/text_processing.py --documents 200 --words 2000
+    python benchmarks/text_processing.py --output text_processing.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from FastTextSplitter import FastTextSplitter
+from TextProcessor import TextProcessor
+
+
+def legacy_clean_text(text: str) -> str:
+    """TextProcessor.clean_text before the patterns were precompiled and the passes fused."""
+    if not isinstance(text, str) or not text.strip():
+        return ""
+    text = text.lower()
+    text = re.sub(r'http[s]?://\S+', '', text)
+    text = re.sub(r'<[^>]+>', '', text)
+    text = re.sub(r'[^\w\s.,!?]', '', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+def make_corpus(documents: int, words_per_document: int, seed: int = 0) -> List[str]:
+    """Raw documents with the noise the cleaner removes: markup, URLs, symbols and line breaks."""
+    rng = random.Random(seed)
+    vocabulary = [f"{rng.choice('bcdfghklmnprstvz')}{rng.choice('aeiou')}{rng.choice('lmnrst')}{i}" for i in range(5000)]
+    vocabulary += ["Dexalo", "AI", "don't", "it's", "naïve", "café", "(2024)", "$1,000", "e-mail", "50%"]
+    corpus = []
+    for _ in range(documents):
+        words = []
+        for j in range(words_per_document):
+            words.append(rng.choice(vocabulary))
+            if rng.random() < 0.01:
+                words.append(rng.choice(["<b>", "</p>", "https://example.com/page?id=1", "—", "*", "#tag"]))
+            if j % 12 == 11:
+                words[-1] += rng.choice([".", ",", "!\n", "?\n\n"])
+        corpus.append(" ".join(words))
+    return corpus
+
+
+def random_text(rng: random.Random) -> str:
+    alphabet = list("abcdefg hij.,!?'0123456789<>/:") + ["  ", "\n", "\t", "é", "日本", "😀", "http://x.io/y ", "<i>", "x" * 80]
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 300)))
+
+
+def check_equivalence(corpus: List[str], chunk_size: int, chunk_overlap: int, trials: int, seed: int):
+    rng = random.Random(seed)
+    samples = corpus + [random_text(rng) for _ in range(trials)]
+    for text in samples:
+        cleaned = TextProcessor.clean_text(text)
+        if cleaned != legacy_clean_text(text):
+            raise AssertionError(f"clean_text differs from the original cleaner on {text[:80]!r}")
+        for size, overlap in [(chunk_size, chunk_overlap), (rng.choice([1, 2, 5, 20]), 0), (10, 5)]:
+            for sample in (cleaned, text):
+                expected = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+                    chunk_size=size, chunk_overlap=overlap
+                ).split_text(sample)
+                if FastTextSplitter(size, overlap).split_text(sample) != expected:
+                    raise AssertionError(f"FastTextSplitter({size}, {overlap}) differs on {sample[:80]!r}")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def best_of(function: Callable[[], Any], repeat: int) -> float:
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - start)
+    return min(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--words", type=int, default=2000, help="Words per document")
+    parser.add_argument("--chunk-size", type=int, default=600)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per variant; the fastest is reported")
+    parser.add_argument("--trials", type=int, default=300, help="Random texts checked for identical output")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.documents, args.words, args.seed)
+    corpus_mb = sum(len(text.encode("utf-8")) for text in corpus) / 1e6
+    check_equivalence(corpus[:20], args.chunk_size, args.chunk_overlap, args.trials, args.seed)
+    print(f"Identical output on {min(len(corpus), 20) + args.trials} texts")
+
+    cleaned = [TextProcessor.clean_text(text) for text in corpus]
+    reference = RecursiveCharacterTextSplitter.from_tiktoken_encoder(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    fast = FastTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    fast.split_text(cleaned[0])
+
+    variants = {
+        "clean": {
+            "baseline": lambda: [legacy_clean_text(text) for text in corpus],
+            "optimized": lambda: [TextProcessor.clean_text(text) for text in corpus]
+        },
+        "split": {
+            "baseline": lambda: [reference.split_text(text) for text in cleaned],
+            "optimized": lambda: [fast.split_text(text) for text in cleaned]
+        }
+    }
+    results: Dict[str, Dict[str, Any]] = {}
+    for name, pair in variants.items():
+        baseline = best_of(pair["baseline"], args.repeat)
+        optimized = best_of(pair["optimized"], args.repeat)
+        results[name] = {
+            "baseline_seconds": baseline,
+            "optimized_seconds": optimized,
+            "baseline_mb_per_s": corpus_mb / baseline,
+            "optimized_mb_per_s": corpus_mb / optimized,
+            "speedup": baseline / optimized
+        }
+        print(
+            f"{name:<6} {corpus_mb:7.2f} MB | baseline {corpus_mb / baseline:8.2f} MB/s"
+            f" | optimized {corpus_mb / optimized:8.2f} MB/s | {baseline / optimized:5.2f}x"
+        )
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {name: value for name, value in vars(args).items() if name != "output"},
+        "corpus_mb": corpus_mb,
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Compare the Chroma and NumPy vector backends on recall and latency.
+
+Uses synthetic clustered embeddings, so no API calls are made. Recall@k is
+measured against an exact float64 scan. Run from the backend directory:
+
+    python benchmarks/vector_index.py --rows 20000 --dim 1536
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ChromaDBManager import ChromaDBManager
+from NumpyDBManager import NumpyDBManager
+
+
+def make_corpus(rows: int, dim: int, queries: int, seed: int = 0):
+    """Clustered unit vectors, with queries drawn near random corpus rows."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(rows // 50, 1), dim))
+    corpus = centers[rng.integers(0, len(centers), rows)] + 0.6 * rng.standard_normal((rows, dim))
+    corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+    probes = corpus[rng.integers(0, rows, queries)] + 0.5 * rng.standard_normal((queries, dim)) / np.sqrt(dim)
+    probes /= np.linalg.norm(probes, axis=1, keepdims=True)
+    return corpus.astype(np.float32), probes.astype(np.float32)
+
+
+def exact_neighbours(corpus: np.ndarray, probes: np.ndarray, k: int):
+    scores = probes.astype(np.float64) @ corpus.astype(np.float64).T
+    return [set(np.argsort(-row)[:k]) for row in scores]
+
+
+def load(manager, corpus: np.ndarray, batch_size: int = 4096):
+    ids = [str(i) for i in range(len(corpus))]
+    for start in range(0, len(corpus), batch_size):
+        end = start + batch_size
+        manager.upsert_embeddings(
+            ids[start:end],
+            [f"chunk {i}" for i in range(start, min(end, len(corpus)))],
+            corpus[start:end].tolist(),
+            [{"source": "benchmark"}] * len(ids[start:end])
+        )
+
+
+def measure(name: str, manager, probes: np.ndarray, truth, k: int, open_seconds: float):
+    latencies = []
+    hits = 0
+    for probe, expected in zip(probes, truth):
+        start = time.perf_counter()
+        docs = manager.similarity_search_by_vector(probe.tolist(), k)
+        latencies.append(time.perf_counter() - start)
+        hits += len(expected & {int(doc.id) for doc in docs})
+
+    result = {
+        "backend": name,
+        "recall": hits / (len(probes) * k),
+        "p50_ms": np.percentile(latencies, 50) * 1000,
+        "p95_ms": np.percentile(latencies, 95) * 1000,
+        "open_ms": open_seconds * 1000,
+        "batch_ms_per_query": None
+    }
+    if hasattr(manager, "similarity_search_by_vectors"):
+        start = time.perf_counter()
+        manager.similarity_search_by_vectors(probes.tolist(), k)
+        result["batch_ms_per_query"] = (time.perf_counter() - start) * 1000 / len(probes)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--skip-chroma", action="store_true")
+    args = parser.parse_args()
+
+    corpus, probes = make_corpus(args.rows, args.dim, args.queries)
+    truth = exact_neighbours(corpus, probes, args.k)
+    directory = tempfile.mkdtemp(prefix="vector_benchmark_")
+    results = []
+    try:
+        backends = [("numpy-float32", "float32"), ("numpy-float16", "float16"), ("numpy-int8", "int8")]
+        if not args.skip_chroma:
+            backends.insert(0, ("chroma", None))
+
+        for name, dtype in backends:
+            path = os.path.join(directory, name)
+            if dtype is None:
+                load(ChromaDBManager(path=path, openai_api_key="unused"), corpus)
+                start = time.perf_counter()
+                manager = ChromaDBManager(path=path, openai_api_key="unused")
+                manager.similarity_search_by_vector(probes[0].tolist(), args.k)
+            else:
+                load(NumpyDBManager(path=path, openai_api_key="unused", dtype=dtype), corpus)
+                start = time.perf_counter()
+                manager = NumpyDBManager(path=path, openai_api_key="unused", dtype=dtype)
+                manager.similarity_search_by_vector(probes[0].tolist(), args.k)
+            # time to reopen the persisted store and answer a first query
+            open_seconds = time.perf_counter() - start
+            results.append(measure(name, manager, probes, truth, args.k, open_seconds))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"\n{args.rows} rows x {args.dim} dims, {args.queries} queries, k={args.k}")
+    print(f"{'backend':<16}{'recall':>8}{'p50 ms':>10}{'p95 ms':>10}{'open ms':>10}{'batch ms/q':>12}")
+    for result in results:
+        batch = f"{result['batch_ms_per_query']:.3f}" if result["batch_ms_per_query"] is not None else "-"
+        print(
+            f"{result['backend']:<16}{result['recall']:>8.3f}{result['p50_ms']:>10.3f}"
+            f"{result['p95_ms']:>10.3f}{result['open_ms']:>10.1f}{batch:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
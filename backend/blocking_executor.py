@@ -0,0 +1,24 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Bounded pool for blocking work (Chroma searches, cache lookups, sync fallbacks) called from async code,
+# so a burst of requests cannot spawn an unbounded number of threads.
+BLOCKING_WORKERS = int(os.getenv("blocking_workers", "16"))
+
+_executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="blocking")
+
+
+async def run_blocking(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking callable on the shared bounded executor without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    # carry the caller's context over, so the work counts towards its request's metrics breakdown
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(context.run, func, *args, **kwargs))
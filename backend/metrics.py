@@ -0,0 +1,165 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+# Prometheus-style metrics kept in process and rendered by GET /metrics.
+# Stage timers also add to the breakdown of the request running in the current context,
+# so one request can report where its time went (see request_breakdown).
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+_HELP = {
+    "rag_stage_duration_seconds": ("histogram", "Time spent in one pipeline stage", SECONDS_BUCKETS),
+    "http_request_duration_seconds": ("histogram", "Time to serve an HTTP request", SECONDS_BUCKETS),
+    "llm_tokens": ("histogram", "Tokens per LLM call", TOKEN_BUCKETS),
+    "context_tokens": ("histogram", "Context tokens per generation after packing", TOKEN_BUCKETS),
+    "cache_requests_total": ("counter", "Cache lookups by cache and result", None),
+    "llm_tokens_total": ("counter", "Tokens sent to and received from the LLM", None),
+    "embedding_batches_total": ("counter", "Embedding batches sent by the scheduler, by outcome", None),
+}
+
+_lock = threading.Lock()
+# name -> labels -> [bucket counts..., sum, count] for histograms, or [value] for counters
+_series: Dict[str, Dict[Tuple[Tuple[str, str], ...], list]] = {name: {} for name in _HELP}
+# name -> (help, callback returning {labels: value}) for gauges read at render time
+_gauges: Dict[str, Tuple[str, Callable[[], Dict[Tuple[Tuple[str, str], ...], float]]]] = {}
+
+_breakdown: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_breakdown", default=None)
+
+
+def _key(labels: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def observe(name: str, value: float, **labels: Any):
+    """Add an observation to a histogram."""
+    buckets = _HELP[name][2]
+    with _lock:
+        series = _series[name].setdefault(_key(labels), [0] * (len(buckets) + 2))
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+
+def increment(name: str, value: float = 1, **labels: Any):
+    with _lock:
+        series = _series[name].setdefault(_key(labels), [0])
+        series[0] += value
+
+
+def register_gauge(name: str, help_text: str, callback: Callable[[], Dict[Tuple[Tuple[str, str], ...], float]]):
+    """Expose a value computed when /metrics is scraped, e.g. the rate limiter queue length."""
+    with _lock:
+        _gauges[name] = (help_text, callback)
+
+
+@contextmanager
+def request_breakdown() -> Iterator[Dict[str, Any]]:
+    """Collect the stage timings and token counts of the code run inside the block."""
+    breakdown = {"stages_ms": {}, "tokens": {}, "cache": {}}
+    previous = _breakdown.get()
+    _breakdown.set(breakdown)
+    try:
+        yield breakdown
+    finally:
+        # set rather than reset: a streamed response may be closed from another context
+        _breakdown.set(previous)
+
+
+def _add(section: str, name: str, value: float):
+    breakdown = _breakdown.get()
+    if breakdown is not None:
+        with _lock:
+            breakdown[section][name] = round(breakdown[section].get(name, 0) + value, 3)
+
+
+def record_stage(stage_name: str, seconds: float):
+    observe("rag_stage_duration_seconds", seconds, stage=stage_name)
+    _add("stages_ms", stage_name, seconds * 1000)
+
+
+@contextmanager
+def stage(stage_name: str) -> Iterator[None]:
+    """
+    Time a pipeline stage. Stages that run concurrently (the vector and lexical searches
+    of a hybrid query) or repeatedly add up in the breakdown, so it can exceed the wall clock.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage_name, time.perf_counter() - start)
+
+
+def record_tokens(kind: str, count: int):
+    """Count LLM tokens of one call; kind is "prompt" or "completion"."""
+    observe("llm_tokens", count, kind=kind)
+    increment("llm_tokens_total", count, kind=kind)
+    _add("tokens", kind, count)
+
+
+def record_context_tokens(stats: Dict[str, Any]):
+    """Record the packing statistics of one generation (see ContextPacker.pack)."""
+    observe("context_tokens", stats["packed_tokens"])
+    _add("tokens", "context", stats["packed_tokens"])
+    _add("tokens", "context_saved", stats["tokens_saved"])
+
+
+def record_cache(cache: str, hits: int, misses: int):
+    if hits:
+        increment("cache_requests_total", hits, cache=cache, result="hit")
+    if misses:
+        increment("cache_requests_total", misses, cache=cache, result="miss")
+    _add("cache", f"{cache}_hits", hits)
+    _add("cache", f"{cache}_misses", misses)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _cache_hit_ratio() -> Dict[Tuple[Tuple[str, str], ...], float]:
+    totals: Dict[str, list] = {}
+    for labels, (value,) in _series["cache_requests_total"].items():
+        labels = dict(labels)
+        counts = totals.setdefault(labels["cache"], [0, 0])
+        counts[labels["result"] == "hit"] += value
+    return {(("cache", cache),): hits / (hits + misses) for cache, (misses, hits) in totals.items() if hits + misses}
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        for name, (kind, help_text, buckets) in _HELP.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, series in sorted(_series[name].items()):
+                if kind == "counter":
+                    lines.append(f"{name}{_format_labels(labels)} {series[0]}")
+                    continue
+                for bound, count in zip(buckets, series):
+                    lines.append(f"{name}_bucket{_format_labels(labels, (('le', str(bound)),))} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {series[-1]}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {series[-2]}")
+                lines.append(f"{name}_count{_format_labels(labels)} {series[-1]}")
+        gauges = {"cache_hit_ratio": ("Share of cache lookups that were hits since start", _cache_hit_ratio())}
+        callbacks = dict(_gauges)
+    # registered callbacks take their own locks, so they run outside ours
+    for name, (help_text, callback) in callbacks.items():
+        gauges[name] = (help_text, callback())
+    for name, (help_text, values) in gauges.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in sorted(values.items()):
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
@@ -4,6 +4,8 @@ from ChromaDBManager import ChromaDBManager
 from LLMProvider import LLMProvider
 from PromptManager import PromptManager
 from RAGPipelineManager import RAGPipelineManager
+from IndexManager import IndexManager
+from BM25Index import BM25Index
 
 from dotenv import load_dotenv
 import os
@@ -14,11 +16,16 @@ def get_rag_pipeline():
     db_directory = os.getenv("db_directory")
     print(f"DB directory: {db_directory}")
 
-    processor = TextProcessor(directory_path=docs_directory)
-    processed_docs = processor.process_documents(chunk_size=600, chunk_overlap=200)
-
     chroma_db = ChromaDBManager(path=db_directory)
-    chroma_db.add_documents(processed_docs)
+    index_manager = IndexManager(
+        docs_directory=docs_directory,
+        db_manager=chroma_db,
+        manifest_path=os.path.join(db_directory, "index_manifest.json"),
+        chunk_size=600,
+        chunk_overlap=200,
+        lexical_index=BM25Index(os.path.join(db_directory, "bm25_index.json"))
+    )
+    index_manager.sync()
 
     llm_provider = LLMProvider()
     prompt_manager = PromptManager()
@@ -27,7 +34,9 @@ def get_rag_pipeline():
         db_manager=chroma_db,
         llm_provider=llm_provider,
         prompt_manager=prompt_manager,
-        retrieval_k=4
+        retrieval_k=4,
+        lexical_index=index_manager.lexical_index,
+        retrieval_mode=os.getenv("retrieval_mode", "hybrid")
     )
     return rag_pipeline
 
@@ -0,0 +1,41 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+# Durations of imports and initialization steps, in the order they first ran.
+# Only the first run of a step is kept: that is the one startup pays for.
+_timings: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def record(name: str, seconds: float):
+    with _lock:
+        _timings.setdefault(name, seconds)
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """Record how long the block takes under name."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def startup_report() -> Dict[str, Any]:
+    """Recorded steps in milliseconds. Imports nested inside a step are counted in that step too."""
+    with _lock:
+        steps = dict(_timings)
+    return {
+        "steps_ms": {name: round(seconds * 1000, 1) for name, seconds in steps.items()},
+        "slowest": sorted(steps, key=steps.get, reverse=True)[:5]
+    }
+
+
+def print_startup_report():
+    report = startup_report()
+    print("Startup timing:")
+    for name, milliseconds in report["steps_ms"].items():
+        print(f"  {name:<40} {milliseconds:>9.1f} ms")
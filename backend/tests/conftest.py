@@ -0,0 +1,63 @@
+import importlib
+import os
+import sys
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_community.document_loaders import TextLoader
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from TextProcessor import TextProcessor
+
+
+@pytest.fixture
+def plain_text_loader(monkeypatch):
+    """Load files as plain text, so the tests need neither unstructured nor its NLTK data."""
+    monkeypatch.setattr(TextProcessor, "load_file", staticmethod(lambda file_path: TextLoader(file_path).load()))
+
+
+def write_words(path: str, prefix: str, count: int, suffix: str = ""):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(" ".join(f"{prefix}{i}" for i in range(count)) + suffix)
+
+
+@pytest.fixture
+def app_env() -> dict:
+    """Extra environment variables for app_client; override in a test module to change the configuration."""
+    return {}
+
+
+@pytest.fixture
+def app_client(tmp_path, monkeypatch, plain_text_loader, app_env):
+    """A TestClient over a fresh import of app, with fake providers and its own documents and db directories."""
+    for name, value in {
+        "docs_directory": str(tmp_path / "docs"),
+        "db_directory": str(tmp_path / "db"),
+        "fake_providers": "true",
+        "fake_embedding_latency": "0",
+        "fake_llm_latency": "0",
+        "fake_token_latency": "0",
+        # parse in-process, so the patched loader is used
+        "parser_workers": "0",
+        **app_env
+    }.items():
+        monkeypatch.setenv(name, value)
+    # app reads its configuration at import time
+    sys.modules.pop("app", None)
+    app_module = importlib.import_module("app")
+    with TestClient(app_module.app) as client:
+        client.app_module = app_module
+        yield client
+    sys.modules.pop("app", None)
+
+
+def wait_for_job(client: TestClient, job_id: str, timeout: float = 30) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.05)
+    raise TimeoutError(f"Job {job_id} did not finish in {timeout}s")
@@ -0,0 +1,53 @@
+import time
+
+import numpy as np
+
+from AnswerCache import AnswerCache
+
+
+def vectors(count: int, dimension: int = 8, seed: int = 0):
+    return np.random.default_rng(seed).standard_normal((count, dimension)).tolist()
+
+
+def store(cache: AnswerCache, embedding, answer: str, corpus_version: str = "v1"):
+    cache.store(query=answer, embedding=embedding, answer=answer, sources=[], documents=[], corpus_version=corpus_version)
+
+
+def test_eviction_and_expiry_reuse_matrix_rows():
+    cache = AnswerCache(max_entries=20)
+    cache.set_corpus_version("v1")
+    embeddings = vectors(60)
+    for i, embedding in enumerate(embeddings[:30]):
+        store(cache, embedding, str(i))
+    # the 10 oldest were evicted
+    assert all(cache.lookup(embedding, "v1") is None for embedding in embeddings[:10])
+    assert [cache.lookup(embedding, "v1")["answer"] for embedding in embeddings[10:30]] == [str(i) for i in range(10, 30)]
+
+    for entry in list(cache._entries.values())[:5]:
+        entry["created_at"] = time.time() - cache.ttl_seconds - 1
+    for i, embedding in enumerate(embeddings[30:45], start=30):
+        store(cache, embedding, str(i))
+
+    # freed rows were filled again instead of growing the matrix
+    assert len(cache._row_ids) == 20
+    answers = [cache.lookup(embedding, "v1") for embedding in embeddings[10:45]]
+    assert [answer["answer"] for answer in answers if answer] == [str(i) for i in range(25, 45)]
+    assert cache.stats()["entries"] == 20
+
+
+def test_only_the_current_corpus_version_is_served_or_stored():
+    cache = AnswerCache()
+    cache.set_corpus_version("v1")
+    old, new = vectors(2)
+    store(cache, old, "old")
+
+    cache.set_corpus_version("v2")
+    assert cache.stats()["invalidations"] == 1
+    store(cache, new, "new", corpus_version="v2")
+    # a request still running on the previous pipeline neither clears the cache nor adds to it
+    store(cache, old, "old", corpus_version="v1")
+    assert cache.lookup(new, "v1") is None
+    assert cache.lookup(new, "v2")["answer"] == "new"
+    assert cache.lookup(old, "v2") is None
+    assert cache.stats()["corpus_version"] == "v2"
+    assert cache.stats()["entries"] == 1
@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+from BM25Index import BM25Index
+from ChromaDBManager import ChromaDBManager
+from FakeProviders import FakeEmbeddingProvider
+from IndexManager import IndexManager
+from conftest import write_words
+
+
+@pytest.fixture
+def index(tmp_path, plain_text_loader):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+
+    def build() -> IndexManager:
+        db_manager = ChromaDBManager(path=str(tmp_path / "db"), embedding_function=FakeEmbeddingProvider(dimension=16))
+        return IndexManager(
+            str(docs),
+            db_manager,
+            str(tmp_path / "db" / "index_manifest.json"),
+            chunk_size=50,
+            chunk_overlap=0,
+            lexical_index=BM25Index(str(tmp_path / "db" / "bm25_index.json"))
+        )
+
+    return docs, build
+
+
+def stored_sources(manager: IndexManager):
+    documents = manager.db_manager.get_documents(manager.db_manager.get_ids())
+    return {os.path.basename(doc.metadata["source"]) for doc in documents}
+
+
+def test_incremental_sync_adds_updates_and_removes_files(index):
+    docs, build = index
+    write_words(docs / "a.txt", "a", 300)
+    write_words(docs / "b.txt", "b", 300)
+    manager = build()
+    stats = manager.sync()
+    assert sorted(stats["added"]) == ["a.txt", "b.txt"]
+    a_chunks = manager.get_chunk_ids("a.txt")
+    version = manager.corpus_version
+
+    write_words(docs / "a.txt", "a", 300, " changed")
+    write_words(docs / "c.txt", "c", 300)
+    os.remove(docs / "b.txt")
+    stats = manager.sync()
+
+    assert stats["added"] == ["c.txt"]
+    assert stats["updated"] == ["a.txt"]
+    assert stats["removed"] == ["b.txt"]
+    # only the last chunk of a.txt changed; the others keep their content-derived ids and are not embedded again
+    assert len(set(manager.get_chunk_ids("a.txt")) - set(a_chunks)) == 1
+    assert stats["chunks_added"] == len(manager.get_chunk_ids("a.txt")) + len(manager.get_chunk_ids("c.txt"))
+    assert manager.corpus_version != version
+    assert stored_sources(manager) == {"a.txt", "c.txt"}
+    assert manager.db_manager.get_collection_count() == manager.chunk_count() == manager.lexical_index.count()
+    assert manager.verify()
+
+
+def test_unchanged_directory_embeds_nothing(index):
+    docs, build = index
+    write_words(docs / "a.txt", "a", 200)
+    manager = build()
+    manager.sync()
+    # touching a file changes its stat but not its hash
+    os.utime(docs / "a.txt", ns=(1, 1))
+    stats = manager.sync()
+    assert stats["unchanged"] == ["a.txt"]
+    assert stats["chunks_added"] == 0
+
+
+def test_reopened_index_verifies_and_repairs_missing_chunks(index):
+    docs, build = index
+    write_words(docs / "a.txt", "a", 200)
+    write_words(docs / "b.txt", "b", 200)
+    build().sync()
+
+    manager = build()
+    assert manager.verify()
+
+    manager.db_manager.delete_documents(manager.get_chunk_ids("b.txt")[:1])
+    assert not manager.verify()
+    stats = manager.sync()
+    assert stats["added"] == ["b.txt"]
+    assert manager.verify()
+    assert stored_sources(manager) == {"a.txt", "b.txt"}
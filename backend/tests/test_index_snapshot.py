@@ -0,0 +1,49 @@
+import os
+
+from BM25Index import BM25Index
+from FakeProviders import FakeEmbeddingProvider
+from IndexManager import IndexManager
+from NumpyDBManager import NumpyDBManager
+from conftest import write_words
+
+
+def visible_sources(snapshot, query: str):
+    embedding = snapshot.vector_store.embed_query(query)
+    documents = snapshot.vector_store.similarity_search_by_vector(embedding, k=100)
+    documents += [doc for doc, _ in snapshot.lexical_index.search(query, k=100)]
+    return {os.path.basename(doc.metadata["source"]) for doc in documents}
+
+
+def test_pipelines_see_the_old_or_the_new_corpus_never_a_mix(tmp_path, plain_text_loader):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    write_words(docs / "a.txt", "a", 200)
+    write_words(docs / "b.txt", "b", 200)
+    db_manager = NumpyDBManager(path=str(tmp_path / "db"), embedding_function=FakeEmbeddingProvider(dimension=16))
+    manager = IndexManager(
+        str(docs), db_manager, str(tmp_path / "manifest.json"), chunk_size=50, chunk_overlap=0,
+        embed_batch_size=4, lexical_index=BM25Index(str(tmp_path / "bm25_index.json"))
+    )
+    manager.sync()
+    old_snapshot = manager.snapshot
+    old_ids = set(manager.get_chunk_ids("a.txt") + manager.get_chunk_ids("b.txt"))
+    query = " ".join(f"{prefix}{i}" for prefix in "abc" for i in range(0, 200, 7))
+
+    write_words(docs / "c.txt", "c", 200)
+    os.remove(docs / "b.txt")
+    seen = {}
+
+    def publish():
+        # the new chunks are all in the stores, the stale ones not yet deleted
+        seen["old"] = visible_sources(old_snapshot, query)
+        seen["new"] = visible_sources(manager.snapshot, query)
+
+    manager.sync(publish=publish)
+
+    assert seen["old"] == {"a.txt", "b.txt"}
+    assert seen["new"] == {"a.txt", "c.txt"}
+    assert not manager.snapshot.hidden
+    # the replaced snapshot keeps hiding what it never contained; its stale chunks are gone
+    assert visible_sources(old_snapshot, query) == {"a.txt"}
+    assert old_snapshot.hidden.isdisjoint(old_ids)
+    assert visible_sources(manager.snapshot, query) == {"a.txt", "c.txt"}
@@ -0,0 +1,64 @@
+import json
+import os
+
+import numpy as np
+from langchain.schema import Document
+
+from BM25Index import BM25Index
+from ChunkSpool import ChunkSpool
+
+
+def test_chunk_spool_streams_back_what_was_appended(tmp_path):
+    rng = np.random.default_rng(0)
+    spool = ChunkSpool(str(tmp_path))
+    expected = []
+    for batch in range(5):
+        ids = [f"{batch}-{i}" for i in range(7)]
+        texts = [f"text {batch} {i} é" for i in range(7)]
+        metadatas = [{"source": f"{batch}.txt", "chunk_id": i} for i in range(7)]
+        embeddings = rng.standard_normal((7, 12)).astype(np.float32).tolist()
+        spool.append(ids, texts, metadatas, embeddings)
+        expected += list(zip(ids, texts, metadatas, embeddings))
+
+    streamed = []
+    for ids, texts, metadatas, embeddings in spool.iter_batches(4):
+        assert len(ids) <= 4
+        streamed += list(zip(ids, texts, metadatas, embeddings))
+    assert spool.count == len(streamed) == len(expected)
+    for (chunk_id, text, metadata, embedding), row in zip(streamed, expected):
+        assert (chunk_id, text, metadata) == row[:3]
+        assert np.allclose(embedding, row[3])
+
+    spool.cleanup()
+    assert not os.path.exists(spool.directory)
+
+
+def test_bm25_index_keeps_no_chunk_text_and_matches_a_rebuild(tmp_path):
+    rng = np.random.default_rng(1)
+    vocabulary = "ab cd ef gh ij kl mn".split()
+    texts = {f"id{i}": " ".join(rng.choice(vocabulary, size=rng.integers(1, 30))) for i in range(200)}
+
+    def get_documents(ids):
+        return [Document(page_content=texts[chunk_id], metadata={"source": chunk_id}, id=chunk_id) for chunk_id in ids]
+
+    index = BM25Index(str(tmp_path / "bm25_index.json"), get_documents=get_documents)
+    index.add(list(texts), list(texts.values()), [{}] * len(texts))
+    removed = list(texts)[::3]
+    index.remove(removed)
+    index.save()
+
+    kept = [chunk_id for chunk_id in texts if chunk_id not in removed]
+    rebuilt = BM25Index(str(tmp_path / "rebuilt.json"), get_documents=get_documents)
+    rebuilt.add(kept, [texts[chunk_id] for chunk_id in kept], [{}] * len(kept))
+    reloaded = BM25Index(str(tmp_path / "bm25_index.json"), get_documents=get_documents)
+
+    for query in ["ab", "cd ef", "mn kl ij", "zz"]:
+        expected = [(doc.id, round(score, 9)) for doc, score in rebuilt.search(query, 10)]
+        for candidate in (index, reloaded):
+            assert [(doc.id, round(score, 9)) for doc, score in candidate.search(query, 10)] == expected
+    hits = index.search(" ".join(vocabulary), 200)
+    assert {doc.id for doc, _ in hits} == set(kept)
+    assert all(doc.page_content == texts[doc.id] for doc, _ in hits)
+
+    with open(tmp_path / "bm25_index.json", encoding="utf-8") as f:
+        assert set(json.load(f)["docs"][0]) == {"id", "length"}
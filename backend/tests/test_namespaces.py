@@ -0,0 +1,34 @@
+import os
+
+import chromadb
+
+from conftest import wait_for_job
+
+
+def test_deleted_namespace_drops_its_collection(app_client):
+    app_module = app_client.app_module
+    response = app_client.post(
+        "/upload",
+        files={"files": ("rockets.txt", b"team alpha builds rockets and engines. " * 50, "text/plain")},
+        data={"namespace": "team-a"}
+    )
+    assert response.status_code == 202
+    assert wait_for_job(app_client, response.json()["job_id"])["status"] == "completed"
+
+    _, index_directory = app_module.namespace_paths("team-a")
+    client = chromadb.PersistentClient(path=app_module.DB_DIRECTORY)
+    assert "ns_team-a" in [str(name) for name in client.list_collections()]
+    assert os.path.isdir(index_directory)
+
+    response = app_client.delete("/namespaces/team-a")
+    assert response.status_code == 200
+    assert wait_for_job(app_client, response.json()["job_id"])["status"] == "completed"
+
+    assert "ns_team-a" not in [str(name) for name in client.list_collections()]
+    assert not os.path.exists(index_directory)
+    assert "team-a" not in app_module.list_namespaces()
+    assert app_client.post("/query", json={"query": "rockets", "namespace": "team-a"}).status_code == 404
+
+
+def test_default_namespace_cannot_be_deleted(app_client):
+    assert app_client.delete("/namespaces/default").status_code == 400
@@ -0,0 +1,80 @@
+import os
+
+from BM25Index import BM25Index
+from ChromaDBManager import ChromaDBManager
+from FakeProviders import FakeEmbeddingProvider
+from IndexManager import IndexManager
+from NearDuplicateFilter import NearDuplicateFilter
+from conftest import write_words
+
+
+def words(prefix: str, count: int) -> str:
+    return " ".join(f"{prefix}{i}" for i in range(count))
+
+
+def test_filter_finds_near_duplicates_and_keeps_distinct_chunks(tmp_path):
+    near_duplicates = NearDuplicateFilter(path=str(tmp_path / "near_duplicates.npz"), threshold=0.8)
+    text = words("w", 200)
+    near_duplicates.add("original", near_duplicates.signature(text))
+
+    # one word changed out of 200 touches 3 of the 198 shingles
+    edited = text.replace("w100 ", "edited ")
+    match = near_duplicates.find(near_duplicates.signature(edited))
+    assert match is not None and match[0] == "original" and match[1] >= 0.8
+    assert near_duplicates.find(near_duplicates.signature(words("x", 200))) is None
+    assert near_duplicates.find(near_duplicates.signature(edited), exclude={"original"}) is None
+
+    near_duplicates.save()
+    reloaded = NearDuplicateFilter(path=str(tmp_path / "near_duplicates.npz"), threshold=0.8)
+    assert reloaded.ids() == ["original"]
+    assert reloaded.find(reloaded.signature(edited))[0] == "original"
+
+    reloaded.remove(["original"])
+    assert reloaded.count() == 0
+    assert reloaded.find(reloaded.signature(text)) is None
+
+
+def test_signatures_of_other_parameters_are_not_loaded(tmp_path):
+    path = str(tmp_path / "near_duplicates.npz")
+    near_duplicates = NearDuplicateFilter(path=path, seed=1)
+    near_duplicates.add("a", near_duplicates.signature(words("w", 50)))
+    near_duplicates.save()
+    assert NearDuplicateFilter(path=path, seed=2).count() == 0
+
+
+def test_index_drops_copied_chunks_and_restores_them_when_the_original_goes(tmp_path, plain_text_loader):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    write_words(docs / "a.txt", "a", 300)
+    write_words(docs / "b.txt", "b", 300)
+    # a copy of a.txt with a different ending
+    write_words(docs / "copy.txt", "a", 300, " and a different ending")
+    manager = IndexManager(
+        str(docs),
+        ChromaDBManager(path=str(tmp_path / "db"), embedding_function=FakeEmbeddingProvider(dimension=16)),
+        str(tmp_path / "db" / "index_manifest.json"),
+        chunk_size=50,
+        chunk_overlap=0,
+        lexical_index=BM25Index(str(tmp_path / "db" / "bm25_index.json")),
+        near_duplicate_filter=NearDuplicateFilter(path=str(tmp_path / "db" / "near_duplicates.npz"))
+    )
+    stats = manager.sync()
+
+    a_chunks = manager.get_chunk_ids("a.txt")
+    copy_chunks = manager.get_chunk_ids("copy.txt")
+    b_chunks = manager.get_chunk_ids("b.txt")
+    # only the chunk with the new ending is kept; distinct files lose nothing
+    assert stats["chunks_deduplicated"] == len(a_chunks)
+    assert len(copy_chunks) == 1
+    assert len(b_chunks) == len(a_chunks)
+    assert set(manager.duplicate_sources()) <= set(a_chunks)
+    assert manager.db_manager.get_collection_count() == manager.chunk_count()
+
+    # with the original gone, the copy is re-indexed so its content stays searchable
+    os.remove(docs / "a.txt")
+    stats = manager.sync()
+    assert stats["removed"] == ["a.txt"]
+    assert stats["updated"] == ["copy.txt"]
+    assert len(manager.get_chunk_ids("copy.txt")) == len(a_chunks) + 1
+    assert manager.duplicate_sources() == {}
+    assert manager.verify()
@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pytest
+
+from FakeProviders import FakeEmbeddingProvider
+from NumpyDBManager import NumpyDBManager
+
+
+def open_store(path, dtype: str = "float32") -> NumpyDBManager:
+    return NumpyDBManager(path=str(path), dtype=dtype, embedding_function=FakeEmbeddingProvider(dimension=8))
+
+
+def add(store: NumpyDBManager, ids, vectors):
+    store.upsert_embeddings(
+        list(ids), [f"text {chunk_id}" for chunk_id in ids], vectors.tolist(), [{"source": f"{chunk_id}.txt"} for chunk_id in ids]
+    )
+
+
+def brute_force(vectors: dict, query: np.ndarray, k: int):
+    ids = list(vectors)
+    matrix = np.array([vectors[chunk_id] / np.linalg.norm(vectors[chunk_id]) for chunk_id in ids])
+    scores = matrix @ (query / np.linalg.norm(query))
+    return [ids[i] for i in np.argsort(-scores, kind="stable")[:k]]
+
+
+def test_search_matches_brute_force_across_upserts_deletes_and_compaction(tmp_path):
+    rng = np.random.default_rng(0)
+    store = open_store(tmp_path)
+    live = {}
+    vectors = rng.standard_normal((100, 8))
+    add(store, [f"c{i}" for i in range(100)], vectors)
+    live.update({f"c{i}": vectors[i] for i in range(100)})
+
+    # replacing rows masks the old ones
+    replaced = rng.standard_normal((20, 8))
+    add(store, [f"c{i}" for i in range(20)], replaced)
+    live.update({f"c{i}": replaced[i] for i in range(20)})
+    assert store.generation == 0
+
+    # more than half of the rows dead: rewritten as a new generation, the old files removed
+    deleted = [f"c{i}" for i in range(20, 90)]
+    store.delete_documents(deleted)
+    for chunk_id in deleted:
+        del live[chunk_id]
+    assert store.generation == 1
+    assert not os.path.exists(store._file("vectors", 0))
+    assert store.get_collection_count() == len(live) == 30
+
+    queries = rng.standard_normal((5, 8))
+    for query in queries:
+        found = [doc.id for doc in store.similarity_search_by_vector(query.tolist(), k=5)]
+        assert found == brute_force(live, query, 5)
+
+    reopened = open_store(tmp_path)
+    assert sorted(reopened.get_ids()) == sorted(live)
+    for query in queries:
+        assert [doc.id for doc in reopened.similarity_search_by_vector(query.tolist(), k=5)] == brute_force(live, query, 5)
+    assert [[doc.id for doc in result] for result in reopened.similarity_search_by_vectors(queries.tolist(), k=3)] == [
+        brute_force(live, query, 3) for query in queries
+    ]
+
+
+def test_rows_written_after_the_last_saved_state_are_dropped_on_open(tmp_path):
+    rng = np.random.default_rng(1)
+    store = open_store(tmp_path)
+    add(store, ["a", "b"], rng.standard_normal((2, 8)))
+    # a crash after writing the vectors but before saving state.json leaves trailing bytes
+    with open(store._file("vectors"), "ab") as f:
+        f.write(np.zeros(8, dtype=np.float32).tobytes())
+    reopened = open_store(tmp_path)
+    assert sorted(reopened.get_ids()) == ["a", "b"]
+    assert os.path.getsize(reopened._file("vectors")) == 2 * 8 * 4
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_quantized_rows_keep_the_nearest_neighbour(tmp_path, dtype):
+    rng = np.random.default_rng(2)
+    store = open_store(tmp_path, dtype)
+    vectors = rng.standard_normal((50, 8))
+    add(store, [f"c{i}" for i in range(50)], vectors)
+    for i in range(0, 50, 7):
+        assert store.similarity_search_by_vector(vectors[i].tolist(), k=1)[0].id == f"c{i}"
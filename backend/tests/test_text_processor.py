@@ -0,0 +1,59 @@
+import multiprocessing
+import os
+import signal
+import time
+
+import pytest
+from langchain.schema import Document
+
+from TextProcessor import TextProcessor
+
+
+# fork, so the workers inherit the patched loader
+requires_fork = pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs the fork start method")
+
+
+def load_or_crash(file_path: str):
+    name = os.path.basename(file_path)
+    if name.startswith("crash"):
+        os.kill(os.getpid(), signal.SIGKILL)
+    if name.startswith("hang"):
+        time.sleep(60)
+    with open(file_path, encoding="utf-8") as f:
+        return [Document(page_content=f.read(), metadata={"source": file_path})]
+
+
+@requires_fork
+def test_only_the_file_that_kills_or_hangs_its_worker_fails(tmp_path, monkeypatch):
+    monkeypatch.setattr(TextProcessor, "load_file", staticmethod(load_or_crash))
+    names = [f"f{i:02d}.txt" for i in range(14)]
+    names[5] = "crash05.txt"
+    names[9] = "hang09.txt"
+    paths = []
+    for name in names:
+        (tmp_path / name).write_text(f"hello {name}")
+        paths.append(str(tmp_path / name))
+
+    processor = TextProcessor(str(tmp_path), parallel_workers=3, file_timeout=1, mp_context="fork")
+    results = list(processor.iter_load_and_clean_files(paths))
+
+    assert [file_path for file_path, _ in results] == paths
+    failed = {os.path.basename(file_path) for file_path, documents in results if documents is None}
+    assert failed == {"crash05.txt", "hang09.txt"} == {os.path.basename(path) for path in processor.failed_files}
+
+    # the broken pool was replaced: the next call parses normally
+    good = [path for path in paths if os.path.basename(path).startswith("f")]
+    assert len(processor.load_and_clean_files(good)) == len(good)
+    assert not processor.failed_files
+
+
+@requires_fork
+def test_parallel_and_in_process_loading_match(tmp_path, plain_text_loader):
+    paths = []
+    for i in range(6):
+        (tmp_path / f"doc{i}.txt").write_text(f"Visit https://example.com/{i} <b>NOW</b>, file {i}!  ")
+        paths.append(str(tmp_path / f"doc{i}.txt"))
+    parallel = TextProcessor(str(tmp_path), parallel_workers=2, mp_context="fork").load_and_clean_files(paths)
+    serial = TextProcessor(str(tmp_path)).load_and_clean_files(paths)
+    assert list(parallel) == list(serial) == paths
+    assert [[doc.page_content for doc in parallel[path]] for path in paths] == [[doc.page_content for doc in serial[path]] for path in paths]
@@ -0,0 +1,67 @@
+import random
+import re
+
+import pytest
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from FastTextSplitter import FastTextSplitter
+from TextProcessor import TextProcessor
+
+
+def legacy_clean_text(text: str) -> str:
+    """TextProcessor.clean_text before the patterns were precompiled and the passes fused."""
+    if not isinstance(text, str) or not text.strip():
+        return ""
+    text = text.lower()
+    text = re.sub(r'http[s]?://\S+', '', text)
+    text = re.sub(r'<[^>]+>', '', text)
+    text = re.sub(r'[^\w\s.,!?]', '', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+ALPHABET = list("abcdefg hij.,!?'0123456789<>/:") + [
+    "  ", "\n", "\n\n", "\t", "\r", "\xa0", "é", "ß", "İ", "日本", "😀", "​",
+    "http://x.io/y ", "https://a.b/c?d=1", "<i>", "</p>", "<", "x" * 80
+]
+
+
+def random_text(rng: random.Random, max_length: int = 300) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, max_length)))
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_clean_text_matches_the_original_cleaner(seed):
+    rng = random.Random(seed)
+    for _ in range(50_000):
+        text = random_text(rng, 40)
+        assert TextProcessor.clean_text(text) == legacy_clean_text(text), repr(text)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_fast_splitter_matches_recursive_character_splitter(seed):
+    rng = random.Random(seed)
+    for _ in range(300):
+        text = random_text(rng)
+        if rng.random() < 0.5:
+            text = TextProcessor.clean_text(text)
+        chunk_size = rng.choice([1, 2, 3, 5, 10, 20, 50])
+        chunk_overlap = rng.randint(0, chunk_size - 1) if rng.random() < 0.5 else 0
+        expected = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        ).split_text(text)
+        assert FastTextSplitter(chunk_size, chunk_overlap).split_text(text) == expected, (chunk_size, chunk_overlap, text)
+
+
+def test_fast_splitter_matches_on_documents():
+    rng = random.Random(0)
+    vocabulary = [f"word{i}" for i in range(500)] + ["Dexalo", "don't", "naïve", "café", "(2024)", "$1,000", "e-mail"]
+    for chunk_size, chunk_overlap in [(50, 0), (100, 20), (1000, 200)]:
+        text = " ".join(
+            rng.choice(vocabulary) + ("." if i % 12 == 11 else "") + ("\n\n" if i % 97 == 96 else "")
+            for i in range(3000)
+        )
+        expected = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        ).split_text(text)
+        assert FastTextSplitter(chunk_size, chunk_overlap).split_text(text) == expected
@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from conftest import wait_for_job
+
+APPLES = b"apples and oranges grow in the orchard. " * 100
+ROCKETS = b"rockets and engines wait in the hangar. " * 100
+
+
+@pytest.fixture
+def app_env() -> dict:
+    return {"max_upload_file_mb": "1", "max_upload_request_mb": "2"}
+
+
+def staged_files(app_client):
+    return os.listdir(app_client.app_module.UPLOAD_STAGING_DIRECTORY)
+
+
+def test_upload_indexes_new_files_and_skips_unchanged_ones(app_client):
+    response = app_client.post(
+        "/upload",
+        files=[("files", ("apples.txt", APPLES, "text/plain")), ("files", ("rockets.txt", ROCKETS, "text/plain"))]
+    )
+    assert response.status_code == 202
+    assert response.json()["files"] == ["apples.txt", "rockets.txt"]
+    assert wait_for_job(app_client, response.json()["job_id"])["status"] == "completed"
+    assert sorted(os.listdir(app_client.app_module.DOCS_DIRECTORY)) == ["apples.txt", "rockets.txt"]
+    assert staged_files(app_client) == []
+
+    # same name and bytes: nothing to do and no job
+    response = app_client.post("/upload", files=[("files", ("apples.txt", APPLES, "text/plain"))])
+    assert response.status_code == 200
+    assert response.json()["skipped"] == ["apples.txt"]
+    assert response.json()["job_id"] is None
+
+    # same bytes under a new name are indexed, and reported as a duplicate
+    response = app_client.post("/upload", files=[("files", ("copy.txt", ROCKETS, "text/plain"))])
+    assert response.status_code == 202
+    assert response.json()["duplicates"] == {"copy.txt": "rockets.txt"}
+    assert wait_for_job(app_client, response.json()["job_id"])["status"] == "completed"
+    assert staged_files(app_client) == []
+
+
+def test_repeated_filename_is_rejected(app_client):
+    response = app_client.post(
+        "/upload",
+        files=[("files", ("apples.txt", APPLES, "text/plain")), ("files", ("apples.txt", ROCKETS, "text/plain"))]
+    )
+    assert response.status_code == 400
+    assert "apples.txt" in response.json()["detail"]
+    assert os.listdir(app_client.app_module.DOCS_DIRECTORY) == []
+
+
+def test_oversized_file_rejects_the_whole_request(app_client):
+    response = app_client.post(
+        "/upload",
+        files=[
+            ("files", ("apples.txt", APPLES, "text/plain")),
+            ("files", ("big.txt", b"x" * ((1 << 20) + 1), "text/plain"))
+        ]
+    )
+    assert response.status_code == 413
+    # the file that did fit is not moved in either, and nothing is left in staging
+    assert os.listdir(app_client.app_module.DOCS_DIRECTORY) == []
+    assert staged_files(app_client) == []
+
+
+def test_request_body_is_limited_before_it_is_read(app_client):
+    # within the per-file limit, but above the request limit plus the form overhead allowance
+    files = [("files", (f"part{i}.txt", bytes([65 + i]) * (1 << 20), "text/plain")) for i in range(4)]
+    response = app_client.post("/upload", files=files)
+    assert response.status_code == 413
+    assert os.listdir(app_client.app_module.DOCS_DIRECTORY) == []
+
+    response = app_client.post(
+        "/upload",
+        content=iter([b"--x--\r\n"]),
+        headers={"content-type": "multipart/form-data; boundary=x"}
+    )
+    assert response.status_code == 411
@@ -0,0 +1,288 @@
+# load_test.py
+"""
+Concurrent load generator for the RAG and Math API.
+
+Drives /query, /math and /upload with a weighted mix of requests, either closed
+loop (a fixed number of concurrent clients, each sending its next request as soon
+as the previous one returns) or open loop (requests arrive at a fixed average rate
+whatever the latency, as real users do). Several levels can be given to step the
+load up and find where one worker saturates. The first --warmup seconds of every
+step are not counted.
+
+To measure the service without OpenAI in the way, start the server with the
+stand-in providers:
+
+    cd backend && fake_providers=true python app.py
+
+Examples:
+
+    python load_test.py --smoke
+    python load_test.py --concurrency 1,4,16,64 --duration 30
+    python load_test.py --rate 5,10,20,40 --mix query=8,math=2 --output load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+BASE_URL = "http://localhost:8000"
+
+QUESTIONS = [
+    "What is dexalo company?",
+    "What does the document say about artificial intelligence?",
+    "Summarize the main topic of the uploaded documents.",
+    "Which technologies are mentioned?",
+    "Who are the customers described in the documents?",
+    "What are the key findings?",
+]
+
+EXPRESSIONS = [
+    "2+2",
+    "sqrt(144) + 5",
+    "(3.5 * 4) / 7 - 1",
+    "2^10",
+    "sin(pi/2) + cos(0)",
+    "log(1000) * 3",
+    # natural language goes through the agent
+    "what is 12 times 3",
+    "square root of 81 divided by 3",
+]
+
+UPLOAD_TEXT = (
+    "This is a load test document about Dexalo company. Dexalo is a technology company "
+    "specializing in AI solutions. Document {index} was generated by load_test.py.\n"
+)
+
+
+class Recorder:
+    """Latencies and outcomes of the requests that completed inside the measured window."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Counter] = {}
+        self.dropped = 0
+
+    def record(self, kind: str, seconds: float, status: Any):
+        self.latencies.setdefault(kind, []).append(seconds)
+        self.statuses.setdefault(kind, Counter())[str(status)] += 1
+
+    def summary(self, measured_seconds: float) -> Dict[str, Any]:
+        endpoints = {}
+        for kind in sorted(self.latencies):
+            milliseconds = np.asarray(self.latencies[kind]) * 1000
+            statuses = self.statuses[kind]
+            errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+            endpoints[kind] = {
+                "requests": len(milliseconds),
+                "throughput_rps": len(milliseconds) / measured_seconds,
+                "error_rate": errors / len(milliseconds),
+                "p50_ms": float(np.percentile(milliseconds, 50)),
+                "p95_ms": float(np.percentile(milliseconds, 95)),
+                "p99_ms": float(np.percentile(milliseconds, 99)),
+                "max_ms": float(milliseconds.max()),
+                "statuses": dict(statuses)
+            }
+        total = sum(len(latencies) for latencies in self.latencies.values())
+        return {
+            "requests": total,
+            "throughput_rps": total / measured_seconds,
+            "dropped": self.dropped,
+            "endpoints": endpoints
+        }
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in ("query", "math", "upload"):
+            raise SystemExit(f"Unknown request kind '{kind}' in --mix")
+        weights[kind] = float(weight or 1)
+    return {kind: weight for kind, weight in weights.items() if weight > 0}
+
+
+async def send(client: httpx.AsyncClient, kind: str, rng: random.Random, uploaded: List[str]) -> int:
+    if kind == "query":
+        response = await client.post("/query", json={"query": rng.choice(QUESTIONS)})
+    elif kind == "math":
+        response = await client.post("/math", json={"expression": rng.choice(EXPRESSIONS)})
+    else:
+        filename = f"load_test_{uuid.uuid4().hex[:12]}.txt"
+        content = UPLOAD_TEXT.format(index=len(uploaded)) * 20
+        response = await client.post("/upload", files={"files": (filename, content.encode("utf-8"), "text/plain")})
+        if response.status_code < 400:
+            uploaded.append(filename)
+    return response.status_code
+
+
+class Step:
+    """One load level: sends requests until the deadline and records those started after the warm-up."""
+
+    def __init__(self, client: httpx.AsyncClient, args: argparse.Namespace, weights: Dict[str, float], uploaded: List[str]):
+        self.client = client
+        self.args = args
+        self.kinds = list(weights)
+        self.weights = list(weights.values())
+        self.uploaded = uploaded
+        self.rng = random.Random(args.seed)
+        self.recorder = Recorder()
+        self.start = time.perf_counter()
+        self.measure_from = self.start + args.warmup
+        self.deadline = self.measure_from + args.duration
+
+    async def request(self):
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        start = time.perf_counter()
+        try:
+            status = await send(self.client, kind, self.rng, self.uploaded)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        end = time.perf_counter()
+        if self.measure_from <= start and end <= self.deadline + self.args.timeout:
+            self.recorder.record(kind, end - start, status)
+
+    async def closed_loop(self, concurrency: int):
+        async def client_loop():
+            while time.perf_counter() < self.deadline:
+                await self.request()
+
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+
+    async def open_loop(self, rate: float):
+        in_flight = set()
+        next_arrival = time.perf_counter()
+        while True:
+            # Poisson arrivals: exponential gaps averaging 1 / rate
+            next_arrival += self.rng.expovariate(rate)
+            if next_arrival >= self.deadline:
+                break
+            await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+            if len(in_flight) >= self.args.max_in_flight:
+                # the client itself is saturated; count it instead of queueing without bound
+                if time.perf_counter() >= self.measure_from:
+                    self.recorder.dropped += 1
+                continue
+            task = asyncio.create_task(self.request())
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.wait(in_flight)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    weights = parse_mix(args.mix)
+    open_loop = args.rate is not None
+    levels = [float(level) for level in (args.rate if open_loop else args.concurrency).split(",")]
+    uploaded: List[str] = []
+    steps = []
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        for level in levels:
+            step = Step(client, args, weights, uploaded)
+            if open_loop:
+                await step.open_loop(level)
+            else:
+                await step.closed_loop(int(level))
+            summary = step.recorder.summary(args.duration)
+            summary["mode"] = "rate" if open_loop else "concurrency"
+            summary["level"] = level
+            steps.append(summary)
+            print_step(summary)
+
+        if args.cleanup:
+            for filename in uploaded:
+                await client.delete(f"/documents/{filename}")
+
+    return {
+        "url": args.url,
+        "config": {name: value for name, value in vars(args).items() if name != "output"},
+        "steps": steps
+    }
+
+
+def print_step(summary: Dict[str, Any]):
+    label = f"{summary['mode']}={summary['level']:g}"
+    print(f"\n{label}: {summary['requests']} requests, {summary['throughput_rps']:.2f} req/s, {summary['dropped']} dropped")
+    print(f"  {'endpoint':<8}{'n':>7}{'req/s':>9}{'err %':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for kind, stats in summary["endpoints"].items():
+        print(
+            f"  {kind:<8}{stats['requests']:>7}{stats['throughput_rps']:>9.2f}{stats['error_rate'] * 100:>8.1f}"
+            f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}{stats['max_ms']:>10.1f}"
+        )
+
+
+def smoke(url: str) -> bool:
+    """Upload test_document.txt, wait for its ingestion job and ask one question."""
+    test_file_path = "test_document.txt"
+    if not os.path.exists(test_file_path):
+        with open(test_file_path, "w") as f:
+            f.write("This is a test document about Dexalo company. Dexalo is a technology company specializing in AI solutions.")
+
+    with httpx.Client(base_url=url, timeout=120) as client:
+        with open(test_file_path, "rb") as f:
+            response = client.post("/upload", files={"files": (test_file_path, f, "text/plain")})
+        print("Upload Response:", response.status_code, response.json())
+        if response.status_code >= 400:
+            return False
+
+        job_id = response.json()["job_id"]
+        job = {}
+        # no job when the document is already indexed unchanged
+        for _ in range(240 if job_id else 0):
+            job = client.get(f"/jobs/{job_id}").json()
+            if job.get("status") in ("completed", "failed"):
+                break
+            time.sleep(0.5)
+        print("Ingestion job:", job.get("status", "skipped, already indexed"))
+
+        response = client.post("/query", json={"query": "What is dexalo company?"})
+        print("\nQuery Response:", response.status_code)
+        result = response.json()
+        if response.status_code == 200:
+            print(f"Question: {result['query']}")
+            print(f"Answer: {result['answer']}")
+            print(f"Processing Time: {result['processing_time']} seconds")
+        else:
+            print("Error:", result)
+        return response.status_code == 200
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=BASE_URL)
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", default="8", help="Closed loop: comma-separated numbers of concurrent clients")
+    load.add_argument("--rate", help="Open loop: comma-separated arrival rates in requests per second")
+    parser.add_argument("--mix", default="query=7,math=3", help="Request weights, e.g. query=7,math=2,upload=1")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds per step")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds at the start of every step")
+    parser.add_argument("--timeout", type=float, default=60, help="Request timeout in seconds")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="Open loop: requests in flight before arrivals are dropped")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cleanup", action="store_true", help="Delete the uploaded test documents afterwards")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--smoke", action="store_true", help="Single upload and query, as a quick end-to-end check")
+    args = parser.parse_args()
+
+    if args.smoke:
+        sys.exit(0 if smoke(args.url) else 1)
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
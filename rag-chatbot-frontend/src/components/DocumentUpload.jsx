@@ -1,12 +1,15 @@
 // src/components/DocumentUpload.jsx
 import React, { useState, useRef } from 'react';
-import { uploadDocuments } from '../services/api';
+import { uploadDocuments, getJobStatus } from '../services/api';
+
+const JOB_POLL_INTERVAL_MS = 1000;
 
 function DocumentUpload({ onUploadComplete, onClose }) {
   const [files, setFiles] = useState([]);
   const [isDragging, setIsDragging] = useState(false);
   const [isUploading, setIsUploading] = useState(false);
   const [error, setError] = useState(null);
+  const [indexingStage, setIndexingStage] = useState(null);
   const fileInputRef = useRef(null);
 
   const handleFileChange = (e) => {
@@ -57,7 +60,14 @@ function DocumentUpload({ onUploadComplete, onClose }) {
         formData.append('files', file);
       });
       
-      await uploadDocuments(formData);
+      const result = await uploadDocuments(formData);
+      // the upload returns before indexing is done; keep the modal open until the documents can be queried
+      const job = result.job_id ? await waitForJob(result.job_id) : null;
+      if (job && job.status === 'failed') {
+        setError(`Indexing failed: ${job.error}`);
+        onUploadComplete();
+        return;
+      }
       onUploadComplete();
       onClose();
     } catch (err) {
@@ -65,6 +75,18 @@ function DocumentUpload({ onUploadComplete, onClose }) {
       console.error('Upload error:', err);
     } finally {
       setIsUploading(false);
+      setIndexingStage(null);
+    }
+  };
+
+  const waitForJob = async (jobId) => {
+    while (true) {
+      const job = await getJobStatus(jobId);
+      if (job.status === 'completed' || job.status === 'failed') {
+        return job;
+      }
+      setIndexingStage(job.stage || job.status);
+      await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
     }
   };
 
@@ -124,7 +146,7 @@ function DocumentUpload({ onUploadComplete, onClose }) {
             onClick={handleUpload}
             disabled={files.length === 0 || isUploading}
           >
-            {isUploading ? 'Uploading...' : 'Upload'}
+            {indexingStage ? `Indexing (${indexingStage})...` : isUploading ? 'Uploading...' : 'Upload'}
           </button>
         </div>
       </div>
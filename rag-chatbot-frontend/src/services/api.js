@@ -40,6 +40,21 @@ export const uploadDocuments = async (formData) => {
   }
 };
 
+export const getJobStatus = async (jobId) => {
+  try {
+    const response = await fetch(`${API_BASE_URL}/jobs/${jobId}`);
+    
+    if (!response.ok) {
+      throw new Error('Failed to fetch job status');
+    }
+    
+    return await response.json();
+  } catch (error) {
+    console.error('API error:', error);
+    throw error;
+  }
+};
+
 export const getDocuments = async () => {
   try {
     const response = await fetch(`${API_BASE_URL}/documents`);